@@ -0,0 +1,4 @@
+"""
+GPQA Evaluation Helpers
+Request engine and dispatch utilities used by run_gpqa_sglang.py
+"""
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Bounded-concurrency request engine for the sglang sampler
+
+GPQAEval calls the sampler synchronously, one example per call. This module
+provides two pieces that together keep many requests in flight:
+
+- AsyncRequestEngine: owns an asyncio event loop on a background thread and
+  runs request coroutines on it, never more than `max_in_flight` at a time.
+- concurrent_dispatch: temporarily replaces `common.map_with_progress` so that
+  GPQAEval fans its examples out over `concurrency` worker threads, each of
+  which blocks on the engine until its response arrives. The example row a
+  worker is evaluating is exposed through current_sample() so the sampler
+  can key per-sample bookkeeping (journal, cache) on it. An optional
+  scheduler (scheduling.LengthScheduler) picks the dispatch order and
+  receives per-sample wall times.
+"""
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from tqdm import tqdm
+
+_sample_context = threading.local()
+
+
+def current_sample():
+    """Example row being evaluated on this thread (None outside concurrent_dispatch)"""
+    return getattr(_sample_context, "row", None)
+
+
+class AsyncRequestEngine:
+    """
+    Run coroutines on a dedicated event loop with a max-in-flight limit
+
+    Synchronous callers (e.g. SglangSampler.__call__ running on a worker
+    thread) submit a coroutine factory and block until it completes.
+    """
+
+    def __init__(self, max_in_flight: int = 64):
+        """
+        Args:
+            max_in_flight: maximum number of coroutines running at the same time
+        """
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be >= 1, got {max_in_flight}")
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-request-engine", daemon=True)
+        self._thread.start()
+        # Semaphore must be created on the loop that uses it
+        self._semaphore = self.run_coroutine(self._make_semaphore())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_in_flight)
+
+    def run_coroutine(self, coro):
+        """Run a coroutine on the engine loop (no concurrency limit) and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _bounded(self, coro_factory):
+        async with self._semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return await coro_factory()
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def submit(self, coro_factory):
+        """
+        Run `coro_factory()` under the in-flight limit and block until done
+
+        Args:
+            coro_factory: zero-argument callable returning a coroutine; it is
+                only invoked once a slot is free, so the request is not
+                created before it can actually be sent
+
+        Returns:
+            The coroutine's result (exceptions are re-raised in the caller)
+        """
+        return self.run_coroutine(self._bounded(coro_factory))
+
+    def close(self):
+        """Stop the event loop and join the background thread"""
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
+
+
+@contextmanager
+def concurrent_dispatch(common_module, concurrency: int, scheduler=None):
+    """
+    Make `common.map_with_progress` use exactly `concurrency` worker threads
+
+    simple_evals evaluations call `common.map_with_progress(fn, examples)`,
+    so swapping that function is the only seam for controlling how many
+    sampler calls are issued at once. Results keep the input order.
+
+    Args:
+        common_module: the `simple_evals.common` module
+        concurrency: number of examples evaluated at the same time
+        scheduler: optional object with order(xs) -> dispatch order (indices)
+            and record(order, spans, wall_s); None dispatches in input order
+    """
+    original = common_module.map_with_progress
+
+    def map_with_progress(f, xs, num_threads=None, pbar=True):
+        xs = list(xs)
+        if not xs:
+            return []
+        order = scheduler.order(xs) if scheduler is not None else list(range(len(xs)))
+        spans = [None] * len(xs)
+        start = time.perf_counter()
+
+        def run(i):
+            _sample_context.row = xs[i]
+            began = time.perf_counter() - start
+            try:
+                return i, f(xs[i])
+            finally:
+                spans[i] = (began, time.perf_counter() - start)
+                _sample_context.row = None
+
+        pbar_fn = tqdm if pbar else lambda x, *args, **kwargs: x
+        results = [None] * len(xs)
+        with ThreadPool(min(concurrency, len(xs))) as pool:
+            for i, result in pbar_fn(pool.imap(run, order), total=len(xs)):
+                results[i] = result
+        if scheduler is not None:
+            scheduler.record(order, spans, time.perf_counter() - start)
+        return results
+
+    common_module.map_with_progress = map_with_progress
+    try:
+        yield
+    finally:
+        common_module.map_with_progress = original
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Early termination of streamed GPQA generations
+
+Many responses state "Answer: X" long before max_tokens and keep generating
+afterwards. The grader (grading.py, same rule as GPQAEval) takes the first
+match of ANSWER_PATTERN, so once that match has streamed in the graded letter
+cannot change any more. run_gpqa_sglang.py passes the grader's own regex
+(simple_evals.common.ANSWER_PATTERN_MULTICHOICE), ANSWER_PATTERN is only the
+fallback. AnswerWatcher follows the stream with that pattern and signals a stop once an answer has been followed by `grace_chunks`
+more chunks (the rest of the answer line, so the kept response still reads
+naturally); the sampler then closes the stream, which makes sglang abort the
+request.
+
+The pattern is matched incrementally: each chunk only re-scans the tail that
+a match could still start in, so a 16k-token response is not re-searched from
+the start for every chunk.
+"""
+import re
+import threading
+
+from .grading import ANSWER_PATTERN
+
+# Longest span a match can have ("Answer" + spacing + ":" + spacing + "$X$");
+# runs of spaces/tabs longer than this are not expected in a response
+MAX_MATCH_CHARS = 64
+
+
+class AnswerWatcher:
+    """Watch one streamed response for a stable final answer"""
+
+    def __init__(self, pattern: str = ANSWER_PATTERN, grace_chunks: int = 8):
+        self.pattern = re.compile(pattern)
+        self.grace_chunks = grace_chunks
+        self.answer = None
+        self.chunks = 0
+        self.stopped = False
+        self._text = ""
+        self._scan_from = 0
+        self._chunks_after = 0
+
+    def feed(self, piece: str) -> bool:
+        """Add one content chunk; True once the stream should be closed"""
+        self.chunks += 1
+        self._text += piece
+        if self.answer is None:
+            match = self.pattern.search(self._text, self._scan_from)
+            if match is None:
+                self._scan_from = max(0, len(self._text) - MAX_MATCH_CHARS)
+                return False
+            self.answer = match.group(1)
+            self._text = ""  # Only needed to find the match
+        else:
+            self._chunks_after += 1
+        self.stopped = self._chunks_after >= self.grace_chunks
+        return self.stopped
+
+
+class TruncationLog:
+    """Thread-safe list of samples whose generation was stopped at the answer"""
+
+    def __init__(self, grace_chunks: int, pattern: str = ANSWER_PATTERN):
+        self.grace_chunks = grace_chunks
+        self.pattern = pattern
+        self.samples = {}  # (question_id, repeat) -> {"answer", "chunks"}
+        self._lock = threading.Lock()
+
+    def add(self, key, answer: str, chunks: int):
+        if key is None:
+            return
+        with self._lock:
+            self.samples[key] = {"answer": answer, "chunks": chunks}
+
+    def __contains__(self, key):
+        return key in self.samples
+
+    def summary(self, graded_samples: list) -> dict:
+        """
+        Truncation count and accuracy of truncated vs complete samples
+
+        Args:
+            graded_samples: grade_samples() output of the run
+        """
+        truncated = [s for s in graded_samples if (s["question_id"], s["repeat"]) in self.samples]
+        complete = [s for s in graded_samples if (s["question_id"], s["repeat"]) not in self.samples]
+
+        def accuracy(samples):
+            return sum(s["correct"] for s in samples) / len(samples) if samples else None
+
+        return {
+            "grace_chunks": self.grace_chunks,
+            "truncated": len(self.samples),
+            "complete": len(complete),
+            "accuracy_truncated": accuracy(truncated),
+            "accuracy_complete": accuracy(complete),
+            "truncated_chunks": sum(s["chunks"] for s in self.samples.values()),
+        }
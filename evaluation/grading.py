@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Per-sample GPQA correctness
+
+GPQAEval only returns the aggregate score. Paired comparisons between models
+(performance/stats.py --gpqa) need to know which (question, repeat) samples
+each model answered correctly. The samples are re-graded from the returned
+conversations with the same rule GPQAEval uses: the "Answer: X" letter must
+match the position of the correct choice after the row's permutation.
+
+Callers pass the grader's own regex (simple_evals.common.ANSWER_PATTERN_MULTICHOICE);
+ANSWER_PATTERN is only a fallback copy for when it is not available.
+"""
+import re
+
+from .journal import QUESTION_ID_KEY, REPEAT_KEY
+
+# Fallback copy of simple_evals.common.ANSWER_PATTERN_MULTICHOICE
+ANSWER_PATTERN = r"(?i)Answer[ \t]*:[ \t]*\$?([A-D])\$?"
+
+
+def correct_letter(row: dict) -> str | None:
+    """Letter of the correct choice (choices are [correct, incorrect 1-3] permuted by row["permutation"])"""
+    permutation = row.get("permutation")
+    if permutation is None:
+        return None
+    return "ABCD"[permutation.index(0)]
+
+
+def extract_answer(response_text: str, pattern: str = ANSWER_PATTERN) -> str | None:
+    match = re.search(pattern, response_text or "")
+    return match.group(1) if match else None
+
+
+def grade_samples(examples: list, convos: list, pattern: str = ANSWER_PATTERN) -> list:
+    """
+    Correctness of every annotated example
+
+    Args:
+        examples: GPQAEval.examples after annotate_examples (same order as convos)
+        convos: EvalResult.convos (prompt messages + the assistant response)
+
+    Returns:
+        [{"question_id", "repeat", "answer", "correct"}], empty if the rows carry no permutation
+    """
+    samples = []
+    for row, convo in zip(examples, convos):
+        expected = correct_letter(row)
+        if expected is None or QUESTION_ID_KEY not in row:
+            return []
+        answer = extract_answer(convo[-1]["content"], pattern)
+        samples.append({
+            "question_id": row[QUESTION_ID_KEY],
+            "repeat": row[REPEAT_KEY],
+            "answer": answer,
+            "correct": int(answer == expected),
+        })
+    return samples
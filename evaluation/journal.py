@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Append-only per-sample result journal for GPQA runs
+
+Every response is written to a JSONL file as soon as it arrives, keyed by
+(question id, repeat index) plus a hash of the sampling configuration. A
+resumed run loads the journal and replays matching records instead of
+querying the server again, so GPQAEval re-grades and re-aggregates the
+final score from the journal.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+QUESTION_ID_KEY = "_question_id"
+REPEAT_KEY = "_repeat"
+
+
+def question_id_for(row: dict) -> str:
+    """Stable question identifier (GPQA "Record ID", or a hash of the question text)"""
+    record_id = row.get("Record ID")
+    if record_id:
+        return str(record_id)
+    return hashlib.sha1(row["Question"].encode("utf-8")).hexdigest()[:16]
+
+
+def annotate_examples(examples: list) -> list:
+    """
+    Tag each example row with its question id and repeat index (in place)
+
+    GPQAEval repeats the question list `n_repeats` times, so the repeat index
+    is the number of earlier occurrences of the same question.
+    """
+    seen = {}
+    for row in examples:
+        qid = question_id_for(row)
+        row[QUESTION_ID_KEY] = qid
+        row[REPEAT_KEY] = seen.get(qid, 0)
+        seen[qid] = row[REPEAT_KEY] + 1
+    return examples
+
+
+def sample_key(row: dict | None):
+    """(question_id, repeat) for an annotated row, None for ad-hoc calls"""
+    if row is None or QUESTION_ID_KEY not in row:
+        return None
+    return row[QUESTION_ID_KEY], row[REPEAT_KEY]
+
+
+def config_hash(sampling_config: dict) -> str:
+    """Short hash of a sampling configuration (records from other configs are never replayed)"""
+    canonical = json.dumps(sampling_config, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def usage_to_dict(usage):
+    """Convert an OpenAI usage object (or dict/None) to a plain JSON-serializable dict"""
+    if usage is None or isinstance(usage, dict):
+        return usage
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return dict(vars(usage))
+
+
+class ResultJournal:
+    """Thread-safe append-only JSONL journal of sampler responses"""
+
+    def __init__(self, path, sampling_config: dict, resume: bool = False):
+        """
+        Args:
+            path: journal file path (JSONL)
+            sampling_config: model name and sampling parameters of this run
+            resume: load existing records; otherwise start a fresh journal
+        """
+        self.path = Path(path)
+        self.sampling_config = sampling_config
+        self.config_hash = config_hash(sampling_config)
+        self.records = {}
+        self.replayed = 0
+        self.appended = 0
+        self.skipped_records = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._load()
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn last line from a crash mid-write
+                    self.skipped_records += 1
+                    continue
+                if record.get("config_hash") != self.config_hash:
+                    self.skipped_records += 1
+                    continue
+                self.records[(record["question_id"], record["repeat"])] = record
+
+    def lookup(self, key):
+        """Return the journaled record for (question_id, repeat), or None"""
+        if key is None:
+            return None
+        record = self.records.get(key)
+        if record is not None:
+            with self._lock:
+                self.replayed += 1
+        return record
+
+    def append(self, key, response_text: str, usage=None, extra: dict | None = None):
+        """Durably append one response (flushed and fsynced before returning)"""
+        if key is None:
+            return
+        question_id, repeat = key
+        record = {
+            "question_id": question_id,
+            "repeat": repeat,
+            "seed": self.sampling_config.get("seed"),
+            "sampling": self.sampling_config,
+            "config_hash": self.config_hash,
+            "response_text": response_text,
+            "usage": usage_to_dict(usage),
+            "timestamp": time.time(),
+        }
+        if extra:
+            record.update(extra)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records[key] = record
+            self.appended += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def summary(self) -> dict:
+        return {
+            "path": str(self.path),
+            "records": len(self.records),
+            "replayed": self.replayed,
+            "appended": self.appended,
+            "skipped_records": self.skipped_records,
+        }
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Per-sample latency capture for streamed GPQA generations
+
+Each streamed response yields time-to-first-token, the inter-arrival times
+of the following chunks, the decode time and decode tokens/s. The recorder
+collects them from all worker threads and reports p50/p90/p99 per metric.
+Inter-token times are pooled into a log-spaced histogram so that memory
+stays bounded for 16k-token generations across thousands of samples.
+"""
+import math
+import threading
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(values: list) -> dict:
+    """mean / p50 / p90 / p99 / max of a list of numbers"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {"mean": sum(ordered) / len(ordered)}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = percentile(ordered, q)
+    summary["max"] = ordered[-1]
+    summary["count"] = len(ordered)
+    return summary
+
+
+class LogHistogram:
+    """Fixed-memory histogram with log-spaced bins (~1% relative resolution)"""
+
+    def __init__(self, min_value: float = 1e-6, max_value: float = 1e3, growth: float = 1.01):
+        self.min_value = min_value
+        self.log_growth = math.log(growth)
+        self.num_bins = int(math.ceil(math.log(max_value / min_value) / self.log_growth)) + 1
+        self.counts = [0] * self.num_bins
+        self.total = 0
+
+    def add(self, value: float):
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(int(math.log(value / self.min_value) / self.log_growth), self.num_bins - 1)
+        self.counts[index] += 1
+        self.total += 1
+
+    def percentile(self, q: float) -> float:
+        """Value at percentile q (geometric midpoint of the containing bin)"""
+        if self.total == 0:
+            return 0.0
+        target = q / 100 * (self.total - 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen > target:
+                return self.min_value * math.exp((index + 0.5) * self.log_growth)
+        return self.min_value * math.exp((self.num_bins - 0.5) * self.log_growth)
+
+    def summary(self) -> dict:
+        if self.total == 0:
+            return {}
+        summary = {f"p{q}": self.percentile(q) for q in PERCENTILES}
+        summary["count"] = self.total
+        return summary
+
+
+def sample_timing(start: float, chunk_times: list, end: float, completion_tokens: int | None) -> dict:
+    """
+    Build the timing record of one streamed response
+
+    Args:
+        start: perf_counter() when the request was sent
+        chunk_times: perf_counter() of every chunk that carried content
+        end: perf_counter() when the stream finished
+        completion_tokens: generated tokens reported by the server (None = use chunk count)
+    """
+    if completion_tokens is None:
+        completion_tokens = len(chunk_times)
+    ttft = chunk_times[0] - start if chunk_times else end - start
+    decode_time = end - chunk_times[0] if chunk_times else 0.0
+    inter_token = [b - a for a, b in zip(chunk_times, chunk_times[1:])]
+    decode_tokens = max(completion_tokens - 1, 0)
+    return {
+        "ttft_s": ttft,
+        "decode_time_s": decode_time,
+        "e2e_latency_s": end - start,
+        "completion_tokens": completion_tokens,
+        "tokens_per_s": decode_tokens / decode_time if decode_time > 0 else 0.0,
+        "inter_token_mean_s": sum(inter_token) / len(inter_token) if inter_token else 0.0,
+        "inter_token_max_s": max(inter_token) if inter_token else 0.0,
+        "inter_token_s": inter_token,
+    }
+
+
+class LatencyRecorder:
+    """Thread-safe collector of per-sample timing records"""
+
+    def __init__(self):
+        self.samples = []
+        self.inter_token = LogHistogram()
+        self._lock = threading.Lock()
+
+    def record(self, timing: dict):
+        """Add one sample; its raw inter-token list is folded into the histogram and dropped"""
+        timing = dict(timing)
+        inter_token = timing.pop("inter_token_s", [])
+        with self._lock:
+            for value in inter_token:
+                self.inter_token.add(value)
+            self.samples.append(timing)
+
+    def summary(self) -> dict:
+        """Percentile summary over all recorded samples (inter-token times are pooled)"""
+        with self._lock:
+            samples = list(self.samples)
+            inter_token = self.inter_token.summary()
+        if not samples:
+            return {}
+        return {
+            "num_samples": len(samples),
+            "ttft_s": summarize([s["ttft_s"] for s in samples]),
+            "inter_token_s": inter_token,
+            "decode_time_s": summarize([s["decode_time_s"] for s in samples]),
+            "e2e_latency_s": summarize([s["e2e_latency_s"] for s in samples]),
+            "tokens_per_s": summarize([s["tokens_per_s"] for s in samples if s["tokens_per_s"] > 0]),
+            "completion_tokens": summarize([s["completion_tokens"] for s in samples]),
+        }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Length-aware dispatch order for GPQA runs
+
+Response lengths vary from a few hundred to max_tokens tokens. In dataset
+order a handful of long generations that start last keep the run waiting on
+stragglers while the server sits mostly idle. Dispatching the longest
+expected generations first (LPT list scheduling) lets the short ones fill the
+remaining slots at the end instead.
+
+- LengthPredictor: expected output tokens per question, the mean
+  completion_tokens of that question in earlier journals; questions without
+  history fall back to prompt length × the output/prompt ratio fitted on the
+  history (plain prompt length when there is no history at all, which is
+  enough to rank).
+- LengthScheduler: dispatch order for concurrent_dispatch, plus per-sample
+  wall times. Since the same run cannot also be measured in dataset order,
+  the makespan of both orders is simulated by list-scheduling the measured
+  per-sample durations on `concurrency` slots; the relative difference is
+  reported as the improvement.
+"""
+import json
+import glob
+import threading
+from pathlib import Path
+
+from .journal import QUESTION_ID_KEY, question_id_for
+
+ANSWER_FIELDS = ("Correct Answer", "Incorrect Answer 1", "Incorrect Answer 2", "Incorrect Answer 3")
+
+
+def prompt_chars(row: dict) -> int:
+    """Characters of the question and its choices (the part of the prompt that varies)"""
+    return len(row.get("Question", "")) + sum(len(str(row.get(field, ""))) for field in ANSWER_FIELDS)
+
+
+def find_journals(output_dir, model_name=None):
+    """Journal files of earlier runs: the model's own if it has any, otherwise every model's"""
+    output_dir = Path(output_dir)
+    if model_name:
+        own = sorted(glob.glob(str(output_dir / model_name / "gpqa_*" / "*" / "journal_*.jsonl")))
+        if own:
+            return own
+    return sorted(glob.glob(str(output_dir / "*" / "gpqa_*" / "*" / "journal_*.jsonl")))
+
+
+class LengthPredictor:
+    """Expected completion tokens per question from earlier runs, prompt length as fallback"""
+
+    def __init__(self):
+        self._tokens = {}  # question_id -> [completion_tokens, ...]
+        self._prompt_chars = {}  # question_id -> prompt chars (for the fallback fit)
+
+    def add_records(self, records):
+        """Add journal records (dicts with question_id and usage.completion_tokens)"""
+        for record in records:
+            usage = record.get("usage") or {}
+            tokens = usage.get("completion_tokens")
+            # Responses stopped at the answer say nothing about the full length
+            if tokens is None or record.get("question_id") is None or record.get("truncated"):
+                continue
+            self._tokens.setdefault(record["question_id"], []).append(tokens)
+
+    def load_journals(self, paths):
+        """Read journal JSONL files; returns the number of records used"""
+        before = self.records
+        for path in paths:
+            records = []
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # Torn last line
+            self.add_records(records)
+        return self.records - before
+
+    @property
+    def records(self):
+        return sum(len(v) for v in self._tokens.values())
+
+    @property
+    def questions(self):
+        return len(self._tokens)
+
+    def _ratio(self):
+        """Least-squares output tokens per prompt char over questions with history (None without)"""
+        pairs = [
+            (self._prompt_chars[qid], sum(tokens) / len(tokens))
+            for qid, tokens in self._tokens.items() if qid in self._prompt_chars
+        ]
+        denominator = sum(x * x for x, _ in pairs)
+        return sum(x * y for x, y in pairs) / denominator if denominator else None
+
+    def predict_all(self, rows):
+        """
+        Expected output tokens of each row
+
+        Returns:
+            (predictions, number of rows predicted from history)
+        """
+        qids = [row.get(QUESTION_ID_KEY) or question_id_for(row) for row in rows]
+        for qid, row in zip(qids, rows):
+            self._prompt_chars.setdefault(qid, prompt_chars(row))
+        ratio = self._ratio() or 1.0
+
+        predictions = []
+        from_history = 0
+        for qid, row in zip(qids, rows):
+            tokens = self._tokens.get(qid)
+            if tokens:
+                predictions.append(sum(tokens) / len(tokens))
+                from_history += 1
+            else:
+                predictions.append(ratio * self._prompt_chars[qid])
+        return predictions, from_history
+
+
+def simulate_makespan(durations, order, slots):
+    """Makespan of greedy list scheduling: each job in `order` starts on the first free slot"""
+    finish = [0.0] * max(1, min(slots, len(durations)))
+    for i in order:
+        slot = min(range(len(finish)), key=finish.__getitem__)
+        finish[slot] += durations[i]
+    return max(finish) if durations else 0.0
+
+
+class LengthScheduler:
+    """Longest-expected-first dispatch order with makespan accounting"""
+
+    def __init__(self, predictor: LengthPredictor, concurrency: int):
+        self.predictor = predictor
+        self.concurrency = concurrency
+        self.dispatches = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def order(self, rows):
+        """Indices of `rows` in dispatch order (longest expected output first, ties in dataset order)"""
+        predictions, from_history = self.predictor.predict_all(rows)
+        self._pending = {"samples": len(rows), "from_history": from_history}
+        return sorted(range(len(rows)), key=lambda i: -predictions[i])
+
+    def record(self, order, spans, wall_s):
+        """
+        Account one dispatch
+
+        Args:
+            order: dispatch order returned by order()
+            spans: (start_s, end_s) of every row, by input index
+            wall_s: measured makespan of the dispatch
+        """
+        durations = [end - start for start, end in spans]
+        naive = simulate_makespan(durations, range(len(durations)), self.concurrency)
+        scheduled = simulate_makespan(durations, order, self.concurrency)
+        with self._lock:
+            self.dispatches.append({
+                **self._pending,
+                "wall_s": wall_s,
+                "simulated_naive_s": naive,
+                "simulated_scheduled_s": scheduled,
+                "lower_bound_s": max(max(durations, default=0.0), sum(durations) / max(1, self.concurrency)),
+            })
+
+    def summary(self) -> dict:
+        """Totals over all dispatches (adaptive runs dispatch once per round)"""
+        def total(key):
+            return sum(d[key] for d in self.dispatches)
+
+        naive = total("simulated_naive_s")
+        scheduled = total("simulated_scheduled_s")
+        return {
+            "policy": "longest_first",
+            "concurrency": self.concurrency,
+            "history_records": self.predictor.records,
+            "samples": total("samples"),
+            "predicted_from_history": total("from_history"),
+            "wall_s": total("wall_s"),
+            "simulated_naive_s": naive,
+            "simulated_scheduled_s": scheduled,
+            "lower_bound_s": total("lower_bound_s"),
+            "improvement": (naive - scheduled) / naive if naive > 0 else 0.0,
+            "dispatches": self.dispatches,
+        }
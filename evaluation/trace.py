@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Request trace recording for GPQA runs
+
+Every request that reaches the server is logged with its arrival offset
+(seconds since the first recorded request), prompt and output token counts
+(from the server's usage) and end-to-end latency. Samples replayed from the
+journal or answered from the response cache never reach the server and are
+not recorded. performance/trace_replay.py replays the trace against any model
+with the same arrival pattern and length distribution.
+
+Trace format (JSONL, one request per line, in completion order):
+    {"arrival_s": 0.0, "prompt_tokens": 312, "output_tokens": 4188, "latency_s": 61.2,
+     "question_id": "rec...", "repeat": 0}
+"""
+import json
+import time
+import threading
+from pathlib import Path
+
+from .journal import usage_to_dict
+
+
+class TraceRecorder:
+    """Thread-safe append-only JSONL request trace"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self._origin = None
+        self._lock = threading.Lock()
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def now(self):
+        """Offset of the current time from the first request (starts the clock on first use)"""
+        with self._lock:
+            now = time.perf_counter()
+            if self._origin is None:
+                self._origin = now
+            return now - self._origin
+
+    def record(self, arrival_s: float, usage, latency_s: float, key=None):
+        """Log one completed request; skipped if the server returned no usage"""
+        usage = usage_to_dict(usage) or {}
+        if usage.get("prompt_tokens") is None or usage.get("completion_tokens") is None:
+            return
+        row = {
+            "arrival_s": round(arrival_s, 6),
+            "prompt_tokens": usage["prompt_tokens"],
+            "output_tokens": usage["completion_tokens"],
+            "latency_s": round(latency_s, 6),
+        }
+        if key is not None:
+            row["question_id"], row["repeat"] = key
+        with self._lock:
+            self._file.write(json.dumps(row) + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def summary(self) -> dict:
+        return {"path": str(self.path), "requests": self.recorded}
@@ -1,213 +1,229 @@
 #!/usr/bin/env python3
 """
-Analyze benchmark results from result.jsonl and generate markdown report
+Analyze benchmark results from result.jsonl (via the results store) and generate markdown report
+
+Sections are rebuilt per configuration only when its result rows changed
+(report_cache.py manifest); --force rebuilds everything.
 """
 
-import json
+import sys
+import argparse
 from pathlib import Path
 from collections import defaultdict
 from typing import Dict, List, Any
-import statistics
-
 
-def parse_result_file(result_file: Path) -> List[Dict[str, Any]]:
-    """Parse result.jsonl file"""
-    results = []
-    with open(result_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                results.append(json.loads(line))
-    return results
+sys.path.insert(0, str(Path(__file__).parent))
+from results_store import open_store
+from report_cache import ReportManifest, digest, select_digests, source_digest
 
+METRICS = ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']
 
-def extract_model_name(run_name: str) -> str:
-    """Extract model name from run_name (e.g., 'w8a8_smooth_ptq_run1' -> 'w8a8_smooth_ptq')"""
-    parts = run_name.rsplit('_run', 1)
-    return parts[0] if len(parts) > 1 else run_name
 
-
-def group_by_config_and_model(results: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, List[Dict]]]:
+def group_by_config_and_model(store, shapes=None) -> Dict[tuple, Dict[str, Dict[str, Any]]]:
     """
-    Group results by configuration and model
-    Returns: {(batch_size, input_len, output_len): {model_name: [result1, result2, ...]}}
+    Per-model statistics for every configuration (or only the given shapes), aggregated in the results store
+    Returns: {(batch_size, input_len, output_len): {model_name: analysis}}
     """
-    grouped = defaultdict(lambda: defaultdict(list))
+    runs = defaultdict(list)
+    for run in store.runs(shapes=shapes):
+        runs[(run['batch_size'], run['input_len'], run['output_len'], run['model'])].append(
+            {'run_name': run['run_name'], **{m: run[m] for m in METRICS if run[m] is not None}}
+        )
     
-    for result in results:
-        config = (result['batch_size'], result['input_len'], result['output_len'])
-        model_name = extract_model_name(result['run_name'])
-        grouped[config][model_name].append(result)
+    grouped = defaultdict(dict)
+    for group in store.aggregate(METRICS, shapes=shapes):
+        config = (group['batch_size'], group['input_len'], group['output_len'])
+        analysis = {
+            'run_count': group['count'],
+            'runs': runs[(*config, group['model'])],
+        }
+        for metric in METRICS:
+            if metric in group:
+                analysis[metric] = {'mean': group[metric]['mean'], 'std': group[metric]['std'],
+                                    'count': group[metric]['n']}
+        grouped[config][group['model']] = analysis
     
     return grouped
 
 
-def calculate_stats(values: List[float]) -> Dict[str, float]:
-    """Calculate mean and std for a list of values"""
-    if not values:
-        return {'mean': 0.0, 'std': 0.0, 'count': 0}
-    
-    return {
-        'mean': statistics.mean(values),
-        'std': statistics.stdev(values) if len(values) > 1 else 0.0,
-        'count': len(values)
-    }
+def format_value(value: float, std: float = None) -> str:
+    """Format value with optional std"""
+    if std is not None and std > 0:
+        return f"{value:.2f} ± {std:.2f}"
+    else:
+        return f"{value:.2f}"
 
 
-def analyze_model_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze results for a single model"""
-    metrics = ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']
+def config_section(config: tuple, models: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Summary table and per-model details of one configuration"""
+    batch_size, input_len, output_len = config
+    md_lines = []
+    
+    md_lines.append(f"\n## Configuration: batch_size={batch_size}, input_len={input_len}, output_len={output_len}\n")
+    md_lines.append(f"**Total models tested:** {len(models)}\n")
+    
+    model_stats = models
+    
+    # Summary table
+    md_lines.append("\n### Summary Table\n")
+    md_lines.append("| Model | Runs | Latency (s) | Output Throughput (tok/s) | Overall Throughput (tok/s) | Input Throughput (tok/s) |")
+    md_lines.append("|-------|------|-------------|---------------------------|----------------------------|--------------------------|")
+    
+    # Sort models by output_throughput (descending)
+    sorted_models = sorted(
+        model_stats.items(),
+        key=lambda x: x[1].get('output_throughput', {}).get('mean', 0),
+        reverse=True
+    )
+    
+    for model_name, stats in sorted_models:
+        runs = stats['run_count']
+    
+        # Format metrics with mean ± std
+        latency = format_value(
+            stats.get('latency', {}).get('mean', 0),
+            stats.get('latency', {}).get('std', 0)
+        )
+    
+        output_throughput = format_value(
+            stats.get('output_throughput', {}).get('mean', 0),
+            stats.get('output_throughput', {}).get('std', 0)
+        )
+    
+        overall_throughput = format_value(
+            stats.get('overall_throughput', {}).get('mean', 0),
+            stats.get('overall_throughput', {}).get('std', 0)
+        )
+    
+        input_throughput = format_value(
+            stats.get('input_throughput', {}).get('mean', 0),
+            stats.get('input_throughput', {}).get('std', 0)
+        )
+    
+        md_lines.append(
+            f"| `{model_name}` | {runs} | {latency} | {output_throughput} | {overall_throughput} | {input_throughput} |"
+        )
+    
+    # Detailed breakdown for each model
+    md_lines.append("\n### Detailed Results\n")
+    
+    for model_name, stats in sorted(model_stats.items()):
+        md_lines.append(f"\n#### {model_name}\n")
+        md_lines.append(f"- **Total runs:** {stats['run_count']}\n")
+    
+        # Individual runs
+        md_lines.append("- **Individual runs:**\n")
+        for run in stats['runs']:
+            run_name = run['run_name']
+            md_lines.append(f"  - `{run_name}`:")
     
-    analysis = {
-        'run_count': len(results),
-        'runs': []
-    }
+            latency_val = run.get('latency')
+            md_lines.append(f"    - Latency: {latency_val:.2f}s" if latency_val is not None else "    - Latency: N/A")
     
-    # Collect all runs
-    for result in results:
-        run_data = {'run_name': result['run_name']}
-        for metric in metrics:
-            if metric in result:
-                run_data[metric] = result[metric]
-        analysis['runs'].append(run_data)
+            output_tp = run.get('output_throughput')
+            md_lines.append(f"    - Output Throughput: {output_tp:.2f} tok/s" if output_tp is not None else "    - Output Throughput: N/A")
     
-    # Calculate statistics for each metric
-    for metric in metrics:
-        values = [r[metric] for r in results if metric in r]
-        if values:
-            analysis[metric] = calculate_stats(values)
+            overall_tp = run.get('overall_throughput')
+            md_lines.append(f"    - Overall Throughput: {overall_tp:.2f} tok/s" if overall_tp is not None else "    - Overall Throughput: N/A")
     
-    return analysis
+            input_tp = run.get('input_throughput')
+            md_lines.append(f"    - Input Throughput: {input_tp:.2f} tok/s" if input_tp is not None else "    - Input Throughput: N/A")
+    
+        # Statistics
+        md_lines.append("- **Statistics:**\n")
+        for metric in ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']:
+            if metric in stats:
+                metric_stats = stats[metric]
+                metric_display = metric.replace('_', ' ').title()
+                md_lines.append(
+                    f"  - {metric_display}: {metric_stats['mean']:.2f} ± {metric_stats['std']:.2f}"
+                )
+    
+    return md_lines
 
 
-def format_value(value: float, std: float = None) -> str:
-    """Format value with optional std"""
-    if std is not None and std > 0:
-        return f"{value:.2f} ± {std:.2f}"
-    else:
-        return f"{value:.2f}"
+def ranking_section(config: tuple, models: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Output-throughput ranking of one configuration"""
+    md_lines = []
+    batch_size, input_len, output_len = config
+    
+    # Calculate average output_throughput for each model
+    model_perf = []
+    for model_name, stats in models.items():
+        avg_throughput = stats.get('output_throughput', {}).get('mean', 0)
+        model_perf.append((model_name, avg_throughput))
+    
+    # Sort by throughput (descending)
+    model_perf.sort(key=lambda x: x[1], reverse=True)
+    
+    md_lines.append(f"\n### Configuration: batch_size={batch_size}, input_len={input_len}, output_len={output_len}\n")
+    
+    for rank, (model_name, throughput) in enumerate(model_perf, 1):
+        emoji = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"{rank}."
+        md_lines.append(f"{emoji} **{model_name}**: {throughput:.2f} tok/s")
+    
+    return md_lines
 
 
-def generate_markdown_report(grouped_results: Dict[tuple, Dict[str, List[Dict]]]) -> str:
-    """Generate markdown report from grouped results"""
+def generate_markdown_report(sections: List[Dict[str, Any]]) -> str:
+    """Assemble the report from per-configuration sections (sorted by configuration)"""
     
     md_lines = ["# Performance Benchmark Results\n"]
     md_lines.append(f"**Generated from:** `result.jsonl`\n")
     md_lines.append("---\n")
     
-    for config, models in sorted(grouped_results.items()):
-        batch_size, input_len, output_len = config
-        
-        md_lines.append(f"\n## Configuration: batch_size={batch_size}, input_len={input_len}, output_len={output_len}\n")
-        md_lines.append(f"**Total models tested:** {len(models)}\n")
-        
-        # Analyze each model
-        model_stats = {}
-        for model_name, results in models.items():
-            model_stats[model_name] = analyze_model_results(results)
-        
-        # Summary table
-        md_lines.append("\n### Summary Table\n")
-        md_lines.append("| Model | Runs | Latency (s) | Output Throughput (tok/s) | Overall Throughput (tok/s) | Input Throughput (tok/s) |")
-        md_lines.append("|-------|------|-------------|---------------------------|----------------------------|--------------------------|")
-        
-        # Sort models by output_throughput (descending)
-        sorted_models = sorted(
-            model_stats.items(),
-            key=lambda x: x[1].get('output_throughput', {}).get('mean', 0),
-            reverse=True
-        )
-        
-        for model_name, stats in sorted_models:
-            runs = stats['run_count']
-            
-            # Format metrics with mean ± std
-            latency = format_value(
-                stats.get('latency', {}).get('mean', 0),
-                stats.get('latency', {}).get('std', 0)
-            )
-            
-            output_throughput = format_value(
-                stats.get('output_throughput', {}).get('mean', 0),
-                stats.get('output_throughput', {}).get('std', 0)
-            )
-            
-            overall_throughput = format_value(
-                stats.get('overall_throughput', {}).get('mean', 0),
-                stats.get('overall_throughput', {}).get('std', 0)
-            )
-            
-            input_throughput = format_value(
-                stats.get('input_throughput', {}).get('mean', 0),
-                stats.get('input_throughput', {}).get('std', 0)
-            )
-            
-            md_lines.append(
-                f"| `{model_name}` | {runs} | {latency} | {output_throughput} | {overall_throughput} | {input_throughput} |"
-            )
-        
-        # Detailed breakdown for each model
-        md_lines.append("\n### Detailed Results\n")
-        
-        for model_name, stats in sorted(model_stats.items()):
-            md_lines.append(f"\n#### {model_name}\n")
-            md_lines.append(f"- **Total runs:** {stats['run_count']}\n")
-            
-            # Individual runs
-            md_lines.append("- **Individual runs:**\n")
-            for run in stats['runs']:
-                run_name = run['run_name']
-                md_lines.append(f"  - `{run_name}`:")
-                
-                latency_val = run.get('latency')
-                md_lines.append(f"    - Latency: {latency_val:.2f}s" if latency_val is not None else "    - Latency: N/A")
-                
-                output_tp = run.get('output_throughput')
-                md_lines.append(f"    - Output Throughput: {output_tp:.2f} tok/s" if output_tp is not None else "    - Output Throughput: N/A")
-                
-                overall_tp = run.get('overall_throughput')
-                md_lines.append(f"    - Overall Throughput: {overall_tp:.2f} tok/s" if overall_tp is not None else "    - Overall Throughput: N/A")
-                
-                input_tp = run.get('input_throughput')
-                md_lines.append(f"    - Input Throughput: {input_tp:.2f} tok/s" if input_tp is not None else "    - Input Throughput: N/A")
-            
-            # Statistics
-            md_lines.append("- **Statistics:**\n")
-            for metric in ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']:
-                if metric in stats:
-                    metric_stats = stats[metric]
-                    metric_display = metric.replace('_', ' ').title()
-                    md_lines.append(
-                        f"  - {metric_display}: {metric_stats['mean']:.2f} ± {metric_stats['std']:.2f}"
-                    )
+    for section in sections:
+        md_lines.extend(section['config'])
     
     # Performance ranking
     md_lines.append("\n---\n")
     md_lines.append("\n## Performance Ranking (by Output Throughput)\n")
     
-    for config, models in sorted(grouped_results.items()):
-        batch_size, input_len, output_len = config
-        
-        # Calculate average output_throughput for each model
-        model_perf = []
-        for model_name, results in models.items():
-            stats = analyze_model_results(results)
-            avg_throughput = stats.get('output_throughput', {}).get('mean', 0)
-            model_perf.append((model_name, avg_throughput))
-        
-        # Sort by throughput (descending)
-        model_perf.sort(key=lambda x: x[1], reverse=True)
-        
-        md_lines.append(f"\n### Configuration: batch_size={batch_size}, input_len={input_len}, output_len={output_len}\n")
-        
-        for rank, (model_name, throughput) in enumerate(model_perf, 1):
-            emoji = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"{rank}."
-            md_lines.append(f"{emoji} **{model_name}**: {throughput:.2f} tok/s")
+    for section in sections:
+        md_lines.extend(section['ranking'])
     
     return "\n".join(md_lines)
 
 
+def build_sections(store, output_file: Path, force: bool = False) -> List[Dict[str, Any]]:
+    """Per-configuration sections, re-aggregating only configurations whose rows changed"""
+    manifest = ReportManifest("analyze_results", force=force)
+    group_digests = store.group_digests()
+    code = source_digest(__file__)
+    configs = sorted({key[1:] for key in group_digests})
+    
+    targets, stale = {}, []
+    for config in configs:
+        target = "config_{}x{}x{}".format(*config)
+        targets[config] = (target, digest(code, select_digests(group_digests, shapes={config})))
+        if not manifest.is_fresh(target, targets[config][1], [output_file]):
+            stale.append(config)
+    
+    grouped = group_by_config_and_model(store, shapes=stale) if stale else {}
+    sections = []
+    for config in configs:
+        target, target_digest = targets[config]
+        if config in grouped:
+            models = grouped[config]
+            section = {'config': config_section(config, models), 'ranking': ranking_section(config, models)}
+            manifest.record(target, target_digest, section)
+        else:
+            section = manifest.cached(target)
+        print(f"  - Config (batch={config[0]}, input={config[1]}, output={config[2]}): "
+              f"{'rebuilt' if config in grouped else 'unchanged'}")
+        sections.append(section)
+    
+    manifest.prune(target for target, _ in targets.values())
+    manifest.save()
+    print(f"📋 {len(configs)} configuration(s): {manifest.summary()}")
+    return sections
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark_analysis.md from the results store")
+    parser.add_argument("--force", action="store_true", help="Rebuild every section, ignoring the manifest")
+    args = parser.parse_args()
+    
     # Paths
     script_dir = Path(__file__).parent
     project_root = script_dir.parent
@@ -221,20 +237,16 @@ def main():
     
     print(f"📊 Analyzing results from: {result_file}")
     
-    # Parse results
-    results = parse_result_file(result_file)
-    print(f"✅ Parsed {len(results)} benchmark results")
-    
-    # Group by configuration and model
-    grouped = group_by_config_and_model(results)
-    print(f"📋 Found {len(grouped)} configuration(s)")
+    # Ingest new rows and aggregate in the results store
+    store = open_store()
+    print(f"✅ {store.count()} benchmark results in {store.db_file.name}")
     
-    for config, models in grouped.items():
-        batch_size, input_len, output_len = config
-        print(f"  - Config (batch={batch_size}, input={input_len}, output={output_len}): {len(models)} models")
+    # Per-configuration sections, reusing the unchanged ones
+    sections = build_sections(store, output_file, args.force)
+    store.close()
     
     # Generate markdown report
-    markdown = generate_markdown_report(grouped)
+    markdown = generate_markdown_report(sections)
     
     # Save report
     with open(output_file, 'w') as f:
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 """
-Generate a summary report for selected models with mean ± max deviation.
+Generate a summary report for selected models: mean ± 95% bootstrap CI
+half-width and the speedup vs BF16 with its CI (stats.py).
+Memory footprint rows (memory_report.py) are joined next to the speedup.
+Per-model tables are only re-aggregated when that model's results changed
+(report_cache.py manifest); --force rebuilds everything.
 """
 
+import sys
 import json
+import argparse
 from pathlib import Path
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).parent))
+from results_store import RESULT_FILE, open_store
+from report_cache import ReportManifest, digest, select_digests, source_digest
+from stats import CONFIDENCE, LOW_CONFIDENCE_N, describe, speedup_ci
+
 # Configuration
-RESULT_FILE = Path(__file__).parent.parent / "result.jsonl"
 OUTPUT_FILE = Path(__file__).parent / "summary_report.md"
+MEMORY_RESULT_FILE = Path(__file__).parent.parent / "memory_result.jsonl"
 
 # Selected models (match the naming in result.jsonl)
 SELECTED_MODELS = {
@@ -30,101 +41,169 @@ CONFIG_NAMES = {
     (1, 16384, 32): "Ultra-Long Context (1,16384,32)"
 }
 
-def load_results():
-    """Load and parse result.jsonl"""
-    results = []
-    with open(RESULT_FILE, 'r') as f:
+METRICS = ["latency", "output_throughput", "overall_throughput"]
+
+# Configuration the speedup in the memory table refers to
+SPEEDUP_CONFIG = (32, 256, 32)
+
+def load_memory_results():
+    """Latest memory_report.py row per model (empty if the report was never run)"""
+    latest = {}
+    if not MEMORY_RESULT_FILE.exists():
+        return latest
+    with open(MEMORY_RESULT_FILE, 'r') as f:
         for line in f:
             if line.strip():
-                results.append(json.loads(line))
-    return results
-
-def extract_model_name(run_name):
-    """Extract model name from run_name (remove _runX suffix and config suffix)"""
-    # Remove _runX suffix
-    for suffix in ["_run1", "_run2", "_run3"]:
-        if run_name.endswith(suffix):
-            run_name = run_name[:-len(suffix)]
-            break
-    
-    # Remove config suffixes (must match actual run_name format)
-    config_suffixes = [
-        "_base",
-        "_interactive", 
-        "_prefill_bound",
-        "_decode_bound",
-        "_medium_batch",
-        "_high_concurrency",
-        "_long_context"
-    ]
-    for suffix in config_suffixes:
-        if run_name.endswith(suffix):
-            run_name = run_name[:-len(suffix)]
-            break
-    
-    return run_name
-
-def compute_max_deviation(values):
-    """Compute max deviation: Max(max - avg, avg - min)"""
-    if not values:
-        return 0.0
-    avg = sum(values) / len(values)
-    max_val = max(values)
-    min_val = min(values)
-    return max(max_val - avg, avg - min_val)
-
-def organize_data(results):
-    """Organize results by model and configuration"""
-    # Structure: model -> config -> metric -> [values]
-    data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    
+                row = json.loads(line)
+                latest[row["model"]] = row
+    return latest
+
+def organize_data(store, models=None, shapes=None):
+    """
+    Statistics of the selected models (or a subset) per configuration, from the results store
+    Structure: model -> config -> metric -> stats.describe() dict (+ "values", the runs)
+    """
+    runs = defaultdict(lambda: defaultdict(list))
     skipped_configs = set()
     processed_count = 0
-    skipped_model_count = 0
     skipped_config_count = 0
     
-    for result in results:
-        run_name = result.get("run_name", "")
-        model_name = extract_model_name(run_name)
-        
-        # Skip if not in selected models
-        if model_name not in SELECTED_MODELS:
-            skipped_model_count += 1
-            continue
-        
-        # Get configuration
-        batch_size = result.get("batch_size")
-        input_len = result.get("input_len")
-        output_len = result.get("output_len")
-        config_key = (batch_size, input_len, output_len)
+    columns = store.columns(["model", "batch_size", "input_len", "output_len", *METRICS],
+                            models=models or list(SELECTED_MODELS), shapes=shapes)
+    for row in zip(*columns.values()):
+        row = dict(zip(columns, row))
+        config_key = (int(row["batch_size"]), int(row["input_len"]), int(row["output_len"]))
         
         # Skip if config not recognized
         if config_key not in CONFIG_NAMES:
-            skipped_configs.add((config_key, run_name))
+            skipped_configs.add((config_key, row["model"]))
             skipped_config_count += 1
             continue
         
-        # Extract metrics
-        metrics = {
-            "latency": result.get("latency"),
-            "output_throughput": result.get("output_throughput"),
-            "overall_throughput": result.get("overall_throughput")
-        }
-        
-        # Add to data structure
-        for metric, value in metrics.items():
-            if value is not None:
-                data[model_name][config_key][metric].append(value)
-        
+        runs[(str(row["model"]), config_key)]["_count"].append(1)
+        for metric in METRICS:
+            if row[metric] is not None:
+                runs[(str(row["model"]), config_key)][metric].append(float(row[metric]))
         processed_count += 1
     
+    data = defaultdict(dict)
+    for (model_key, config_key), metrics in runs.items():
+        data[model_key][config_key] = {
+            metric: dict(describe(values), values=values)
+            for metric, values in metrics.items() if metric != "_count" and values
+        }
+    
     print(f"  Processed: {processed_count} results")
-    print(f"  Skipped: {skipped_model_count} (other models) + {skipped_config_count} (unrecognized configs)")
+    if models is None and shapes is None:
+        skipped_model_count = store.count() - processed_count - skipped_config_count
+        print(f"  Skipped: {skipped_model_count} (other models) + {skipped_config_count} (unrecognized configs)")
     
     return data
 
-def generate_markdown(data):
-    """Generate markdown report"""
+def mean_metric(data, model_key, config_key, metric):
+    return data.get(model_key, {}).get(config_key, {}).get(metric, {}).get("mean")
+
+def generate_speedup_section(data):
+    """Output-throughput speedup vs BF16 per configuration with bootstrap CIs"""
+    models = [m for m in SELECTED_MODELS if m != "original" and m in data]
+    lines = []
+    lines.append("## Speedup vs BF16 Baseline")
+    lines.append("")
+    lines.append(f"*Output throughput ratio, {CONFIDENCE:.0%} bootstrap CI; "
+                 f"✓ = CI excludes 1.00x (significant); † = fewer than {LOW_CONFIDENCE_N} runs on a side, "
+                 f"low-confidence interval*")
+    lines.append("")
+    lines.append("| Configuration | " + " | ".join(SELECTED_MODELS[m] for m in models) + " |")
+    lines.append("|--------------|" + "|".join("-" * (len(SELECTED_MODELS[m]) + 2) for m in models) + "|")
+    for config_key, config_name in CONFIG_NAMES.items():
+        base = data.get("original", {}).get(config_key, {}).get("output_throughput")
+        if base is None:
+            continue
+        cells = []
+        for model_key in models:
+            tput = data[model_key].get(config_key, {}).get("output_throughput")
+            if tput is None:
+                cells.append("N/A")
+                continue
+            result = speedup_ci(tput["values"], base["values"])
+            mark = (" ✓" if result["significant"] else "") + (" †" if result["low_confidence"] else "")
+            cells.append(f"{result['speedup']:.2f}x [{result['ci_low']:.2f}, {result['ci_high']:.2f}]{mark}")
+        lines.append(f"| {config_name} | " + " | ".join(cells) + " |")
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+    return lines
+
+def generate_memory_section(data, memory):
+    """Memory footprint table: size, weight memory and KV capacity next to the throughput speedup"""
+    lines = []
+    baseline = memory.get("original")
+    base_tput = mean_metric(data, "original", SPEEDUP_CONFIG, "output_throughput")
+    
+    lines.append("## Memory Footprint")
+    lines.append("")
+    first = next(iter(memory.values()))
+    lines.append(f"*KV capacity at {first['gpu_memory_gb']:.0f} GB × {first['mem_fraction']} for weights + KV cache, "
+                 f"concurrent sequences at {first['context_len']} tokens; "
+                 f"speedup = output throughput vs BF16 on {CONFIG_NAMES[SPEEDUP_CONFIG]}*")
+    lines.append("")
+    lines.append("| Model | On-disk (GB) | Weights (GB) | Bytes/Param | KV Capacity (tokens) | KV Gain | Max Seqs | Cold Load (s) | Speedup |")
+    lines.append("|-------|--------------|--------------|-------------|----------------------|---------|----------|---------------|---------|")
+    for model_key, model_display_name in SELECTED_MODELS.items():
+        row = memory.get(model_key)
+        if row is None:
+            continue
+        kv_gain = (f"{row['kv_capacity_tokens'] / baseline['kv_capacity_tokens']:.2f}x"
+                   if baseline and baseline["kv_capacity_tokens"] else "N/A")
+        tput = mean_metric(data, model_key, SPEEDUP_CONFIG, "output_throughput")
+        speedup = f"{tput / base_tput:.2f}x" if tput and base_tput else "N/A"
+        cold = f"{row['cold_load_s']:.2f}" if row.get("cold_load_s") is not None else "N/A"
+        lines.append(f"| {model_display_name} | {row['disk_bytes'] / 1e9:.2f} | {row['weight_bytes'] / 1e9:.2f} | "
+                     f"{row['bytes_per_param']:.2f} | {row['kv_capacity_tokens']:,} | {kv_gain} | "
+                     f"{row['max_concurrent_seqs']} | {cold} | {speedup} |")
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+    return lines
+
+def model_section(model_key, configs):
+    """Table of one model: mean ± CI half-width per configuration"""
+    lines = []
+    model_display_name = SELECTED_MODELS[model_key]
+    
+    lines.append(f"## {model_display_name}")
+    lines.append("")
+    
+    # Table header
+    lines.append("| Configuration | Latency (s) | Output Throughput (tok/s) | Overall Throughput (tok/s) |")
+    lines.append("|--------------|-------------|---------------------------|----------------------------|")
+    
+    # For each configuration (in order)
+    for config_key in CONFIG_NAMES.keys():
+        config_name = CONFIG_NAMES[config_key]
+        
+        if config_key not in configs:
+            continue
+        
+        stats = configs[config_key]
+        
+        # Format row: mean ± CI half-width
+        cells = []
+        for metric in METRICS:
+            metric_stats = stats.get(metric)
+            cells.append(f"{metric_stats['mean']:.2f} ± {metric_stats['ci_half']:.2f}"
+                         + (" †" if metric_stats["low_confidence"] else "") if metric_stats else "N/A")
+        latency_str, output_str, overall_str = cells
+        
+        lines.append(f"| {config_name} | {latency_str} | {output_str} | {overall_str} |")
+    
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+    return lines
+
+def generate_markdown(sections, memory=None, speedup_data=None):
+    """Generate markdown report from the speedup and per-model sections"""
     lines = []
     
     # Header
@@ -134,65 +213,68 @@ def generate_markdown(data):
     for model_key, model_name in SELECTED_MODELS.items():
         lines.append(f"- {model_name}")
     lines.append("")
-    lines.append("**Metrics:** Mean ± Max Deviation")
+    lines.append(f"**Metrics:** Mean ± {CONFIDENCE:.0%} CI half-width")
     lines.append("")
-    lines.append("*Max Deviation = Max(max - avg, avg - min)*")
+    lines.append("*CI = bootstrap percentile interval of the mean over the runs (performance/stats.py); "
+                 f"† = fewer than {LOW_CONFIDENCE_N} runs, low-confidence interval*")
     lines.append("")
     lines.append("---")
     lines.append("")
     
+    if memory and any(model_key in memory for model_key in SELECTED_MODELS):
+        lines.extend(generate_memory_section(speedup_data, memory))
+    
+    lines.extend(sections.get("speedup", []))
+    
     # For each model
     for model_key in SELECTED_MODELS.keys():
-        model_display_name = SELECTED_MODELS[model_key]
-        
-        if model_key not in data:
-            continue
-        
-        lines.append(f"## {model_display_name}")
-        lines.append("")
-        
-        # Table header
-        lines.append("| Configuration | Latency (s) | Output Throughput (tok/s) | Overall Throughput (tok/s) |")
-        lines.append("|--------------|-------------|---------------------------|----------------------------|")
-        
-        # For each configuration (in order)
-        for config_key in CONFIG_NAMES.keys():
-            config_name = CONFIG_NAMES[config_key]
-            
-            if config_key not in data[model_key]:
-                continue
-            
-            metrics = data[model_key][config_key]
-            
-            # Calculate mean and max deviation for each metric
-            stats = {}
-            for metric in ["latency", "output_throughput", "overall_throughput"]:
-                if metric in metrics and metrics[metric]:
-                    values = metrics[metric]
-                    mean = sum(values) / len(values)
-                    max_dev = compute_max_deviation(values)
-                    stats[metric] = (mean, max_dev)
-                else:
-                    stats[metric] = (None, None)
-            
-            # Format row
-            latency_mean, latency_dev = stats["latency"]
-            output_mean, output_dev = stats["output_throughput"]
-            overall_mean, overall_dev = stats["overall_throughput"]
-            
-            latency_str = f"{latency_mean:.2f} ± {latency_dev:.2f}" if latency_mean is not None else "N/A"
-            output_str = f"{output_mean:.2f} ± {output_dev:.2f}" if output_mean is not None else "N/A"
-            overall_str = f"{overall_mean:.2f} ± {overall_dev:.2f}" if overall_mean is not None else "N/A"
-            
-            lines.append(f"| {config_name} | {latency_str} | {output_str} | {overall_str} |")
-        
-        lines.append("")
-        lines.append("---")
-        lines.append("")
+        if model_key in sections:
+            lines.extend(sections[model_key])
     
     return "\n".join(lines)
 
+def build_sections(store, force=False):
+    """Speedup and per-model tables, re-aggregating only the models whose results changed"""
+    manifest = ReportManifest("generate_summary_report", force=force)
+    group_digests = store.group_digests()
+    code = source_digest(__file__)
+    
+    digests = {}
+    for model_key in SELECTED_MODELS:
+        selected = select_digests(group_digests, models={model_key}, shapes=set(CONFIG_NAMES))
+        if selected:
+            digests[model_key] = digest(code, selected)
+    stale = [m for m in digests if not manifest.is_fresh(m, digests[m], [OUTPUT_FILE])]
+    
+    # The speedup table reads every model, so any change rebuilds it
+    speedup_digest = digest(code, select_digests(group_digests, set(SELECTED_MODELS), set(CONFIG_NAMES)))
+    speedup_stale = bool(digests) and not manifest.is_fresh("speedup", speedup_digest, [OUTPUT_FILE])
+    
+    load = list(digests) if speedup_stale else stale
+    data = organize_data(store, models=load) if load else {}
+    sections = {}
+    for model_key in digests:
+        if model_key in stale:
+            sections[model_key] = model_section(model_key, data.get(model_key, {}))
+            manifest.record(model_key, digests[model_key], sections[model_key])
+        else:
+            sections[model_key] = manifest.cached(model_key)
+    if speedup_stale:
+        sections["speedup"] = generate_speedup_section(data)
+        manifest.record("speedup", speedup_digest, sections["speedup"])
+    elif digests:
+        sections["speedup"] = manifest.cached("speedup")
+    
+    manifest.prune([*digests, "speedup"])
+    manifest.save()
+    print(f"Model tables: {manifest.summary()}")
+    return sections
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate summary_report.md from the results store")
+    parser.add_argument("--force", action="store_true", help="Rebuild every table, ignoring the manifest")
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("Generating Summary Report")
     print("=" * 80)
@@ -200,21 +282,26 @@ def main():
     
     # Load results
     print(f"Loading results from: {RESULT_FILE}")
-    results = load_results()
-    print(f"Loaded {len(results)} benchmark results")
+    store = open_store()
+    print(f"Loaded {store.count()} benchmark results")
     print()
     
     # Organize data
     print("Organizing data...")
-    data = organize_data(results)
-    print(f"Processed data for {len(data)} models")
-    for model_name in data:
-        print(f"  - {model_name}: {len(data[model_name])} configurations")
+    sections = build_sections(store, args.force)
     print()
     
+    # Memory footprint (optional, from memory_report.py)
+    memory = load_memory_results()
+    speedup_data = {}
+    if memory:
+        print(f"Loaded memory footprint for {len(memory)} models from: {MEMORY_RESULT_FILE}")
+        speedup_data = organize_data(store, shapes=[SPEEDUP_CONFIG])
+    store.close()
+    
     # Generate markdown
     print("Generating markdown report...")
-    markdown = generate_markdown(data)
+    markdown = generate_markdown(sections, memory, speedup_data)
     
     # Save to file
     with open(OUTPUT_FILE, 'w') as f:
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+In-process asyncio load generator for sglang servers
+- Sends synthetic prompts (random token ids) to the native /generate API
+- Closed-loop mode: fixed number of concurrent clients (batch_size = one closed batch)
+- Open-loop mode: Poisson arrivals at a given request rate
+- Returns structured metrics directly (no subprocess, no log parsing)
+"""
+
+import time
+import json
+import random
+import asyncio
+import argparse
+
+import aiohttp
+
+# Token ids are drawn from this range to stay clear of special tokens
+TOKEN_ID_RANGE = (1000, 30000)
+REQUEST_TIMEOUT_S = 3600
+PERCENTILES = (50, 90, 99)
+
+
+def synthetic_requests(num_requests, input_len, output_len, seed=0):
+    """Build `num_requests` request specs with random prompts of `input_len` tokens"""
+    rng = random.Random(seed)
+    low, high = TOKEN_ID_RANGE
+    return [
+        {
+            "input_ids": [rng.randint(low, high) for _ in range(input_len)],
+            "output_len": output_len,
+        }
+        for _ in range(num_requests)
+    ]
+
+
+async def send_request(session, base_url, spec):
+    """Send one streamed /generate request and time every chunk"""
+    payload = {
+        "input_ids": spec["input_ids"],
+        "sampling_params": {
+            "temperature": 0.0,
+            "max_new_tokens": spec["output_len"],
+            "ignore_eos": True,
+        },
+        "stream": True,
+    }
+    result = {
+        "success": False,
+        "prompt_tokens": len(spec["input_ids"]),
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "ttft": 0.0,
+        "latency": 0.0,
+        "itl": [],
+        "start": time.perf_counter(),
+        "error": "",
+    }
+    chunk_times = []
+    meta_info = {}
+    try:
+        async with session.post(f"{base_url}/generate", json=payload) as response:
+            if response.status != 200:
+                result["error"] = f"HTTP {response.status}: {await response.text()}"
+                return result
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                chunk_times.append(time.perf_counter())
+                meta_info = chunk.get("meta_info", meta_info)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        result["error"] = repr(e)
+        return result
+
+    end = time.perf_counter()
+    result["success"] = bool(chunk_times)
+    result["end"] = end
+    result["latency"] = end - result["start"]
+    if chunk_times:
+        result["ttft"] = chunk_times[0] - result["start"]
+        result["itl"] = [b - a for a, b in zip(chunk_times, chunk_times[1:])]
+    result["prompt_tokens"] = meta_info.get("prompt_tokens", result["prompt_tokens"])
+    result["completion_tokens"] = meta_info.get("completion_tokens", len(chunk_times))
+    result["cached_tokens"] = meta_info.get("cached_tokens", 0)
+    return result
+
+
+def _new_session(limit):
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_S)
+    return aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=limit))
+
+
+async def run_closed_loop(base_url, requests, concurrency):
+    """
+    `concurrency` clients each send their next request as soon as the previous one finishes
+
+    Results are returned in request order (not completion order), so callers
+    can zip them with the request specs.
+    """
+    queue = list(reversed(list(enumerate(requests))))
+    results = [None] * len(requests)
+
+    async def client(session):
+        while queue:
+            index, spec = queue.pop()
+            results[index] = await send_request(session, base_url, spec)
+
+    async with _new_session(concurrency) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(min(concurrency, len(requests)))))
+        duration = time.perf_counter() - start
+    return results, duration
+
+
+async def run_open_loop(base_url, requests, request_rate, seed=0, max_concurrency=None):
+    """
+    Send requests at Poisson arrival times (rate in requests/s, inf = all at once)
+
+    A spec with an "arrival" field (seconds from start) is sent at that offset
+    instead, which lets recorded traces be replayed with the same machinery.
+    """
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    offsets = []
+    clock = 0.0
+    for spec in requests:
+        if "arrival" in spec:
+            offsets.append(spec["arrival"])
+            continue
+        offsets.append(clock)
+        if request_rate != float("inf"):
+            clock += rng.expovariate(request_rate)
+
+    async def delayed(session, spec, offset, start):
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        if semaphore is None:
+            return await send_request(session, base_url, spec)
+        async with semaphore:
+            return await send_request(session, base_url, spec)
+
+    async with _new_session(max_concurrency or 0) as session:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            delayed(session, spec, offset, start) for spec, offset in zip(requests, offsets)
+        ))
+        duration = time.perf_counter() - start
+    return list(results), duration
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def _distribution(values, prefix):
+    ordered = sorted(values)
+    stats = {f"mean_{prefix}": sum(ordered) / len(ordered) if ordered else 0.0}
+    for q in PERCENTILES:
+        stats[f"p{q}_{prefix}"] = _percentile(ordered, q)
+    return stats
+
+
+def summarize_results(results, duration):
+    """Aggregate per-request results into throughput and latency metrics"""
+    ok = [r for r in results if r["success"]]
+    prompt_tokens = sum(r["prompt_tokens"] for r in ok)
+    completion_tokens = sum(r["completion_tokens"] for r in ok)
+    cached_tokens = sum(r["cached_tokens"] for r in ok)
+    metrics = {
+        "num_requests": len(results),
+        "completed": len(ok),
+        "failed": len(results) - len(ok),
+        "duration_s": duration,
+        "total_input_tokens": prompt_tokens,
+        "total_output_tokens": completion_tokens,
+        "request_throughput": len(ok) / duration if duration > 0 else 0.0,
+        "input_throughput": prompt_tokens / duration if duration > 0 else 0.0,
+        "output_throughput": completion_tokens / duration if duration > 0 else 0.0,
+        "overall_throughput": (prompt_tokens + completion_tokens) / duration if duration > 0 else 0.0,
+        "cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+    }
+    metrics.update(_distribution([r["ttft"] for r in ok], "ttft_s"))
+    metrics.update(_distribution([t for r in ok for t in r["itl"]], "itl_s"))
+    metrics.update(_distribution([r["latency"] for r in ok], "e2e_latency_s"))
+    tpot = [
+        (r["latency"] - r["ttft"]) / (r["completion_tokens"] - 1)
+        for r in ok if r["completion_tokens"] > 1
+    ]
+    metrics.update(_distribution(tpot, "tpot_s"))
+    errors = [r["error"] for r in results if r["error"]]
+    if errors:
+        metrics["first_error"] = errors[0]
+    return metrics
+
+
+def compute_goodput(results, duration, slo_ttft_s=None, slo_tpot_s=None):
+    """
+    Requests/s that completed within the latency SLO
+
+    A request counts towards goodput if it succeeded, its TTFT is within
+    slo_ttft_s and its time-per-output-token is within slo_tpot_s (None = no bound).
+    """
+    good = 0
+    for r in results:
+        if not r["success"]:
+            continue
+        if slo_ttft_s is not None and r["ttft"] > slo_ttft_s:
+            continue
+        if slo_tpot_s is not None and r["completion_tokens"] > 1:
+            tpot = (r["latency"] - r["ttft"]) / (r["completion_tokens"] - 1)
+            if tpot > slo_tpot_s:
+                continue
+        good += 1
+    return {
+        "goodput": good / duration if duration > 0 else 0.0,
+        "goodput_ratio": good / len(results) if results else 0.0,
+    }
+
+
+def run_load(base_url, requests, mode="closed", concurrency=1, request_rate=float("inf"),
+             max_concurrency=None, seed=0):
+    """
+    Run a load test and return (metrics, per-request results)
+
+    Args:
+        base_url: server address, e.g. http://127.0.0.1:30000
+        requests: request specs from synthetic_requests() (or replayed traces)
+        mode: "closed" (fixed concurrency) or "open" (Poisson arrivals)
+        concurrency: number of closed-loop clients
+        request_rate: open-loop arrival rate in requests/s
+        max_concurrency: optional cap on in-flight requests in open-loop mode
+        seed: seed of the arrival process
+    """
+    if mode == "closed":
+        results, duration = asyncio.run(run_closed_loop(base_url, requests, concurrency))
+    elif mode == "open":
+        results, duration = asyncio.run(
+            run_open_loop(base_url, requests, request_rate, seed=seed, max_concurrency=max_concurrency)
+        )
+    else:
+        raise ValueError(f"Unknown load mode: {mode}")
+    return summarize_results(results, duration), results
+
+
+async def _fetch_server_info(base_url):
+    try:
+        async with _new_session(1) as session:
+            async with session.get(f"{base_url}/get_server_info") as response:
+                if response.status == 200:
+                    return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    return {}
+
+
+def fetch_last_gen_throughput(base_url):
+    """Decode throughput the server reports for its most recent batch (0.0 if unavailable)"""
+    info = asyncio.run(_fetch_server_info(base_url))
+    states = info.get("internal_states") or [info]
+    return float(states[0].get("last_gen_throughput", 0.0) or 0.0)
+
+
+def run_batch_benchmark(base_url, batch_size, input_len, output_len, seed=0, warmup=True):
+    """
+    Closed single-batch benchmark (replacement for sglang.bench_one_batch_server)
+
+    All `batch_size` requests are sent at once. Throughput definitions follow
+    bench_one_batch_server: prefill is bounded by the slowest first token, and
+    decode throughput excludes it. Repeats must pass different seeds: the same
+    prompts again would be served from the radix cache.
+
+    Returns:
+        (metrics, per-request results); metrics keys match the previous
+        log-parsed format (latency_s, ttft_s, *_throughput)
+    """
+    if warmup:
+        # Own seed space, so the warmup prompt is no prefix of any measured prompt
+        run_load(base_url, synthetic_requests(1, min(input_len, 32), 8, seed=f"warmup{seed}"), concurrency=1)
+
+    requests = synthetic_requests(batch_size, input_len, output_len, seed=seed)
+    summary, results = run_load(base_url, requests, mode="closed", concurrency=batch_size)
+    ok = [r for r in results if r["success"]]
+    if len(ok) < batch_size:
+        return {}, results
+
+    latency = summary["duration_s"]
+    ttft = max(r["ttft"] for r in ok)
+    decode_time = latency - ttft
+    metrics = {
+        "latency_s": latency,
+        "ttft_s": ttft,
+        "input_throughput": batch_size * input_len / ttft if ttft > 0 else 0.0,
+        "output_throughput": batch_size * output_len / decode_time if decode_time > 0 else 0.0,
+        "overall_throughput": batch_size * (input_len + output_len) / latency if latency > 0 else 0.0,
+        "last_gen_throughput": fetch_last_gen_throughput(base_url),
+        "p99_itl_s": summary["p99_itl_s"],
+    }
+    return metrics, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native load generator for sglang servers")
+    parser.add_argument("--base-url", type=str, default="http://127.0.0.1:30000", help="Server address")
+    parser.add_argument("--mode", type=str, default="closed", choices=["closed", "open"], help="Load mode")
+    parser.add_argument("--num-prompts", type=int, default=32, help="Number of requests")
+    parser.add_argument("--concurrency", type=int, default=32, help="Closed-loop clients")
+    parser.add_argument("--request-rate", type=float, default=float("inf"), help="Open-loop requests/s")
+    parser.add_argument("--input-len", type=int, default=256, help="Prompt length in tokens")
+    parser.add_argument("--output-len", type=int, default=32, help="Generated tokens per request")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    requests = synthetic_requests(args.num_prompts, args.input_len, args.output_len, seed=args.seed)
+    metrics, _ = run_load(
+        args.base_url, requests, mode=args.mode,
+        concurrency=args.concurrency, request_rate=args.request_rate, seed=args.seed,
+    )
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Checkpoint size, memory footprint and load-time report
+
+For the BF16 baseline and every Qwen3-4B-Instruct-2507-INT8-* output directory:
+- on-disk bytes, and bytes / element count per stored dtype
+- bytes per logical parameter (quantization scales and metadata are counted as
+  overhead, not as parameters)
+- estimated resident weight memory (tensors as stored)
+- KV-cache capacity left on the GPU at a memory budget, in tokens and in
+  concurrent sequences at a context length
+- cold mmap load time: each shard is evicted from the page cache
+  (posix_fadvise DONTNEED) and then every page is touched through np.memmap.
+  A warm pass is timed as well.
+
+Rows are appended to memory_result.jsonl. generate_summary_report.py joins the
+latest row per model into summary_report.md, next to the throughput speedup.
+
+Usage:
+    python performance/memory_report.py [--base-dir /data/jisenli2/huggingface] [--gpu-memory 80]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from quantization.checkpoint_reader import Checkpoint
+
+MODEL_BASE_DIR = "/data/jisenli2/huggingface"
+ORIGINAL_MODEL = "Qwen/Qwen3-4B-Instruct-2507"
+QUANTIZED_PREFIX = "Qwen3-4B-Instruct-2507-INT8-"
+MEMORY_RESULT_FILE = Path(__file__).parent.parent / "memory_result.jsonl"
+
+MEMORY_CONFIG = {
+    "gpu_memory_gb": 80,  # A100-SXM4-80GB (see system_info.md)
+    "mem_fraction": 0.88,  # Share of GPU memory sglang reserves for weights + KV cache
+    "kv_dtype_bytes": 2,  # BF16 KV cache
+    "context_len": 4096,  # Sequence length for the concurrent-sequence estimate
+}
+
+# Tensors that describe quantized weights rather than being model parameters
+QUANT_METADATA_SUFFIXES = ("_scale", "_zero_point", "_g_idx", "weight_shape")
+PAGE_SIZE = 4096
+
+
+def model_name_from_dir(path):
+    """.../Qwen3-4B-Instruct-2507-INT8-W8A8-SMOOTH-PTQ -> w8a8_smooth_ptq (run_benchmark naming)"""
+    name = Path(path).name
+    if name.startswith(QUANTIZED_PREFIX):
+        return name[len(QUANTIZED_PREFIX):].lower().replace("-", "_")
+    return "original"
+
+
+def resolve_local(model):
+    """Local directory of a path or HF hub id (latest snapshot in the HF cache), or None"""
+    if Path(model).is_dir():
+        return Path(model)
+    hub_cache = Path(os.environ.get("HF_HOME", Path.home() / ".cache" / "huggingface")) / "hub"
+    snapshots = hub_cache / f"models--{model.replace('/', '--')}" / "snapshots"
+    if snapshots.is_dir():
+        candidates = sorted(snapshots.iterdir(), key=lambda p: p.stat().st_mtime)
+        if candidates:
+            return candidates[-1]
+    return None
+
+
+def shard_files(path):
+    return sorted(Path(path).glob("*.safetensors"))
+
+
+def kv_bytes_per_token(config, kv_dtype_bytes):
+    """K and V for every layer and KV head"""
+    head_dim = config.get("head_dim") or config["hidden_size"] // config["num_attention_heads"]
+    kv_heads = config.get("num_key_value_heads") or config["num_attention_heads"]
+    return 2 * config["num_hidden_layers"] * kv_heads * head_dim * kv_dtype_bytes
+
+
+def weight_footprint(ckpt):
+    """Bytes and elements per dtype, logical parameter count and quantization overhead"""
+    by_dtype = defaultdict(lambda: {"bytes": 0, "elements": 0})
+    params = 0
+    overhead_bytes = 0
+    for name in ckpt.names():
+        shape = ckpt.shape(name)
+        elements = int(np.prod(shape)) if shape else 1
+        nbytes = ckpt.nbytes(name)
+        dtype = ckpt.dtype(name)
+        by_dtype[dtype]["bytes"] += nbytes
+        by_dtype[dtype]["elements"] += elements
+        if name.endswith(QUANT_METADATA_SUFFIXES):
+            overhead_bytes += nbytes
+        elif name.endswith(".weight_packed"):
+            # Logical shape is stored next to the packed words
+            params += int(np.prod(ckpt.get(name[:-len("_packed")] + "_shape")))
+        else:
+            params += elements
+    total = sum(d["bytes"] for d in by_dtype.values())
+    return {
+        "by_dtype": {k: dict(v, bytes_per_element=v["bytes"] / v["elements"]) for k, v in sorted(by_dtype.items())},
+        "params": params,
+        "weight_bytes": total,
+        "quant_overhead_bytes": overhead_bytes,
+        "bytes_per_param": total / params if params else 0.0,
+    }
+
+
+def _evict(path):
+    """Drop a file's clean pages from the page cache (no root needed); False if unsupported"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def _touch_pages(path):
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    # One byte per page faults every page in
+    checksum = int(data[::PAGE_SIZE].sum(dtype=np.uint64))
+    del data
+    return checksum
+
+
+def time_mmap_load(path):
+    """Cold and warm time to fault in every page of every shard through mmap"""
+    files = shard_files(path)
+    evicted = all(_evict(f) for f in files)
+    start = time.perf_counter()
+    for f in files:
+        _touch_pages(f)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for f in files:
+        _touch_pages(f)
+    warm = time.perf_counter() - start
+    return {"cold_load_s": cold, "warm_load_s": warm, "cache_evicted": evicted}
+
+
+def report_model(name, path, config=MEMORY_CONFIG, time_load=True):
+    """Memory and load-time row of one checkpoint"""
+    ckpt = Checkpoint(path)
+    footprint = weight_footprint(ckpt)
+    disk_bytes = sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file())
+
+    budget = config["gpu_memory_gb"] * 1e9 * config["mem_fraction"]
+    per_token = kv_bytes_per_token(ckpt.config, config["kv_dtype_bytes"])
+    kv_tokens = max(int((budget - footprint["weight_bytes"]) // per_token), 0)
+
+    row = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "model": name,
+        "path": str(path),
+        "disk_bytes": disk_bytes,
+        **footprint,
+        "gpu_memory_gb": config["gpu_memory_gb"],
+        "mem_fraction": config["mem_fraction"],
+        "kv_bytes_per_token": per_token,
+        "kv_capacity_tokens": kv_tokens,
+        "context_len": config["context_len"],
+        "max_concurrent_seqs": kv_tokens // config["context_len"],
+    }
+    if time_load:
+        row.update(time_mmap_load(path))
+        row["load_gb_per_s"] = disk_bytes / 1e9 / row["cold_load_s"] if row["cold_load_s"] else None
+    return row
+
+
+def discover_models(base_dir, original=ORIGINAL_MODEL):
+    """(name, local path) for the baseline (if available locally) and every INT8 output dir"""
+    models = []
+    original_path = resolve_local(original) if original else None
+    if original_path:
+        models.append(("original", original_path))
+    for path in sorted(Path(base_dir).glob(f"{QUANTIZED_PREFIX}*")):
+        if path.is_dir() and shard_files(path):
+            models.append((model_name_from_dir(path), path))
+    return models
+
+
+def print_table(rows):
+    baseline = next((r for r in rows if r["model"] == "original"), None)
+    print(f"\n{'model':<28} {'disk GB':>8} {'weights GB':>10} {'B/param':>8} {'KV tokens':>10} "
+          f"{'seqs@ctx':>9} {'KV gain':>8} {'cold s':>7} {'warm s':>7}")
+    for row in rows:
+        gain = f"{row['kv_capacity_tokens'] / baseline['kv_capacity_tokens']:.2f}x" if (
+            baseline and baseline["kv_capacity_tokens"]) else "-"
+        cold = f"{row['cold_load_s']:.2f}" if "cold_load_s" in row else "-"
+        warm = f"{row['warm_load_s']:.2f}" if "warm_load_s" in row else "-"
+        print(f"{row['model']:<28} {row['disk_bytes'] / 1e9:>8.2f} {row['weight_bytes'] / 1e9:>10.2f} "
+              f"{row['bytes_per_param']:>8.2f} {row['kv_capacity_tokens']:>10,} {row['max_concurrent_seqs']:>9} "
+              f"{gain:>8} {cold:>7} {warm:>7}")
+    for row in rows:
+        dtypes = ", ".join(f"{k} {v['bytes'] / 1e9:.2f} GB" for k, v in row["by_dtype"].items())
+        print(f"  {row['model']}: {dtypes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint size, memory footprint and load-time report")
+    parser.add_argument("--base-dir", type=str, default=MODEL_BASE_DIR, help="Directory with the INT8 output dirs")
+    parser.add_argument("--original", type=str, default=ORIGINAL_MODEL,
+                        help="BF16 baseline path or HF id (resolved in the HF cache; '' to skip)")
+    parser.add_argument("--models", type=str, nargs="*", default=None,
+                        help="Explicit checkpoint directories instead of scanning --base-dir")
+    parser.add_argument("--gpu-memory", type=float, default=MEMORY_CONFIG["gpu_memory_gb"], help="GPU memory in GB")
+    parser.add_argument("--mem-fraction", type=float, default=MEMORY_CONFIG["mem_fraction"],
+                        help="Fraction of GPU memory for weights + KV cache")
+    parser.add_argument("--context-len", type=int, default=MEMORY_CONFIG["context_len"],
+                        help="Context length for the concurrent-sequence estimate")
+    parser.add_argument("--no-load-timing", action="store_true", help="Skip the mmap load timing")
+    args = parser.parse_args()
+
+    MEMORY_CONFIG["gpu_memory_gb"] = args.gpu_memory
+    MEMORY_CONFIG["mem_fraction"] = args.mem_fraction
+    MEMORY_CONFIG["context_len"] = args.context_len
+
+    if args.models:
+        models = [(model_name_from_dir(p), Path(p)) for p in args.models]
+    else:
+        models = discover_models(args.base_dir, args.original)
+    if not models:
+        print(f"❌ No checkpoints found in {args.base_dir}")
+        return 1
+
+    print("=" * 70)
+    print(f"💾 Memory report: {len(models)} checkpoints, "
+          f"{args.gpu_memory:.0f} GB × {args.mem_fraction} budget, context {args.context_len}")
+    print("=" * 70)
+    rows = []
+    for name, path in models:
+        print(f"  📂 {name}: {path}")
+        rows.append(report_model(name, path, MEMORY_CONFIG, time_load=not args.no_load_timing))
+
+    with open(MEMORY_RESULT_FILE, "a") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+    print_table(rows)
+    print(f"\n💾 Results appended to: {MEMORY_RESULT_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
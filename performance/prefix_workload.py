@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Prefix-cache-aware workload generator
+
+The fixed-shape scenarios send fully random prompts, so sglang's radix prefix
+cache never hits. Production traffic shares long system prompts; this module
+builds request sets where a configurable share of the requests starts with one
+of a few distinct shared prefixes:
+
+- shared_ratio: fraction of requests that start with a shared prefix
+- num_prefixes: number of distinct prefixes (chosen uniformly per request)
+- prefix_len / prefix_len_dist / prefix_len_spread: length of each prefix,
+  "fixed", "uniform" (mean ± spread × mean) or "lognormal" (sigma = spread)
+
+Every prompt is input_len tokens (prefix + random suffix). Each shared-ratio
+step starts from an empty cache (/flush_cache) and records the measured cache
+hit rate (cached / prompt tokens from sglang's meta_info), the hit rate an
+ideal cache would reach (every reuse after the first request of a prefix),
+throughput and TTFT split by shared and unshared requests. Rows are appended to
+prefix_result.jsonl; visualize_results.py draws 6_prefix_cache.png from them.
+
+Usage:
+    python performance/prefix_workload.py --model-name original --shared-ratios 0,0.5,0.9 --num-prefixes 4
+    python performance/run_benchmark.py --prefix-cache --model-name original --model-path <MODEL_PATH>
+"""
+
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from serving.session import flush_cache
+from load_generator import TOKEN_ID_RANGE, run_load, synthetic_requests
+
+PREFIX_RESULT_FILE = Path(__file__).parent.parent / "prefix_result.jsonl"
+
+PREFIX_CONFIG = {
+    "num_requests": 256,
+    "input_len": 1024,  # Total prompt length (prefix + suffix)
+    "output_len": 64,
+    "concurrency": 32,
+    "shared_ratios": [0.0, 0.25, 0.5, 0.75, 1.0],
+    "num_prefixes": 4,
+    "prefix_len": 512,  # Mean prefix length
+    "prefix_len_dist": "fixed",  # "fixed", "uniform" or "lognormal"
+    "prefix_len_spread": 0.5,  # uniform: ± spread × prefix_len, lognormal: sigma
+}
+
+PREFIX_LEN_DISTS = ("fixed", "uniform", "lognormal")
+
+
+def prefix_lengths(num_prefixes, prefix_len, dist="fixed", spread=0.5, max_len=None, rng=None):
+    """Length of each distinct prefix, clipped to [1, max_len]"""
+    rng = rng or random.Random(0)
+    if dist == "fixed":
+        lengths = [prefix_len] * num_prefixes
+    elif dist == "uniform":
+        low, high = prefix_len * (1 - spread), prefix_len * (1 + spread)
+        lengths = [round(rng.uniform(low, high)) for _ in range(num_prefixes)]
+    elif dist == "lognormal":
+        # Median prefix_len, so spread only widens the tail
+        lengths = [round(prefix_len * rng.lognormvariate(0.0, spread)) for _ in range(num_prefixes)]
+    else:
+        raise ValueError(f"Unknown prefix length distribution: {dist}")
+    upper = max_len if max_len is not None else max(lengths)
+    return [min(max(length, 1), upper) for length in lengths]
+
+
+def prefix_requests(num_requests, input_len, output_len, shared_ratio, num_prefixes, prefix_len,
+                    prefix_len_dist="fixed", prefix_len_spread=0.5, seed=0):
+    """
+    Request specs where round(shared_ratio × num_requests) prompts start with a shared prefix
+
+    Specs carry prefix_id (None for unshared prompts) and prefix_len next to
+    input_ids / output_len, so results can be split by group. Request order is
+    shuffled, so shared and unshared requests interleave.
+    """
+    rng = random.Random(seed)
+    low, high = TOKEN_ID_RANGE
+    lengths = prefix_lengths(num_prefixes, prefix_len, prefix_len_dist, prefix_len_spread,
+                             max_len=input_len - 1, rng=rng)
+    prefixes = [[rng.randint(low, high) for _ in range(length)] for length in lengths]
+
+    num_shared = round(shared_ratio * num_requests) if num_prefixes else 0
+    requests = synthetic_requests(num_requests, input_len, output_len, seed=seed + 1)
+    for i, spec in enumerate(requests):
+        if i < num_shared:
+            prefix_id = rng.randrange(num_prefixes)
+            prefix = prefixes[prefix_id]
+            spec["input_ids"] = prefix + spec["input_ids"][len(prefix):]
+            spec["prefix_id"], spec["prefix_len"] = prefix_id, len(prefix)
+        else:
+            spec["prefix_id"], spec["prefix_len"] = None, 0
+    rng.shuffle(requests)
+    return requests
+
+
+def expected_hit_rate(requests):
+    """Hit rate of an unbounded cache: every shared prefix is reused after its first request"""
+    seen = set()
+    reused = 0
+    for spec in requests:
+        if spec["prefix_id"] is None:
+            continue
+        if spec["prefix_id"] in seen:
+            reused += spec["prefix_len"]
+        seen.add(spec["prefix_id"])
+    total = sum(len(spec["input_ids"]) for spec in requests)
+    return reused / total if total else 0.0
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def run_prefix_workload(model_name, base_url, cfg=PREFIX_CONFIG, seed=0):
+    """
+    One load run per shared ratio, each on a flushed cache
+
+    Returns:
+        List of step rows (also appended to prefix_result.jsonl)
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    rows = []
+    print(f"\n  🧩 Prefix workload: {cfg['num_prefixes']} prefixes, {cfg['prefix_len_dist']} length "
+          f"{cfg['prefix_len']} of {cfg['input_len']} prompt tokens, concurrency {cfg['concurrency']}")
+
+    # Warm up once; the flush below drops its cache entries again
+    run_load(base_url, synthetic_requests(1, 32, 8, seed=seed + 100), concurrency=1)
+
+    for step_idx, ratio in enumerate(cfg["shared_ratios"]):
+        requests = prefix_requests(
+            cfg["num_requests"], cfg["input_len"], cfg["output_len"], ratio, cfg["num_prefixes"],
+            cfg["prefix_len"], cfg["prefix_len_dist"], cfg["prefix_len_spread"], seed=seed + step_idx,
+        )
+        flushed = flush_cache(base_url)
+        if not flushed:
+            print(f"     ⚠️  Cache flush failed, hit rate includes earlier steps")
+        metrics, results = run_load(base_url, requests, mode="closed", concurrency=cfg["concurrency"])
+
+        shared_ttft = [r["ttft"] for spec, r in zip(requests, results) if r["success"] and spec["prefix_id"] is not None]
+        unshared_ttft = [r["ttft"] for spec, r in zip(requests, results) if r["success"] and spec["prefix_id"] is None]
+        row = {
+            "model": model_name,
+            "timestamp": timestamp,
+            "shared_ratio": ratio,
+            "num_prefixes": cfg["num_prefixes"],
+            "prefix_len": cfg["prefix_len"],
+            "prefix_len_dist": cfg["prefix_len_dist"],
+            "prefix_len_spread": cfg["prefix_len_spread"],
+            "input_len": cfg["input_len"],
+            "output_len": cfg["output_len"],
+            "concurrency": cfg["concurrency"],
+            "cache_flushed": flushed,
+            "expected_hit_rate": expected_hit_rate(requests),
+            "shared_mean_ttft_s": _mean(shared_ttft),
+            "unshared_mean_ttft_s": _mean(unshared_ttft),
+            **metrics,
+        }
+        rows.append(row)
+        with open(PREFIX_RESULT_FILE, "a") as f:
+            f.write(json.dumps(row) + "\n")
+
+        print(f"     {'✅' if metrics['failed'] == 0 else '❌'} shared {ratio:.0%}: "
+              f"hit rate {metrics['cache_hit_rate']:.1%} (ideal {row['expected_hit_rate']:.1%}), "
+              f"{metrics['output_throughput']:.0f} tok/s, mean TTFT {metrics['mean_ttft_s'] * 1000:.0f} ms")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-prefix workload against a running sglang server")
+    parser.add_argument("--base-url", type=str, default="http://127.0.0.1:30000", help="Server address")
+    parser.add_argument("--model-name", type=str, required=True, help="Model name recorded with the results")
+    parser.add_argument("--shared-ratios", type=str, default=None,
+                        help="Comma-separated shared-prefix ratios (default: 0,0.25,0.5,0.75,1)")
+    parser.add_argument("--num-prefixes", type=int, default=PREFIX_CONFIG["num_prefixes"], help="Distinct prefixes")
+    parser.add_argument("--prefix-len", type=int, default=PREFIX_CONFIG["prefix_len"], help="Mean prefix length")
+    parser.add_argument("--prefix-len-dist", type=str, default=PREFIX_CONFIG["prefix_len_dist"],
+                        choices=PREFIX_LEN_DISTS, help="Prefix length distribution")
+    parser.add_argument("--prefix-len-spread", type=float, default=PREFIX_CONFIG["prefix_len_spread"],
+                        help="uniform: ± fraction of --prefix-len, lognormal: sigma")
+    parser.add_argument("--input-len", type=int, default=PREFIX_CONFIG["input_len"], help="Prompt length in tokens")
+    parser.add_argument("--output-len", type=int, default=PREFIX_CONFIG["output_len"], help="Generated tokens")
+    parser.add_argument("--num-prompts", type=int, default=PREFIX_CONFIG["num_requests"], help="Requests per step")
+    parser.add_argument("--concurrency", type=int, default=PREFIX_CONFIG["concurrency"], help="Closed-loop clients")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    PREFIX_CONFIG.update({
+        "num_requests": args.num_prompts,
+        "input_len": args.input_len,
+        "output_len": args.output_len,
+        "concurrency": args.concurrency,
+        "num_prefixes": args.num_prefixes,
+        "prefix_len": args.prefix_len,
+        "prefix_len_dist": args.prefix_len_dist,
+        "prefix_len_spread": args.prefix_len_spread,
+    })
+    if args.shared_ratios:
+        PREFIX_CONFIG["shared_ratios"] = [float(v) for v in args.shared_ratios.split(",")]
+    run_prefix_workload(args.model_name, args.base_url, PREFIX_CONFIG, seed=args.seed)
+    print(f"\n💾 Results appended to: {PREFIX_RESULT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Manifest for incremental report regeneration
+
+Every report target (a markdown section, a figure, a table file) is keyed by
+a digest of its inputs: the content hashes of the (model, scenario) result
+groups it is built from (ResultsStore.group_digests) plus the source of the
+script that renders it. A target is rebuilt only if its digest changed or its
+output file is missing, so appending one run re-renders only the tables and
+figures of that model and scenario.
+
+The manifest is a JSON file next to the reports (performance/.report_manifest.json),
+namespaced per script. Markdown sections are cached in the manifest, so an
+unchanged section is reused verbatim.
+"""
+
+import json
+import hashlib
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MANIFEST_FILE = Path(__file__).parent / ".report_manifest.json"
+
+
+def digest(*parts):
+    """sha256 over JSON-serializable parts (group digests, parameters, script source)"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode() + b"\n")
+    return h.hexdigest()
+
+
+def source_digest(path):
+    """Digest of a script's source, so code changes invalidate what it rendered"""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def select_digests(group_digests, models=None, shapes=None):
+    """Sorted (key, digest) pairs of the groups matching models / shapes (key = (model, *shape))"""
+    return sorted(
+        (list(key), value) for key, value in group_digests.items()
+        if (models is None or key[0] in models) and (shapes is None or tuple(key[1:]) in shapes)
+    )
+
+
+class ReportManifest:
+    """Per-script view of the shared manifest file"""
+
+    def __init__(self, namespace, path=MANIFEST_FILE, force=False):
+        self.namespace = namespace
+        self.path = Path(path)
+        self.force = force
+        self.data = {}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text())
+            except json.JSONDecodeError:
+                self.data = {}
+        self.entries = self.data.setdefault(namespace, {})
+        self.rebuilt = []
+        self.reused = []
+
+    def is_fresh(self, target, target_digest, outputs=()):
+        """True if target was built from the same inputs and its output files still exist"""
+        entry = self.entries.get(target)
+        fresh = (
+            not self.force
+            and entry is not None
+            and entry["digest"] == target_digest
+            and all(Path(p).exists() for p in outputs)
+        )
+        (self.reused if fresh else self.rebuilt).append(target)
+        return fresh
+
+    def cached(self, target):
+        """Content stored with record() (e.g. a markdown section)"""
+        return self.entries[target].get("content")
+
+    def record(self, target, target_digest, content=None):
+        self.entries[target] = {"digest": target_digest}
+        if content is not None:
+            self.entries[target]["content"] = content
+
+    def prune(self, targets):
+        """Drop entries of targets that no longer exist (e.g. a model removed from the results)"""
+        for target in set(self.entries) - set(targets):
+            del self.entries[target]
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=1))
+        tmp.replace(self.path)
+
+    def summary(self):
+        return f"{len(self.rebuilt)} rebuilt, {len(self.reused)} unchanged"
+
+
+def _run_job(func, args):
+    try:
+        func(*args)
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def render_parallel(jobs, workers=None):
+    """
+    Run render jobs in a process pool
+
+    Args:
+        jobs: list of (target, func, args); func must be a module-level function
+        workers: pool size (default: CPU count; 1 renders in-process)
+
+    Returns:
+        list of targets that rendered successfully (failures are printed)
+    """
+    if not jobs:
+        return []
+    if workers == 1 or len(jobs) == 1:
+        results = [(target, _run_job(func, args)) for target, func, args in jobs]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_job, func, args): target for target, func, args in jobs}
+            for future in as_completed(futures):
+                results.append((futures[future], future.result()))
+    done = []
+    for target, error in results:
+        if error is None:
+            done.append(target)
+        else:
+            print(f"❌ Failed to render {target}:\n{error}")
+    return done
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Shared results store for benchmark, sweep, prefix-cache and GPQA outputs
+
+All reporting scripts read results through this module instead of re-parsing
+result.jsonl themselves. Rows are ingested into an indexed SQLite database
+(results.db). The append-only JSONL files are read incrementally from the
+last ingested byte offset, and GPQA result JSONs are re-read only when their
+mtime changes. A report over thousands of runs is then one indexed query.
+
+Run names are parsed structurally: {model}[_{scenario}]_run{n}. The scenario
+suffix is matched against the known scenario names (longest first). Without a
+suffix, the scenario is looked up from (batch_size, input_len, output_len).
+
+Query APIs return columns as numpy arrays (columns) or per-group aggregates
+computed in SQL (aggregate); bootstrap CIs and tests are in stats.py.
+
+Usage:
+    python performance/results_store.py            # sync and print a per-model overview
+    python performance/results_store.py --rebuild  # drop and re-ingest everything
+"""
+
+import re
+import json
+import hashlib
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DB_FILE = PROJECT_ROOT / "results.db"
+RESULT_FILE = PROJECT_ROOT / "result.jsonl"
+SWEEP_RESULT_FILE = PROJECT_ROOT / "sweep_result.jsonl"
+PREFIX_RESULT_FILE = PROJECT_ROOT / "prefix_result.jsonl"
+GPQA_RESULT_DIR = PROJECT_ROOT / "results"
+
+# Format of the benchmark_runs / gpqa_runs timestamp column (sorts chronologically as text)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Scenario name -> (batch_size, input_len, output_len), as in run_benchmark.SCENARIOS
+SCENARIO_SHAPES = {
+    "base": (32, 256, 32),
+    "interactive": (1, 128, 64),
+    "prefill_bound": (1, 2048, 32),
+    "decode_bound": (1, 256, 512),
+    "medium_batch": (8, 256, 128),
+    "high_concurrency": (64, 256, 128),
+    "long_context": (1, 16384, 32),
+}
+SCENARIO_BY_SHAPE = {shape: name for name, shape in SCENARIO_SHAPES.items()}
+
+BENCHMARK_METRICS = ["latency", "output_throughput", "overall_throughput", "input_throughput", "last_gen_throughput"]
+SWEEP_COLUMNS = ["model", "timestamp", "sweep_mode", "offered_load", "input_len", "output_len",
+                 "slo_ttft_p99_s", "slo_tpot_p99_s", "slo_met", "goodput", "p99_ttft_s",
+                 "request_throughput", "output_throughput"]
+PREFIX_COLUMNS = ["model", "timestamp", "shared_ratio", "num_prefixes", "prefix_len", "prefix_len_dist",
+                  "input_len", "output_len", "concurrency", "cache_hit_rate", "expected_hit_rate",
+                  "output_throughput", "mean_ttft_s", "p99_ttft_s", "shared_mean_ttft_s", "unshared_mean_ttft_s"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmark_runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    run_name TEXT NOT NULL,
+    model TEXT NOT NULL,
+    scenario TEXT,
+    repeat INTEGER,
+    batch_size INTEGER,
+    input_len INTEGER,
+    output_len INTEGER,
+    latency REAL,
+    output_throughput REAL,
+    overall_throughput REAL,
+    input_throughput REAL,
+    last_gen_throughput REAL,
+    timestamp TEXT,
+    extra TEXT,
+    UNIQUE (source, line_no)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_model ON benchmark_runs (model);
+CREATE INDEX IF NOT EXISTS idx_runs_scenario ON benchmark_runs (scenario);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON benchmark_runs (timestamp);
+
+CREATE TABLE IF NOT EXISTS sweep_steps (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    timestamp TEXT,
+    sweep_mode TEXT,
+    offered_load REAL,
+    input_len INTEGER,
+    output_len INTEGER,
+    slo_ttft_p99_s REAL,
+    slo_tpot_p99_s REAL,
+    slo_met INTEGER,
+    goodput REAL,
+    p99_ttft_s REAL,
+    request_throughput REAL,
+    output_throughput REAL,
+    extra TEXT,
+    UNIQUE (source, line_no)
+);
+CREATE INDEX IF NOT EXISTS idx_sweep_model ON sweep_steps (model, timestamp);
+
+CREATE TABLE IF NOT EXISTS prefix_steps (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    timestamp TEXT,
+    shared_ratio REAL,
+    num_prefixes INTEGER,
+    prefix_len INTEGER,
+    prefix_len_dist TEXT,
+    input_len INTEGER,
+    output_len INTEGER,
+    concurrency INTEGER,
+    cache_hit_rate REAL,
+    expected_hit_rate REAL,
+    output_throughput REAL,
+    mean_ttft_s REAL,
+    p99_ttft_s REAL,
+    shared_mean_ttft_s REAL,
+    unshared_mean_ttft_s REAL,
+    extra TEXT,
+    UNIQUE (source, line_no)
+);
+CREATE INDEX IF NOT EXISTS idx_prefix_model ON prefix_steps (model, timestamp);
+
+CREATE TABLE IF NOT EXISTS gpqa_runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    model TEXT NOT NULL,
+    variant TEXT,
+    config_name TEXT,
+    greedy INTEGER,
+    n_repeats INTEGER,
+    n_shot INTEGER,
+    seed INTEGER,
+    score REAL,
+    timestamp TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_gpqa_model ON gpqa_runs (model);
+CREATE INDEX IF NOT EXISTS idx_gpqa_timestamp ON gpqa_runs (timestamp);
+
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    lines INTEGER NOT NULL
+);
+"""
+
+_RUN_NAME = re.compile(r"^(?P<body>.+?)(?:_run(?P<repeat>\d+))?$")
+
+
+def parse_run_name(run_name, shape=None):
+    """
+    Split a benchmark run name into (model, scenario, repeat)
+
+    "w8a8_smooth_ptq_decode_bound_run2" -> ("w8a8_smooth_ptq", "decode_bound", 2)
+    "w8a8_smooth_ptq_run1" with shape (32, 256, 32) -> ("w8a8_smooth_ptq", "base", 1)
+    """
+    match = _RUN_NAME.match(run_name)
+    body = match.group("body")
+    repeat = int(match.group("repeat")) if match.group("repeat") else None
+    for scenario in sorted(SCENARIO_SHAPES, key=len, reverse=True):
+        if body.endswith("_" + scenario):
+            return body[:-len(scenario) - 1], scenario, repeat
+    scenario = None
+    if shape is not None and None not in shape:
+        scenario = SCENARIO_BY_SHAPE.get(tuple(shape), "custom_{}x{}x{}".format(*shape))
+    return body, scenario, repeat
+
+
+def _benchmark_row(record):
+    shape = (record.get("batch_size"), record.get("input_len"), record.get("output_len"))
+    model, scenario, repeat = parse_run_name(record["run_name"], shape)
+    known = {"run_name", "batch_size", "input_len", "output_len", "timestamp", *BENCHMARK_METRICS}
+    extra = {k: v for k, v in record.items() if k not in known}
+    return {
+        "run_name": record["run_name"],
+        "model": model,
+        "scenario": scenario,
+        "repeat": repeat,
+        "batch_size": shape[0],
+        "input_len": shape[1],
+        "output_len": shape[2],
+        **{metric: record.get(metric) for metric in BENCHMARK_METRICS},
+        "timestamp": record.get("timestamp"),
+        "extra": json.dumps(extra) if extra else None,
+    }
+
+
+def _sweep_row(record):
+    row = {column: record.get(column) for column in SWEEP_COLUMNS}
+    row["slo_met"] = int(bool(row["slo_met"]))
+    extra = {k: v for k, v in record.items() if k not in SWEEP_COLUMNS}
+    row["extra"] = json.dumps(extra) if extra else None
+    return row
+
+
+def _prefix_row(record):
+    row = {column: record.get(column) for column in PREFIX_COLUMNS}
+    extra = {k: v for k, v in record.items() if k not in PREFIX_COLUMNS}
+    row["extra"] = json.dumps(extra) if extra else None
+    return row
+
+
+class ResultsStore:
+    """Indexed SQLite view over result.jsonl, sweep_result.jsonl, prefix_result.jsonl and GPQA result JSONs"""
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = Path(db_file)
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ==================== Ingestion ====================
+
+    def _ingest_jsonl(self, path, table, to_row):
+        """Append rows written since the last ingest; a shrunk/rewritten file is re-ingested"""
+        path = Path(path)
+        source = str(path.resolve())
+        if not path.exists():
+            return 0
+        state = self.conn.execute("SELECT offset, lines FROM ingest_state WHERE source = ?", (source,)).fetchone()
+        offset, lines = state if state else (0, 0)
+        if path.stat().st_size < offset:
+            self.conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+            offset, lines = 0, 0
+
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Partially written last line, picked up next time
+                offset += len(raw)
+                lines += 1
+                if raw.strip():
+                    rows.append({"source": source, "line_no": lines, **to_row(json.loads(raw))})
+        if rows:
+            columns = list(rows[0])
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row[c] for c in columns) for row in rows],
+            )
+        self.conn.execute("INSERT OR REPLACE INTO ingest_state VALUES (?, ?, ?)", (source, offset, lines))
+        self.conn.commit()
+        return len(rows)
+
+    def ingest_benchmarks(self, path=RESULT_FILE):
+        return self._ingest_jsonl(path, "benchmark_runs", _benchmark_row)
+
+    def ingest_sweeps(self, path=SWEEP_RESULT_FILE):
+        return self._ingest_jsonl(path, "sweep_steps", _sweep_row)
+
+    def ingest_prefix(self, path=PREFIX_RESULT_FILE):
+        return self._ingest_jsonl(path, "prefix_steps", _prefix_row)
+
+    def ingest_gpqa(self, result_dir=GPQA_RESULT_DIR):
+        """Upsert run_gpqa_sglang.py results_*.json files that are new or changed"""
+        result_dir = Path(result_dir)
+        if not result_dir.exists():
+            return 0
+        known = dict(self.conn.execute("SELECT path, mtime FROM gpqa_runs"))
+        count = 0
+        for path in result_dir.glob("**/results_*.json"):
+            mtime = path.stat().st_mtime
+            if known.get(str(path)) == mtime:
+                continue
+            with open(path, "r") as f:
+                data = json.load(f)
+            config = data.get("config", {})
+            self.conn.execute(
+                "INSERT OR REPLACE INTO gpqa_runs (path, mtime, model, variant, config_name, greedy, n_repeats, "
+                "n_shot, seed, score, timestamp, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(path), mtime, data.get("model"), config.get("variant"), data.get("config_name"),
+                    int(bool(config.get("greedy"))), config.get("n_repeats"), config.get("n_shot"),
+                    config.get("seed"), data.get("score"),
+                    datetime.fromtimestamp(mtime).strftime(TIMESTAMP_FORMAT),
+                    json.dumps(data.get("metrics") or {}),
+                ),
+            )
+            count += 1
+        self.conn.commit()
+        return count
+
+    def sync(self):
+        """Ingest everything new; returns {table: rows added}"""
+        return {
+            "benchmark_runs": self.ingest_benchmarks(),
+            "sweep_steps": self.ingest_sweeps(),
+            "prefix_steps": self.ingest_prefix(),
+            "gpqa_runs": self.ingest_gpqa(),
+        }
+
+    def rebuild(self):
+        for table in ("benchmark_runs", "sweep_steps", "prefix_steps", "gpqa_runs", "ingest_state"):
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.commit()
+        return self.sync()
+
+    # ==================== Queries ====================
+
+    @staticmethod
+    def _where(models=None, scenarios=None, since=None, shapes=None):
+        clauses, params = [], []
+        if models:
+            clauses.append(f"model IN ({', '.join('?' * len(models))})")
+            params.extend(models)
+        if scenarios:
+            clauses.append(f"scenario IN ({', '.join('?' * len(scenarios))})")
+            params.extend(scenarios)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if shapes:
+            clauses.append("(" + " OR ".join(["(batch_size = ? AND input_len = ? AND output_len = ?)"] * len(shapes)) + ")")
+            params.extend(value for shape in shapes for value in shape)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def columns(self, names, table="benchmark_runs", models=None, scenarios=None, since=None, shapes=None):
+        """Selected columns as numpy arrays (ingestion order)"""
+        benchmark = table == "benchmark_runs"
+        where, params = self._where(models, scenarios if benchmark else None, since, shapes if benchmark else None)
+        rows = self.conn.execute(f"SELECT {', '.join(names)} FROM {table}{where} ORDER BY id", params).fetchall()
+        if not rows:
+            return {name: np.array([]) for name in names}
+        return {name: np.array(values) for name, values in zip(names, zip(*rows))}
+
+    def count(self, table="benchmark_runs"):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def runs(self, models=None, scenarios=None, since=None, shapes=None):
+        """Benchmark runs as dicts (for per-run listings)"""
+        where, params = self._where(models, scenarios, since, shapes)
+        cursor = self.conn.execute(f"SELECT * FROM benchmark_runs{where} ORDER BY id", params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def aggregate(self, metrics=BENCHMARK_METRICS, by=("model", "batch_size", "input_len", "output_len"),
+                  models=None, scenarios=None, since=None, shapes=None):
+        """
+        Per-group statistics computed in SQL
+
+        Returns:
+            list of dicts: the group-by columns, "count", and per metric a dict with
+            mean, std (sample, ddof=1, the definition stats.py uses), min, max, n
+        """
+        selects = [*by, "COUNT(*)"]
+        for metric in metrics:
+            selects += [f"COUNT({metric})", f"AVG({metric})", f"SUM({metric} * {metric})",
+                        f"MIN({metric})", f"MAX({metric})"]
+        where, params = self._where(models, scenarios, since, shapes)
+        group = ", ".join(by)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(selects)} FROM benchmark_runs{where} GROUP BY {group} ORDER BY {group}", params
+        ).fetchall()
+
+        result = []
+        for row in rows:
+            entry = dict(zip(by, row[:len(by)]))
+            entry["count"] = row[len(by)]
+            values = row[len(by) + 1:]
+            for i, metric in enumerate(metrics):
+                n, mean, sumsq, lo, hi = values[5 * i:5 * i + 5]
+                if not n:
+                    continue
+                # Clamp tiny negative variances from floating-point cancellation
+                ss = max(sumsq - n * mean * mean, 0.0)
+                entry[metric] = {
+                    "mean": mean,
+                    "std": (ss / (n - 1)) ** 0.5 if n > 1 else 0.0,
+                    "min": lo,
+                    "max": hi,
+                    "n": n,
+                }
+            result.append(entry)
+        return result
+
+    def group_digests(self, by=("model", "batch_size", "input_len", "output_len"), table="benchmark_runs"):
+        """
+        Content hash of the rows in every group, e.g. to find the groups that changed since a report was built
+
+        Returns:
+            {group key tuple: sha256 hex digest}
+        """
+        cursor = self.conn.execute(f"SELECT * FROM {table} ORDER BY id")
+        names = [d[0] for d in cursor.description]
+        key_index = [names.index(column) for column in by]
+        content_index = [i for i, name in enumerate(names) if name not in ("id", "source", "line_no", "mtime")]
+        hashes = {}
+        for row in cursor:
+            key = tuple(row[i] for i in key_index)
+            if key not in hashes:
+                hashes[key] = hashlib.sha256()
+            hashes[key].update(json.dumps([row[i] for i in content_index]).encode() + b"\n")
+        return {key: h.hexdigest() for key, h in hashes.items()}
+
+    def sweeps(self, models=None):
+        """Sweep steps as dicts with the extra metrics merged back in"""
+        where, params = self._where(models)
+        cursor = self.conn.execute(f"SELECT * FROM sweep_steps{where} ORDER BY id", params)
+        names = [d[0] for d in cursor.description]
+        rows = []
+        for values in cursor:
+            row = dict(zip(names, values))
+            extra = json.loads(row.pop("extra") or "{}")
+            row["slo_met"] = bool(row["slo_met"])
+            rows.append({**extra, **row})
+        return rows
+
+    def prefix_steps(self, models=None):
+        """Prefix-cache workload steps as dicts with the extra metrics merged back in"""
+        where, params = self._where(models)
+        cursor = self.conn.execute(f"SELECT * FROM prefix_steps{where} ORDER BY id", params)
+        names = [d[0] for d in cursor.description]
+        rows = []
+        for values in cursor:
+            row = dict(zip(names, values))
+            extra = json.loads(row.pop("extra") or "{}")
+            rows.append({**extra, **row})
+        return rows
+
+    def gpqa(self, models=None):
+        where, params = self._where(models)
+        cursor = self.conn.execute(f"SELECT * FROM gpqa_runs{where} ORDER BY timestamp", params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row), metrics=json.loads(row[names.index("metrics")] or "{}")) for row in cursor]
+
+
+def open_store(sync=True, db_file=DB_FILE):
+    """ResultsStore with everything new ingested"""
+    store = ResultsStore(db_file)
+    if sync:
+        added = store.sync()
+        if any(added.values()):
+            print("🗃️  Ingested " + ", ".join(f"{n} {table}" for table, n in added.items() if n)
+                  + f" into {store.db_file.name}")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync and inspect the shared results store")
+    parser.add_argument("--db", type=str, default=str(DB_FILE), help="SQLite database path")
+    parser.add_argument("--rebuild", action="store_true", help="Drop all rows and re-ingest")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    added = store.rebuild() if args.rebuild else store.sync()
+    print(f"🗃️  {store.db_file}: " + ", ".join(f"+{n} {table}" for table, n in added.items()))
+
+    print(f"\n{'model':<28} {'scenario':<18} {'runs':>5} {'output tok/s':>14} {'latency s':>10}")
+    for group in store.aggregate(["output_throughput", "latency"], by=("model", "scenario")):
+        tput, latency = group.get("output_throughput"), group.get("latency")
+        print(f"{group['model']:<28} {str(group['scenario']):<18} {group['count']:>5} "
+              f"{tput['mean'] if tput else float('nan'):>14.2f} {latency['mean'] if latency else float('nan'):>10.3f}")
+    gpqa = store.gpqa()
+    if gpqa:
+        print(f"\n{'model':<28} {'config':<40} {'score':>7}")
+        for run in gpqa:
+            print(f"{run['model']:<28} {run['config_name'][:40]:<40} {run['score']:>7.4f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,48 @@
 """
 Automated Performance Benchmark Script
 - Run each model 3 times and calculate average
+- Load is generated in-process (see load_generator.py), no log scraping
+- The prefix cache is flushed before every run and each repeat sends its own
+  prompts, so no run is served from an earlier run's cached prefixes
+- Servers are probed for readiness (no fixed sleeps); cold-start time is recorded
+- Checkpoints are integrity-checked before a server is launched
+- Averages carry the sample std and a bootstrap CI (stats.py, flagged
+  low-confidence below 5 runs); with --early-stop, repeats end once the Welch t
+  interval of the speedup vs original is conclusive
+- With --adaptive, repeats continue until the output throughput CI is within
+  ±target of the mean (between --min-repeats and --max-repeats runs); the stop
+  reason is saved with the results
+- With --session, each model's server is launched once and runs every scenario;
+  the prefix cache is flushed between scenarios and the server log is split
+  into per-scenario segments
+- With --prefix-cache, a shared-prefix workload (prefix_workload.py) measures
+  the radix cache hit rate next to throughput and TTFT
+- With --trace, a request trace recorded by run_gpqa_sglang.py --record-trace
+  is replayed (trace_replay.py), time- or rate-scaled, for latency percentiles
+  and throughput under GPQA-shaped traffic
 - Auto-save logs to logs/performance_logs/
 """
 
+import sys
 import subprocess
 import time
 import json
-import re
 import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from serving.readiness import ServerStartupError, wait_until_ready, wait_for_port_free
+from serving.checkpoint_integrity import ensure_checkpoint, verify_checkpoint
+from serving.session import ServerLogSegments, flush_cache
+from load_generator import run_batch_benchmark, run_load, synthetic_requests, compute_goodput
+from prefix_workload import PREFIX_CONFIG, PREFIX_LEN_DISTS, PREFIX_RESULT_FILE, run_prefix_workload
+from trace_replay import TRACE_RESULT_FILE, replay_trace
+from server_pool import ServerPool, build_job_matrix, make_devices, start_stub_server, stop_stub_server
+from results_store import TIMESTAMP_FORMAT, open_store, parse_run_name
+from stats import CONFIDENCE, LOW_CONFIDENCE_N, MIN_REPEATS, comparison_conclusive, describe, precision_reached, required_repeats
+
 # Configuration
 MODELS = [
     {
@@ -44,15 +75,66 @@ BENCHMARK_CONFIG = {
     "input_len": 256,
     "output_len": 32,
     "n_repeats": 3,  # Run each model 3 times
+    "startup_timeout_s": 900,  # Give up if the server is not ready (large checkpoints + CUDA graphs)
+    "verify_checksums": False,  # Also hash every shard before launch (default: size/header check only)
+    "early_stop": False,  # Stop before n_repeats once the speedup vs original is conclusive
+    "min_repeats": MIN_REPEATS,
+    "adaptive": False,  # Repeat until the output throughput CI is narrow enough (max_repeats replaces n_repeats)
+    "target_rel_ci": 0.02,  # Stop at a 95% CI half-width <= 2% of the mean
+    "max_repeats": 20,
+}
+
+# Scenario matrix (--matrix), same configurations as run_multi_config_benchmark.sh
+SCENARIOS = [
+    {"name": "base", "batch_size": 32, "input_len": 256, "output_len": 32},
+    {"name": "interactive", "batch_size": 1, "input_len": 128, "output_len": 64},
+    {"name": "prefill_bound", "batch_size": 1, "input_len": 2048, "output_len": 32},
+    {"name": "decode_bound", "batch_size": 1, "input_len": 256, "output_len": 512},
+    {"name": "medium_batch", "batch_size": 8, "input_len": 256, "output_len": 128},
+    {"name": "high_concurrency", "batch_size": 64, "input_len": 256, "output_len": 128},
+    {"name": "long_context", "batch_size": 1, "input_len": 16384, "output_len": 32},
+]
+
+# Offered-load sweep (--sweep): step load up until the latency SLO breaks
+SWEEP_CONFIG = {
+    "mode": "rate",  # "rate" = Poisson requests/s, "concurrency" = closed-loop clients
+    "values": [1, 2, 4, 8, 16, 32, 64, 128, 256],
+    "input_len": 256,
+    "output_len": 128,
+    "duration_s": 60,  # Target measurement window per rate step
+    "min_prompts": 32,
+    "prompts_per_client": 8,  # Concurrency steps send this many requests per client
+    "slo_ttft_p99_s": 1.0,
+    "slo_tpot_p99_s": None,  # Optional bound on p99 time-per-output-token
 }
 
 BASE_LOG_DIR = Path(__file__).parent.parent / "logs" / "performance_logs"
 SERVER_LOG_DIR = BASE_LOG_DIR / "server_logs"
 RESULT_LOG_DIR = BASE_LOG_DIR / "result_logs"
+# Same file and row format that sglang.bench_one_batch_server used to append to
+RESULT_FILE = Path(__file__).parent.parent / "result.jsonl"
+SWEEP_RESULT_FILE = Path(__file__).parent.parent / "sweep_result.jsonl"
+# Server cold-start time per model / quantization method
+STARTUP_RESULT_FILE = Path(__file__).parent.parent / "startup_result.jsonl"
+# Matrix mode runs one benchmark per device thread; rows must not interleave
+_result_file_lock = threading.Lock()
 
 
-def start_server(model_path, port, gpu, quantization=None, server_log_file=None):
-    """Start sglang server"""
+def start_server(model_path, port, gpu, quantization=None, server_log_file=None, model_name=None):
+    """
+    Start sglang server and block until it answers /health and /get_model_info
+    
+    Returns:
+        (process, startup report from serving.readiness.wait_until_ready)
+    
+    Raises:
+        CheckpointIntegrityError: the local checkpoint is incomplete or corrupt
+        ServerStartupError: the server exited, logged a fatal error or timed out
+    """
+    integrity = ensure_checkpoint(model_path, deep=BENCHMARK_CONFIG["verify_checksums"])
+    if not integrity["skipped"]:
+        print(f"  🔍 Checkpoint OK: {integrity['shards']} shards ({integrity['elapsed_s'] * 1000:.0f} ms)")
+    
     cmd = [
         "python", "-m", "sglang.launch_server",
         "--model-path", model_path,
@@ -67,6 +149,7 @@ def start_server(model_path, port, gpu, quantization=None, server_log_file=None)
     env = {"CUDA_VISIBLE_DEVICES": str(gpu)}
     
     print(f"  🚀 Starting server: {model_path}")
+    started_at = time.perf_counter()
     
     # Redirect server output to log file if provided
     if server_log_file:
@@ -88,88 +171,106 @@ def start_server(model_path, port, gpu, quantization=None, server_log_file=None)
     
     # Wait for server to be ready
     print(f"  ⏳ Waiting for server to be ready...")
-    time.sleep(20)
+    startup = wait_until_ready(
+        f"http://127.0.0.1:{port}",
+        process=process,
+        log_file=server_log_file,
+        timeout=BENCHMARK_CONFIG["startup_timeout_s"],
+        started_at=started_at,
+    )
+    record_startup(model_name or Path(model_path).name, model_path, quantization, gpu, startup)
+    if not startup["ready"]:
+        stop_server(process, port)
+        raise ServerStartupError(f"Server for {model_path} failed to start: {startup['error']}")
     
-    return process
+    print(f"  ✅ Server ready in {startup['cold_start_s']:.1f}s ({startup['probes']} probes)")
+    return process, startup
 
 
-def run_benchmark(model_path, port, batch_size, input_len, output_len, run_name="default", retry=True):
-    """Run benchmark once with optional retry on failure"""
-    cmd = [
-        "python", "-m", "sglang.bench_one_batch_server",
-        "--base-url", f"http://127.0.0.1:{port}",
-        "--model-path", model_path,
-        "--batch-size", str(batch_size),
-        "--input-len", str(input_len),
-        "--output-len", str(output_len),
-        "--run-name", run_name,
-    ]
+def record_startup(model_name, model_path, quantization, gpu, startup):
+    """Append the cold-start measurement of one server launch to startup_result.jsonl"""
+    row = {
+        "model": model_name,
+        "model_path": model_path,
+        "quantization": quantization,
+        "gpu": gpu,
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "ready": startup["ready"],
+        "cold_start_s": startup["cold_start_s"],
+        "health_ready_s": startup["endpoint_ready_s"].get("/health"),
+        "model_info_ready_s": startup["endpoint_ready_s"].get("/get_model_info"),
+        "probes": startup["probes"],
+        "error": startup["error"],
+    }
+    with _result_file_lock, open(STARTUP_RESULT_FILE, "a") as f:
+        f.write(json.dumps(row) + "\n")
+
+
+def stop_server(process, port=None):
+    """Terminate a server started by start_server and wait until its port is released"""
+    print(f"\n  🛑 Stopping server...")
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    if port is not None and not wait_for_port_free(port):
+        print(f"  ⚠️  Port {port} still in use after shutdown")
+
+
+def run_benchmark(port, batch_size, input_len, output_len, run_name="default", retry=True, seed=0):
+    """
+    Run benchmark once with optional retry on failure
+    
+    The prefix cache is flushed before every attempt, and each run should pass
+    its own seed, so no run is served from prompts cached by an earlier one.
     
+    Returns:
+        (metrics, per-request results); metrics is empty if the run failed
+    """
+    base_url = f"http://127.0.0.1:{port}"
     max_attempts = 2 if retry else 1
     
     for attempt in range(max_attempts):
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-            )
-            
-            # Check for common errors
-            if "ZeroDivisionError" in result.stderr or "ZeroDivisionError" in result.stdout:
-                if attempt < max_attempts - 1:
-                    print(f"     ⚠️  ZeroDivisionError detected, retrying...")
-                    time.sleep(2)
-                    continue
-                else:
-                    print(f"     ❌ Benchmark failed after {max_attempts} attempts")
-                    return ""
-            
-            return result.stdout
-            
-        except subprocess.TimeoutExpired:
-            if attempt < max_attempts - 1:
-                print(f"     ⚠️  Timeout, retrying...")
-                time.sleep(2)
-            else:
-                print(f"     ❌ Benchmark timeout after {max_attempts} attempts")
-                return ""
-    
-    return ""
-
-
-def parse_benchmark_output(output):
-    """Parse benchmark output from sglang.bench_one_batch_server"""
-    metrics = {}
-    
-    # Parse from the summary section (after warmup)
-    patterns = {
-        "latency_s": r"latency:\s*([\d.]+)\s*s",
-        "ttft_s": r"ttft:\s*([\d.]+)\s*s",
-        "output_throughput": r"output throughput:\s*([\d.]+)\s*tok/s",
-        "overall_throughput": r"overall throughput:\s*([\d.]+)\s*tok/s",
-        "last_gen_throughput": r"last generation throughput:\s*([\d.]+)\s*tok/s",
-        "input_throughput": r"input throughput:\s*([\d.]+)\s*tok/s",
-    }
-    
-    # Find the section after "Warmup End"
-    warmup_end_idx = output.find("======== Warmup End")
-    if warmup_end_idx != -1:
-        output_section = output[warmup_end_idx:]
-    else:
-        output_section = output
-    
-    for key, pattern in patterns.items():
-        match = re.search(pattern, output_section, re.IGNORECASE)
-        if match:
-            metrics[key] = float(match.group(1))
+        if not flush_cache(base_url):
+            print(f"     ⚠️  Cache flush failed, run may reuse cached prefixes")
+        metrics, request_results = run_batch_benchmark(base_url, batch_size, input_len, output_len, seed=seed)
+        if metrics:
+            append_result_row(run_name, batch_size, input_len, output_len, metrics)
+            return metrics, request_results
+        
+        errors = [r["error"] for r in request_results if r["error"]]
+        if attempt < max_attempts - 1:
+            print(f"     ⚠️  {len(errors)} request(s) failed ({errors[0] if errors else 'no tokens'}), retrying...")
+            time.sleep(2)
+        else:
+            print(f"     ❌ Benchmark failed after {max_attempts} attempts")
     
-    return metrics
+    return {}, request_results
+
+
+def append_result_row(run_name, batch_size, input_len, output_len, metrics):
+    """Append one row to result.jsonl (read by the analysis and visualization scripts)"""
+    row = {
+        "run_name": run_name,
+        "batch_size": batch_size,
+        "input_len": input_len,
+        "output_len": output_len,
+        "latency": round(metrics["latency_s"], 4),
+        "ttft": round(metrics["ttft_s"], 4),
+        "input_throughput": round(metrics["input_throughput"], 2),
+        "output_throughput": round(metrics["output_throughput"], 2),
+        "overall_throughput": round(metrics["overall_throughput"], 2),
+        "last_gen_throughput": round(metrics["last_gen_throughput"], 2),
+        "timestamp": datetime.now().strftime(TIMESTAMP_FORMAT),
+    }
+    with _result_file_lock, open(RESULT_FILE, "a") as f:
+        f.write(json.dumps(row) + "\n")
 
 
 def compute_average(results):
-    """Compute average of multiple runs"""
+    """Mean, sample std and bootstrap CI of each metric over multiple runs"""
     if not results:
         return {}
     
@@ -179,40 +280,69 @@ def compute_average(results):
     for key in keys:
         values = [r[key] for r in results if key in r]
         if values:
-            avg[key] = sum(values) / len(values)
-            avg[f"{key}_std"] = (sum((x - avg[key])**2 for x in values) / len(values))**0.5
+            stats = describe(values)
+            avg[key] = stats["mean"]
+            avg[f"{key}_std"] = stats["std"]
+            avg[f"{key}_ci"] = [stats["ci_low"], stats["ci_high"]]
     
     return avg
 
 
-def save_results(model_name, run_results, avg_results, raw_outputs):
-    """Save results to log files"""
+def format_average(avg_results, n_runs=None):
+    """Lines "metric: mean ± std [CI]" of compute_average output (CIs from < LOW_CONFIDENCE_N runs are flagged)"""
+    flag = ", low-confidence" if n_runs is not None and n_runs < LOW_CONFIDENCE_N else ""
+    lines = []
+    for key, value in sorted(avg_results.items()):
+        if not key.endswith(("_std", "_ci")):
+            std_val = avg_results.get(f"{key}_std", 0)
+            low, high = avg_results.get(f"{key}_ci", [value, value])
+            lines.append(f"{key}: {value:.2f} ± {std_val:.2f} ({CONFIDENCE:.0%} CI {low:.2f}-{high:.2f}{flag})")
+    return lines
+
+
+def baseline_throughputs(batch_size, input_len, output_len, baseline="original"):
+    """Output throughput of every recorded baseline run with this shape (from the results store)"""
+    store = open_store(sync=False)
+    store.ingest_benchmarks()
+    values = store.columns(["output_throughput"], models=[baseline],
+                           shapes=[(batch_size, input_len, output_len)])["output_throughput"]
+    store.close()
+    return [float(v) for v in values if v is not None]
+
+
+def save_results(model_name, run_results, avg_results, request_details, startup=None, stop=None, scenario=None):
+    """Save results to log files (scenario: SCENARIOS entry in session mode, default: BENCHMARK_CONFIG shape)"""
     log_dir = RESULT_LOG_DIR / model_name
     log_dir.mkdir(parents=True, exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    shape = scenario or BENCHMARK_CONFIG
+    prefix = f"benchmark_{scenario['name']}_{timestamp}" if scenario else f"benchmark_{timestamp}"
     
     # Save JSON results
-    json_file = log_dir / f"benchmark_{timestamp}.json"
+    json_file = log_dir / f"{prefix}.json"
     data = {
         "timestamp": timestamp,
         "model_name": model_name,
         "config": BENCHMARK_CONFIG,
+        "scenario": scenario,
         "individual_runs": run_results,
         "average": avg_results,
+        "server_startup": startup,
+        "stop": stop,
     }
     
     with open(json_file, "w") as f:
         json.dump(data, f, indent=2)
     
-    # Save raw outputs
-    for i, output in enumerate(raw_outputs, 1):
-        raw_file = log_dir / f"benchmark_{timestamp}_run{i}.log"
+    # Save per-request timings of each run
+    for i, requests in enumerate(request_details, 1):
+        raw_file = log_dir / f"{prefix}_run{i}_requests.json"
         with open(raw_file, "w") as f:
-            f.write(output)
+            json.dump(requests, f)
     
     # Save summary report
-    summary_file = log_dir / f"benchmark_{timestamp}_summary.txt"
+    summary_file = log_dir / f"{prefix}_summary.txt"
     with open(summary_file, "w") as f:
         f.write(f"=" * 70 + "\n")
         f.write(f"Performance Benchmark Summary - {model_name}\n")
@@ -220,17 +350,22 @@ def save_results(model_name, run_results, avg_results, raw_outputs):
         f.write(f"=" * 70 + "\n\n")
         
         f.write("Configuration:\n")
-        f.write(f"  Batch Size: {BENCHMARK_CONFIG['batch_size']}\n")
-        f.write(f"  Input Length: {BENCHMARK_CONFIG['input_len']}\n")
-        f.write(f"  Output Length: {BENCHMARK_CONFIG['output_len']}\n")
-        f.write(f"  Repeats: {BENCHMARK_CONFIG['n_repeats']}\n\n")
+        if scenario:
+            f.write(f"  Scenario: {scenario['name']}\n")
+        f.write(f"  Batch Size: {shape['batch_size']}\n")
+        f.write(f"  Input Length: {shape['input_len']}\n")
+        f.write(f"  Output Length: {shape['output_len']}\n")
+        if stop:
+            f.write(f"  Repeats: {stop['runs']} (stopped: {stop['reason']})\n\n")
+        else:
+            f.write(f"  Repeats: {BENCHMARK_CONFIG['n_repeats']}\n\n")
+        
+        if startup and startup.get("cold_start_s") is not None:
+            f.write(f"Server Cold Start: {startup['cold_start_s']:.2f} s\n\n")
         
         f.write("Average Results:\n")
-        for key, value in sorted(avg_results.items()):
-            if not key.endswith("_std"):
-                std_key = f"{key}_std"
-                std_val = avg_results.get(std_key, 0)
-                f.write(f"  {key}: {value:.2f} ± {std_val:.2f}\n")
+        for line in format_average(avg_results, len(run_results)):
+            f.write(f"  {line}\n")
         
         f.write("\n" + "=" * 70 + "\n")
     
@@ -238,6 +373,93 @@ def save_results(model_name, run_results, avg_results, raw_outputs):
     return json_file, summary_file
 
 
+def run_repeats(name, port, batch_size, input_len, output_len, run_prefix=None):
+    """
+    Repeat one benchmark shape on a running server
+    
+    Runs n_repeats times, or with BENCHMARK_CONFIG["adaptive"] until the output
+    throughput CI is narrow enough (up to max_repeats); with early_stop it also
+    ends once the speedup vs original is conclusive.
+    
+    Args:
+        name: model name (runs of "original" never early-stop against themselves)
+        run_prefix: result.jsonl run name prefix (default: name), runs are <prefix>_run<i>
+    
+    Returns:
+        (run_results, request_details, stop) - stop records why the repeats ended
+    """
+    run_prefix = run_prefix or name
+    run_results = []
+    request_details = []
+    baseline = None
+    max_runs = BENCHMARK_CONFIG["max_repeats"] if BENCHMARK_CONFIG["adaptive"] else BENCHMARK_CONFIG["n_repeats"]
+    stop = {"reason": "max_repeats" if BENCHMARK_CONFIG["adaptive"] else "n_repeats", "verdict": None,
+            "rel_ci_half_width": None, "target_rel_ci": None}
+    if BENCHMARK_CONFIG["adaptive"]:
+        stop["target_rel_ci"] = BENCHMARK_CONFIG["target_rel_ci"]
+        print(f"  📐 Adaptive repeats: until the output throughput CI is within "
+              f"±{BENCHMARK_CONFIG['target_rel_ci']:.1%} ({BENCHMARK_CONFIG['min_repeats']}-{max_runs} runs)")
+    if BENCHMARK_CONFIG["early_stop"] and parse_run_name(name)[0] != "original":
+        baseline = baseline_throughputs(batch_size, input_len, output_len)
+        print(f"  📐 Early stop: comparing against {len(baseline)} recorded original runs")
+    
+    for i in range(max_runs):
+        print(f"\n  🔄 Run {i + 1}/{max_runs}...")
+        
+        run_name = f"{run_prefix}_run{i+1}"
+        metrics, request_results = run_benchmark(
+            port,
+            batch_size,
+            input_len,
+            output_len,
+            run_name=run_name,
+            retry=True,
+            seed=i,
+        )
+        
+        request_details.append(request_results)
+        
+        if not metrics:
+            print(f"     ❌ Benchmark failed, skipping this run")
+            continue
+        
+        run_results.append(metrics)
+        print(f"     ✅ Completed")
+        print(f"     📈 Output Throughput: {metrics['output_throughput']:.2f} tok/s")
+        print(f"     ⏱️  Latency: {metrics['latency_s']:.3f}s")
+        
+        throughputs = [r["output_throughput"] for r in run_results]
+        if BENCHMARK_CONFIG["adaptive"]:
+            reached, width = precision_reached(
+                throughputs, BENCHMARK_CONFIG["target_rel_ci"], BENCHMARK_CONFIG["min_repeats"]
+            )
+            stop["rel_ci_half_width"] = width
+            if width is not None:
+                print(f"     📏 CI half-width: ±{width:.2%} of the mean")
+            if reached:
+                stop["reason"] = "precision"
+                print(f"     🛑 Target precision reached after {len(run_results)} runs")
+                break
+        if baseline and len(run_results) >= BENCHMARK_CONFIG["min_repeats"]:
+            conclusive, verdict = comparison_conclusive(throughputs, baseline, BENCHMARK_CONFIG["min_repeats"])
+            if conclusive:
+                stop["reason"], stop["verdict"] = "conclusive", verdict
+                print(f"     🛑 Speedup vs original is conclusive ({verdict}) after {len(run_results)} runs")
+                break
+    
+    if run_results and len(run_results) < max_runs and len(request_details) == max_runs:
+        print(f"\n  ⚠️  Warning: Only {len(run_results)}/{max_runs} runs succeeded")
+    
+    stop["runs"] = len(run_results)
+    stop["attempts"] = len(request_details)
+    if stop["reason"] == "max_repeats" and run_results:
+        needed = required_repeats([r["output_throughput"] for r in run_results], BENCHMARK_CONFIG["target_rel_ci"])
+        stop["repeats_needed"] = needed
+        print(f"\n  ⚠️  Target precision not reached in {max_runs} runs"
+              + (f" (about {needed} needed)" if needed else ""))
+    return run_results, request_details, stop
+
+
 def benchmark_model(model_config):
     """Benchmark a single model completely"""
     name = model_config["name"]
@@ -257,76 +479,39 @@ def benchmark_model(model_config):
         server_log_file = server_log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         
         # Start server
-        server_process = start_server(
+        server_process, startup = start_server(
             path,
             BENCHMARK_CONFIG["port"],
             BENCHMARK_CONFIG["gpu"],
             quantization,
             server_log_file=server_log_file,
+            model_name=name,
         )
         
         # Run benchmark multiple times
-        run_results = []
-        raw_outputs = []
-        
-        for i in range(BENCHMARK_CONFIG["n_repeats"]):
-            print(f"\n  🔄 Run {i + 1}/{BENCHMARK_CONFIG['n_repeats']}...")
-            
-            run_name = f"{name}_run{i+1}"
-            output = run_benchmark(
-                path,
-                BENCHMARK_CONFIG["port"],
-                BENCHMARK_CONFIG["batch_size"],
-                BENCHMARK_CONFIG["input_len"],
-                BENCHMARK_CONFIG["output_len"],
-                run_name=run_name,
-                retry=True,
-            )
-            
-            raw_outputs.append(output)
-            
-            if not output:
-                print(f"     ❌ Benchmark failed, skipping this run")
-                continue
-            
-            metrics = parse_benchmark_output(output)
-            
-            if metrics:
-                run_results.append(metrics)
-                print(f"     ✅ Completed")
-                # Show key metrics
-                if "output_throughput" in metrics:
-                    print(f"     📈 Output Throughput: {metrics['output_throughput']:.2f} tok/s")
-                if "latency_s" in metrics:
-                    print(f"     ⏱️  Latency: {metrics['latency_s']:.3f}s")
-            else:
-                print(f"     ⚠️  Warning: Failed to parse output")
-            
-            # Short break between runs
-            if i < BENCHMARK_CONFIG["n_repeats"] - 1:
-                time.sleep(5)
+        run_results, request_details, stop = run_repeats(
+            name,
+            BENCHMARK_CONFIG["port"],
+            BENCHMARK_CONFIG["batch_size"],
+            BENCHMARK_CONFIG["input_len"],
+            BENCHMARK_CONFIG["output_len"],
+        )
         
         # Check if we have enough successful runs
         if not run_results:
             print(f"\n  ❌ All runs failed, no results to save")
             return False
         
-        if len(run_results) < BENCHMARK_CONFIG["n_repeats"]:
-            print(f"\n  ⚠️  Warning: Only {len(run_results)}/{BENCHMARK_CONFIG['n_repeats']} runs succeeded")
-        
         # Compute average
         avg_results = compute_average(run_results)
         
         # Save results
-        json_file, summary_file = save_results(name, run_results, avg_results, raw_outputs)
+        json_file, summary_file = save_results(name, run_results, avg_results, request_details, startup, stop)
         
         # Print summary
-        print(f"\n  📊 Average Results ({len(run_results)} runs):")
-        for key, value in sorted(avg_results.items()):
-            if not key.endswith("_std"):
-                std_key = f"{key}_std"
-                std_val = avg_results.get(std_key, 0)
-                print(f"     {key}: {value:.2f} ± {std_val:.2f}")
+        print(f"\n  📊 Average Results ({len(run_results)} runs, stopped: {stop['reason']}):")
+        for line in format_average(avg_results, len(run_results)):
+            print(f"     {line}")
         
         # Return True if we have at least 1 successful run
         return len(run_results) > 0
@@ -338,13 +523,349 @@ def benchmark_model(model_config):
     finally:
         # Stop server
         if server_process:
-            print(f"\n  🛑 Stopping server...")
-            server_process.terminate()
-            try:
-                server_process.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                server_process.kill()
-            time.sleep(5)
+            stop_server(server_process, BENCHMARK_CONFIG["port"])
+
+
+def session_model(model_config, scenarios):
+    """
+    Warm-server session: launch one server and run every scenario (with repeats) on it
+    
+    Before each scenario the prefix cache is flushed (/flush_cache) so scenarios
+    stay independent, and the server log written during the scenario is copied
+    to server_<timestamp>_<scenario>.log. Run names are
+    <model>_<scenario>_run<i>, as in matrix mode.
+    
+    Returns:
+        Session summary dict (also saved to result_logs/<model>/session_<timestamp>.json)
+    """
+    name = model_config["name"]
+    port = BENCHMARK_CONFIG["port"]
+    base_url = f"http://127.0.0.1:{port}"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    print(f"\n{'=' * 70}")
+    print(f"📊 Benchmark Session: {name} ({len(scenarios)} scenarios, one server)")
+    print(f"{'=' * 70}")
+    
+    summary = {"model_name": name, "timestamp": timestamp, "startup": None, "scenarios": [], "error": None}
+    server_process = None
+    try:
+        server_log_dir = SERVER_LOG_DIR / name
+        server_log_dir.mkdir(parents=True, exist_ok=True)
+        server_log_file = server_log_dir / f"server_{timestamp}.log"
+        server_process, startup = start_server(
+            model_config["path"],
+            port,
+            BENCHMARK_CONFIG["gpu"],
+            model_config.get("quantization"),
+            server_log_file=server_log_file,
+            model_name=name,
+        )
+        summary["startup"] = startup
+        segments = ServerLogSegments(server_log_file)
+        
+        for scenario in scenarios:
+            print(f"\n  🧪 Scenario {scenario['name']}: batch_size={scenario['batch_size']}, "
+                  f"input_len={scenario['input_len']}, output_len={scenario['output_len']}")
+            flushed = flush_cache(base_url)
+            if not flushed:
+                print(f"  ⚠️  Cache flush failed, scenario may reuse cached prefixes")
+            
+            segments.begin(scenario["name"])
+            started = time.perf_counter()
+            run_results, request_details, stop = run_repeats(
+                name, port, scenario["batch_size"], scenario["input_len"], scenario["output_len"],
+                run_prefix=f"{name}_{scenario['name']}",
+            )
+            elapsed = time.perf_counter() - started
+            segment = segments.end()
+            
+            record = {
+                "scenario": scenario["name"],
+                "cache_flushed": flushed,
+                "elapsed_s": elapsed,
+                "succeeded": len(run_results),
+                "stop": stop,
+                "log_segment": segment,
+            }
+            summary["scenarios"].append(record)
+            if segment["fatal"]:
+                print(f"  ❗ Server log ({Path(segment['file']).name}): {segment['fatal']}")
+            if not run_results:
+                print(f"  ❌ All runs failed")
+                if server_process.poll() is not None:
+                    summary["error"] = f"server exited with code {server_process.returncode} during {scenario['name']}"
+                    print(f"  ❌ Server exited, skipping the remaining scenarios")
+                    break
+                continue
+            
+            avg_results = compute_average(run_results)
+            save_results(name, run_results, avg_results, request_details, startup, stop, scenario)
+            print(f"  📊 {scenario['name']}: {avg_results['output_throughput']:.2f} tok/s "
+                  f"({len(run_results)} runs, stopped: {stop['reason']}, {elapsed:.1f}s)")
+    except Exception as e:
+        summary["error"] = str(e)
+        print(f"  ❌ Error: {e}")
+    finally:
+        if server_process:
+            stop_server(server_process, port)
+    
+    log_dir = RESULT_LOG_DIR / name
+    log_dir.mkdir(parents=True, exist_ok=True)
+    with open(log_dir / f"session_{timestamp}.json", "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+def run_load_sweep(model_name, port):
+    """
+    Step offered load until the p99 latency SLO is violated
+    
+    Each step runs the in-process load generator at one offered load (Poisson
+    request rate or closed-loop client count) and records throughput, latency
+    percentiles and goodput (requests/s that met the SLO). The sweep stops at
+    the first step that violates the SLO; that step is recorded too so the
+    knee is visible in the plots.
+    
+    Returns:
+        List of step rows (also appended to sweep_result.jsonl)
+    """
+    cfg = SWEEP_CONFIG
+    base_url = f"http://127.0.0.1:{port}"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unit = "req/s" if cfg["mode"] == "rate" else "clients"
+    steps = []
+    
+    print(f"\n  📈 Load sweep ({cfg['mode']}): SLO p99 TTFT <= {cfg['slo_ttft_p99_s']}s"
+          + (f", p99 TPOT <= {cfg['slo_tpot_p99_s']}s" if cfg["slo_tpot_p99_s"] else ""))
+    
+    for step_idx, value in enumerate(cfg["values"]):
+        if cfg["mode"] == "rate":
+            num_prompts = max(cfg["min_prompts"], int(value * cfg["duration_s"]))
+        else:
+            num_prompts = max(cfg["min_prompts"], int(value) * cfg["prompts_per_client"])
+        requests = synthetic_requests(num_prompts, cfg["input_len"], cfg["output_len"], seed=step_idx)
+        
+        if cfg["mode"] == "rate":
+            metrics, results = run_load(base_url, requests, mode="open", request_rate=value, seed=step_idx)
+        else:
+            metrics, results = run_load(base_url, requests, mode="closed", concurrency=int(value))
+        metrics.update(compute_goodput(results, metrics["duration_s"], cfg["slo_ttft_p99_s"], cfg["slo_tpot_p99_s"]))
+        
+        slo_met = (
+            metrics["failed"] == 0
+            and metrics["p99_ttft_s"] <= cfg["slo_ttft_p99_s"]
+            and (cfg["slo_tpot_p99_s"] is None or metrics["p99_tpot_s"] <= cfg["slo_tpot_p99_s"])
+        )
+        row = {
+            "model": model_name,
+            "timestamp": timestamp,
+            "sweep_mode": cfg["mode"],
+            "offered_load": value,
+            "input_len": cfg["input_len"],
+            "output_len": cfg["output_len"],
+            "slo_ttft_p99_s": cfg["slo_ttft_p99_s"],
+            "slo_tpot_p99_s": cfg["slo_tpot_p99_s"],
+            "slo_met": slo_met,
+            **metrics,
+        }
+        steps.append(row)
+        with open(SWEEP_RESULT_FILE, "a") as f:
+            f.write(json.dumps(row) + "\n")
+        
+        status = "✅" if slo_met else "❌"
+        print(f"     {status} {value} {unit}: {metrics['request_throughput']:.2f} req/s, "
+              f"goodput {metrics['goodput']:.2f} req/s, p99 TTFT {metrics['p99_ttft_s']:.3f}s, "
+              f"{metrics['output_throughput']:.0f} tok/s")
+        if not slo_met:
+            break
+    
+    sustainable = [s for s in steps if s["slo_met"]]
+    if sustainable:
+        best = max(sustainable, key=lambda s: s["goodput"])
+        print(f"\n  🏁 Max sustainable load under SLO: {best['offered_load']} {unit} "
+              f"(goodput {best['goodput']:.2f} req/s)")
+    else:
+        print(f"\n  ⚠️  SLO violated already at the lowest load step")
+    
+    log_dir = RESULT_LOG_DIR / model_name
+    log_dir.mkdir(parents=True, exist_ok=True)
+    with open(log_dir / f"sweep_{timestamp}.json", "w") as f:
+        json.dump({"model_name": model_name, "config": cfg, "steps": steps}, f, indent=2)
+    
+    return steps
+
+
+def sweep_model(model_config):
+    """Start a server for one model, run the load sweep, stop the server"""
+    name = model_config["name"]
+    print(f"\n{'=' * 70}")
+    print(f"📊 Load Sweep: {name}")
+    print(f"{'=' * 70}")
+    
+    server_process = None
+    try:
+        server_log_dir = SERVER_LOG_DIR / name
+        server_log_dir.mkdir(parents=True, exist_ok=True)
+        server_log_file = server_log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        server_process, _ = start_server(
+            model_config["path"],
+            BENCHMARK_CONFIG["port"],
+            BENCHMARK_CONFIG["gpu"],
+            model_config.get("quantization"),
+            server_log_file=server_log_file,
+            model_name=name,
+        )
+        steps = run_load_sweep(name, BENCHMARK_CONFIG["port"])
+        return len(steps) > 0
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        return False
+    finally:
+        if server_process:
+            stop_server(server_process, BENCHMARK_CONFIG["port"])
+
+
+def prefix_model(model_config):
+    """Start a server for one model, run the shared-prefix workload, stop the server"""
+    name = model_config["name"]
+    print(f"\n{'=' * 70}")
+    print(f"📊 Prefix-Cache Workload: {name}")
+    print(f"{'=' * 70}")
+    
+    server_process = None
+    try:
+        server_log_dir = SERVER_LOG_DIR / name
+        server_log_dir.mkdir(parents=True, exist_ok=True)
+        server_log_file = server_log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        server_process, _ = start_server(
+            model_config["path"],
+            BENCHMARK_CONFIG["port"],
+            BENCHMARK_CONFIG["gpu"],
+            model_config.get("quantization"),
+            server_log_file=server_log_file,
+            model_name=name,
+        )
+        rows = run_prefix_workload(name, f"http://127.0.0.1:{BENCHMARK_CONFIG['port']}", PREFIX_CONFIG)
+        return len(rows) > 0 and all(r["failed"] == 0 for r in rows)
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        return False
+    finally:
+        if server_process:
+            stop_server(server_process, BENCHMARK_CONFIG["port"])
+
+
+def trace_model(model_config, trace_path, time_scale=1.0, rate=None, limit=None):
+    """Start a server for one model, replay a recorded request trace, stop the server"""
+    name = model_config["name"]
+    print(f"\n{'=' * 70}")
+    print(f"📊 Trace Replay: {name}")
+    print(f"{'=' * 70}")
+    
+    server_process = None
+    try:
+        server_log_dir = SERVER_LOG_DIR / name
+        server_log_dir.mkdir(parents=True, exist_ok=True)
+        server_log_file = server_log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        server_process, _ = start_server(
+            model_config["path"],
+            BENCHMARK_CONFIG["port"],
+            BENCHMARK_CONFIG["gpu"],
+            model_config.get("quantization"),
+            server_log_file=server_log_file,
+            model_name=name,
+        )
+        row, _ = replay_trace(name, f"http://127.0.0.1:{BENCHMARK_CONFIG['port']}", trace_path,
+                              time_scale=time_scale, rate=rate, limit=limit)
+        return row["failed"] == 0
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        return False
+    finally:
+        if server_process:
+            stop_server(server_process, BENCHMARK_CONFIG["port"])
+
+
+def launch_model_server(model_config, device):
+    """Start the sglang server of one model on a pool device"""
+    server_log_dir = SERVER_LOG_DIR / model_config["name"]
+    server_log_dir.mkdir(parents=True, exist_ok=True)
+    server_log_file = server_log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}_gpu{device['gpu']}.log"
+    process, _ = start_server(
+        model_config["path"],
+        device["port"],
+        device["gpu"],
+        model_config.get("quantization"),
+        server_log_file=server_log_file,
+        model_name=model_config["name"],
+    )
+    return process
+
+
+def stop_model_server(process, device):
+    stop_server(process, device["port"])
+
+
+def run_matrix_job(model_config, device, scenario, repeat):
+    """
+    One (model, scenario, repeat) benchmark on the server already running on `device`
+    
+    run_benchmark flushes the device's prefix cache first, and every job sends
+    its own prompts (seeded by scenario and repeat), so scenarios with the same
+    input_len never hit prefixes cached by an earlier job.
+    """
+    run_name = f"{model_config['name']}_{scenario['name']}_run{repeat}"
+    metrics, _ = run_benchmark(
+        device["port"],
+        scenario["batch_size"],
+        scenario["input_len"],
+        scenario["output_len"],
+        run_name=run_name,
+        retry=True,
+        seed=f"{scenario['name']}_run{repeat}",
+    )
+    return metrics
+
+
+def benchmark_matrix(models, scenarios, n_repeats, devices, fake=False):
+    """
+    Run the full model × scenario × repeat matrix on a pool of devices
+    
+    Each device keeps one server; a model is loaded once, runs all of its
+    scenarios back to back, and the freed device is refilled with the next model.
+    With fake=True every device runs an in-process stub server instead of sglang.
+    
+    Returns:
+        Pool summary dict (also saved to result_logs/matrix_<timestamp>.json)
+    """
+    rejected = {}
+    if not fake:
+        # A corrupt checkpoint would fail every launch and get healthy devices retired
+        for model_config in models:
+            report = verify_checkpoint(model_config["path"], deep=BENCHMARK_CONFIG["verify_checksums"])
+            if not report["ok"]:
+                rejected[model_config["name"]] = report["errors"]
+                print(f"❌ {model_config['name']}: checkpoint failed integrity check, skipped")
+                for error in report["errors"]:
+                    print(f"   - {error}")
+        models = [m for m in models if m["name"] not in rejected]
+    
+    pool = ServerPool(
+        devices,
+        launch=start_stub_server if fake else launch_model_server,
+        stop=stop_stub_server if fake else stop_model_server,
+        run_job=run_matrix_job,
+    )
+    records = pool.run(build_job_matrix(models, scenarios, n_repeats))
+    summary = pool.summary()
+    summary["rejected_models"] = rejected
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    RESULT_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    with open(RESULT_LOG_DIR / f"matrix_{timestamp}.json", "w") as f:
+        json.dump({"timestamp": timestamp, "summary": summary, "jobs": records}, f, indent=2)
+    return summary
 
 
 def benchmark_single_model(model_name, model_path, quantization, gpu, port, batch_size, input_len, output_len, n_repeats):
@@ -376,9 +897,183 @@ def main():
     parser.add_argument("--batch-size", type=int, default=32, help="Batch size")
     parser.add_argument("--input-len", type=int, default=256, help="Input length")
     parser.add_argument("--output-len", type=int, default=32, help="Output length")
-    parser.add_argument("--n-repeats", type=int, default=3, help="Number of repeats")
+    parser.add_argument("--n-repeats", type=int, default=3, help="Number of repeats (maximum with --early-stop)")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="Stop repeating once the Welch t interval of the speedup vs original is conclusive")
+    parser.add_argument("--min-repeats", type=int, default=MIN_REPEATS,
+                        help="Runs before --early-stop / --adaptive may stop")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Repeat until the output throughput CI half-width is within --target-ci of the mean "
+                             "(single model / batch mode; --max-repeats replaces --n-repeats)")
+    parser.add_argument("--target-ci", type=float, default=BENCHMARK_CONFIG["target_rel_ci"],
+                        help="Relative 95%% CI half-width that ends --adaptive (default: 0.02 = ±2%%)")
+    parser.add_argument("--max-repeats", type=int, default=BENCHMARK_CONFIG["max_repeats"],
+                        help="Upper bound on runs with --adaptive")
+    
+    # Saturation sweep
+    parser.add_argument("--sweep", action="store_true", help="Step offered load until the latency SLO is violated")
+    parser.add_argument("--sweep-mode", type=str, default=SWEEP_CONFIG["mode"], choices=["rate", "concurrency"],
+                        help="Offered load unit: Poisson request rate or closed-loop clients")
+    parser.add_argument("--sweep-values", type=str, default=None,
+                        help="Comma-separated load steps (default: 1,2,4,...,256)")
+    parser.add_argument("--sweep-duration", type=float, default=SWEEP_CONFIG["duration_s"],
+                        help="Measurement window per rate step in seconds")
+    parser.add_argument("--slo-ttft", type=float, default=SWEEP_CONFIG["slo_ttft_p99_s"], help="p99 TTFT SLO in seconds")
+    parser.add_argument("--slo-tpot", type=float, default=None, help="Optional p99 TPOT SLO in seconds")
+    
+    # Prefix-cache workload
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Run the shared-prefix workload (cache hit rate, throughput, TTFT per shared ratio)")
+    parser.add_argument("--shared-ratios", type=str, default=None,
+                        help="Comma-separated shared-prefix ratios for --prefix-cache (default: 0,0.25,0.5,0.75,1)")
+    parser.add_argument("--num-prefixes", type=int, default=PREFIX_CONFIG["num_prefixes"],
+                        help="Distinct shared prefixes for --prefix-cache")
+    parser.add_argument("--prefix-len", type=int, default=PREFIX_CONFIG["prefix_len"],
+                        help="Mean prefix length for --prefix-cache (prompts are 1024 tokens)")
+    parser.add_argument("--prefix-len-dist", type=str, default=PREFIX_CONFIG["prefix_len_dist"],
+                        choices=PREFIX_LEN_DISTS, help="Prefix length distribution for --prefix-cache")
+    
+    # Trace replay
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Replay a request trace from run_gpqa_sglang.py --record-trace")
+    parser.add_argument("--trace-time-scale", type=float, default=1.0,
+                        help="Multiply every trace arrival offset (0.5 = twice as fast)")
+    parser.add_argument("--trace-rate", type=float, default=None,
+                        help="Rescale the trace to this mean arrival rate in req/s (overrides --trace-time-scale)")
+    parser.add_argument("--trace-limit", type=int, default=None, help="Replay only the first N trace arrivals")
+    
+    # Warm-server session
+    parser.add_argument("--session", action="store_true",
+                        help="Launch each model once and run all scenarios × repeats on it "
+                             "(prefix cache flushed and server log split per scenario)")
+    
+    # Multi-GPU scenario matrix
+    parser.add_argument("--matrix", action="store_true",
+                        help="Run all models × scenarios × repeats on a pool of GPUs (one server per GPU)")
+    parser.add_argument("--gpus", type=str, default="1,2,3,4,5,6,7", help="Comma-separated GPU ids for --matrix")
+    parser.add_argument("--base-port", type=int, default=30001, help="Port of the first pool device")
+    parser.add_argument("--scenarios", type=str, default=None,
+                        help="Comma-separated scenario names for --matrix / --session (default: all)")
+    parser.add_argument("--fake-devices", action="store_true",
+                        help="Use in-process stub servers instead of sglang (scheduler dry run)")
+    
+    parser.add_argument("--verify-checksums", action="store_true",
+                        help="Verify per-shard sha256 sums before launching a server (reads the whole checkpoint)")
     
     args = parser.parse_args()
+    BENCHMARK_CONFIG["verify_checksums"] = args.verify_checksums
+    BENCHMARK_CONFIG["early_stop"] = args.early_stop
+    BENCHMARK_CONFIG["min_repeats"] = args.min_repeats
+    BENCHMARK_CONFIG["adaptive"] = args.adaptive
+    BENCHMARK_CONFIG["target_rel_ci"] = args.target_ci
+    BENCHMARK_CONFIG["max_repeats"] = args.max_repeats
+    
+    scenarios = SCENARIOS
+    if args.scenarios:
+        wanted = args.scenarios.split(",")
+        scenarios = [s for s in SCENARIOS if s["name"] in wanted]
+    
+    if args.matrix:
+        devices = make_devices([g.strip() for g in args.gpus.split(",") if g.strip()], args.base_port)
+        if args.model_name and args.model_path:
+            models = [{"name": args.model_name, "path": args.model_path, "quantization": args.quantization}]
+        else:
+            models = MODELS
+        
+        print("\n" + "=" * 70)
+        print("🚀 Multi-GPU Scenario Matrix" + (" (stub servers)" if args.fake_devices else ""))
+        print("=" * 70)
+        print(f"Models: {len(models)}, Scenarios: {len(scenarios)}, Repeats: {args.n_repeats}")
+        print("Devices: " + ", ".join(f"GPU {d['gpu']}:{d['port']}" for d in devices))
+        print("=" * 70 + "\n")
+        
+        summary = benchmark_matrix(models, scenarios, args.n_repeats, devices, fake=args.fake_devices)
+        print(f"\n✅ Matrix completed: {summary['succeeded']}/{summary['jobs']} jobs succeeded "
+              f"in {summary['makespan_s']:.1f}s")
+        for model, stats in summary["models"].items():
+            print(f"   {model}: {stats['succeeded']} ok, {stats['failed']} failed")
+        for model, errors in summary["rejected_models"].items():
+            print(f"   {model}: rejected ({len(errors)} integrity errors)")
+        exit(0 if summary["failed"] == 0 and not summary["rejected_models"] else 1)
+    
+    if args.sweep:
+        SWEEP_CONFIG["mode"] = args.sweep_mode
+        if args.sweep_values:
+            SWEEP_CONFIG["values"] = [float(v) for v in args.sweep_values.split(",")]
+        SWEEP_CONFIG["duration_s"] = args.sweep_duration
+        SWEEP_CONFIG["slo_ttft_p99_s"] = args.slo_ttft
+        SWEEP_CONFIG["slo_tpot_p99_s"] = args.slo_tpot
+        SWEEP_CONFIG["input_len"] = args.input_len
+        SWEEP_CONFIG["output_len"] = args.output_len
+        BENCHMARK_CONFIG["port"] = args.port
+        BENCHMARK_CONFIG["gpu"] = args.gpu
+        
+        if args.model_name and args.model_path:
+            models = [{"name": args.model_name, "path": args.model_path, "quantization": args.quantization}]
+        else:
+            models = MODELS
+        success_count = sum(1 for model_config in models if sweep_model(model_config))
+        print(f"\n✅ Sweep completed: {success_count}/{len(models)} models, results in {SWEEP_RESULT_FILE}")
+        exit(0 if success_count == len(models) else 1)
+    
+    if args.prefix_cache:
+        BENCHMARK_CONFIG["port"] = args.port
+        BENCHMARK_CONFIG["gpu"] = args.gpu
+        PREFIX_CONFIG["num_prefixes"] = args.num_prefixes
+        PREFIX_CONFIG["prefix_len"] = args.prefix_len
+        PREFIX_CONFIG["prefix_len_dist"] = args.prefix_len_dist
+        if args.shared_ratios:
+            PREFIX_CONFIG["shared_ratios"] = [float(v) for v in args.shared_ratios.split(",")]
+        
+        if args.model_name and args.model_path:
+            models = [{"name": args.model_name, "path": args.model_path, "quantization": args.quantization}]
+        else:
+            models = MODELS
+        success_count = sum(1 for model_config in models if prefix_model(model_config))
+        print(f"\n✅ Prefix-cache workload completed: {success_count}/{len(models)} models, "
+              f"results in {PREFIX_RESULT_FILE}")
+        exit(0 if success_count == len(models) else 1)
+    
+    if args.trace:
+        BENCHMARK_CONFIG["port"] = args.port
+        BENCHMARK_CONFIG["gpu"] = args.gpu
+        
+        if args.model_name and args.model_path:
+            models = [{"name": args.model_name, "path": args.model_path, "quantization": args.quantization}]
+        else:
+            models = MODELS
+        success_count = sum(
+            1 for model_config in models
+            if trace_model(model_config, args.trace, args.trace_time_scale, args.trace_rate, args.trace_limit)
+        )
+        print(f"\n✅ Trace replay completed: {success_count}/{len(models)} models, results in {TRACE_RESULT_FILE}")
+        exit(0 if success_count == len(models) else 1)
+    
+    if args.session:
+        BENCHMARK_CONFIG["port"] = args.port
+        BENCHMARK_CONFIG["gpu"] = args.gpu
+        BENCHMARK_CONFIG["n_repeats"] = args.n_repeats
+        if args.model_name and args.model_path:
+            models = [{"name": args.model_name, "path": args.model_path, "quantization": args.quantization}]
+        else:
+            models = MODELS
+        
+        print("\n" + "=" * 70)
+        print("🚀 Warm-Server Session Mode")
+        print("=" * 70)
+        print(f"Models: {len(models)}, Scenarios: {', '.join(s['name'] for s in scenarios)}")
+        print(f"GPU: {args.gpu}, Port: {args.port}")
+        print("=" * 70 + "\n")
+        
+        failed = 0
+        for model_config in models:
+            summary = session_model(model_config, scenarios)
+            ok = sum(1 for r in summary["scenarios"] if r["succeeded"])
+            failed += len(scenarios) - ok
+            print(f"\n  ✅ {model_config['name']}: {ok}/{len(scenarios)} scenarios succeeded"
+                  + (f" ({summary['error']})" if summary["error"] else ""))
+        print(f"\n✅ Session completed, results in {RESULT_FILE}")
+        exit(0 if failed == 0 else 1)
     
     # Single model mode
     if args.model_name and args.model_path:
@@ -388,7 +1083,10 @@ def main():
         print(f"Model: {args.model_name}")
         print(f"GPU: {args.gpu}, Port: {args.port}")
         print(f"Config: batch_size={args.batch_size}, input_len={args.input_len}, output_len={args.output_len}")
-        print(f"Repeats: {args.n_repeats}")
+        if args.adaptive:
+            print(f"Repeats: adaptive, {args.min_repeats}-{args.max_repeats} runs until ±{args.target_ci:.1%} CI")
+        else:
+            print(f"Repeats: {args.n_repeats}")
         print("=" * 70 + "\n")
         
         success = benchmark_single_model(
@@ -418,8 +1116,12 @@ def main():
         print(f"Config: batch_size={BENCHMARK_CONFIG['batch_size']}, "
               f"input_len={BENCHMARK_CONFIG['input_len']}, "
               f"output_len={BENCHMARK_CONFIG['output_len']}")
-        print(f"Running each model {BENCHMARK_CONFIG['n_repeats']} times to calculate average")
-        print(f"Results will be saved to: {LOG_DIR}/")
+        if BENCHMARK_CONFIG["adaptive"]:
+            print(f"Running each model {BENCHMARK_CONFIG['min_repeats']}-{BENCHMARK_CONFIG['max_repeats']} times "
+                  f"until the throughput CI is within ±{BENCHMARK_CONFIG['target_rel_ci']:.1%}")
+        else:
+            print(f"Running each model {BENCHMARK_CONFIG['n_repeats']} times to calculate average")
+        print(f"Results will be saved to: {BASE_LOG_DIR}/")
         
         success_count = 0
         
@@ -430,7 +1132,7 @@ def main():
         
         print(f"\n" + "=" * 70)
         print(f"✅ Benchmark Completed: {success_count}/{len(MODELS)} models succeeded")
-        print(f"📁 Log directory: {LOG_DIR}/")
+        print(f"📁 Log directory: {BASE_LOG_DIR}/")
         print("=" * 70 + "\n")
 
 
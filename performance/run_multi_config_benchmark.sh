@@ -1,6 +1,7 @@
 #!/bin/bash
 # Multi-Configuration Performance Benchmark Script
-# Each model server is started once and tested with all configurations
+# Each model server is started once (run_benchmark.py --session) and tested with all configurations;
+# the prefix cache is flushed between configurations
 # Usage: bash performance/run_multi_config_benchmark.sh
 
 # Activate environment
@@ -73,7 +74,13 @@ RESULT_LOG_DIR="logs/performance_logs/result_logs"
 # Array to track background process PIDs
 pids=()
 
+# Comma-separated scenario names for run_benchmark.py --scenarios
+CONFIG_NAMES=$(for config_spec in "${CONFIGS[@]}"; do echo "${config_spec%%|*}"; done | paste -sd, -)
+
 # Function to test one model (runs in background)
+# run_benchmark.py --session launches the server once, flushes the prefix cache
+# before every configuration and splits the server log into per-configuration
+# segments (server_<timestamp>_<config>.log)
 test_model() {
     local model_spec="$1"
     IFS='|' read -r model_name model_path quantization gpu_id port description <<< "$model_spec"
@@ -84,112 +91,38 @@ test_model() {
     echo "    GPU: $gpu_id | Port: $port"
     echo "======================================"
     
-    # Create log directories for this model
-    mkdir -p "$SERVER_LOG_DIR/$model_name"
     mkdir -p "$RESULT_LOG_DIR/$model_name"
-    
     local timestamp=$(date +%Y%m%d_%H%M%S)
-    local server_log="$SERVER_LOG_DIR/$model_name/server_${timestamp}.log"
+    local session_log="$RESULT_LOG_DIR/$model_name/session_${timestamp}.log"
     
-    # Build server command
-    local server_cmd="python -m sglang.launch_server --model-path \"$model_path\" --port $port --host 0.0.0.0 --tp 1"
+    local quant_args=()
     if [ -n "$quantization" ]; then
-        server_cmd="$server_cmd --quantization $quantization"
+        quant_args=(--quantization "$quantization")
     fi
     
-    # Start server
-    echo "[$(date)] 🚀 [GPU $gpu_id] Starting server..."
-    CUDA_VISIBLE_DEVICES=$gpu_id bash -c "$server_cmd" > "$server_log" 2>&1 &
-    local server_pid=$!
-    
-    echo "[$(date)] 📝 [GPU $gpu_id] Server PID: $server_pid"
-    echo "[$(date)] 📄 [GPU $gpu_id] Server log: $server_log"
-    
-    # Wait for server to be ready (with health check)
-    echo "[$(date)] ⏳ [GPU $gpu_id] Waiting for server to be ready on port $port..."
-    local max_wait=300  # 5 minutes
-    local waited=0
-    local server_ready=false
-    
-    while [ $waited -lt $max_wait ]; do
-        if curl -s "http://127.0.0.1:$port/get_server_info" > /dev/null 2>&1; then
-            echo "[$(date)] ✅ [GPU $gpu_id] Server is ready!"
-            server_ready=true
-            break
-        fi
-        sleep 10
-        waited=$((waited + 10))
-        echo "[$(date)] ⏳ [GPU $gpu_id] Still waiting... ($waited/${max_wait}s)"
-    done
-    
-    if [ "$server_ready" = false ]; then
-        echo "[$(date)] ❌ [GPU $gpu_id] Server failed to start within ${max_wait}s"
-        kill $server_pid 2>/dev/null
-        return 1
-    fi
-    
-    # Extra buffer time
-    sleep 5
-    
-    # Test all configurations on this server
-    local config_success=0
-    local config_failed=0
-    
-    for config_spec in "${CONFIGS[@]}"; do
-        IFS='|' read -r config_name batch_size input_len output_len config_desc <<< "$config_spec"
-        
-        echo ""
-        echo "  📊 [GPU $gpu_id] Testing Configuration: $config_desc"
-        echo "      batch_size=$batch_size, input_len=$input_len, output_len=$output_len"
-        
-        # Run N_REPEATS times for this configuration
-        for ((i=0; i<N_REPEATS; i++)); do
-            run_num=$((i+1))
-            run_name="${model_name}_${config_name}_run${run_num}"
-            
-            echo "    [Run $run_num/$N_REPEATS] $run_name"
-            
-            local benchmark_log="$RESULT_LOG_DIR/$model_name/benchmark_${config_name}_${timestamp}.log"
-            
-            # Run benchmark
-            python -m sglang.bench_one_batch_server \
-                --base-url "http://127.0.0.1:$port" \
-                --model-path "$model_path" \
-                --batch-size $batch_size \
-                --input-len $input_len \
-                --output-len $output_len \
-                --run-name "$run_name" \
-                >> "$benchmark_log" 2>&1
-            
-            if [ $? -eq 0 ]; then
-                echo "      ✅ Success"
-                ((config_success++))
-            else
-                echo "      ❌ Failed"
-                ((config_failed++))
-            fi
-            
-            # Small delay between runs
-            sleep 2
-        done
-    done
+    echo "[$(date)] 📄 [GPU $gpu_id] Session log: $session_log"
+    python performance/run_benchmark.py --session \
+        --model-name "$model_name" \
+        --model-path "$model_path" \
+        "${quant_args[@]}" \
+        --gpu "$gpu_id" \
+        --port "$port" \
+        --scenarios "$CONFIG_NAMES" \
+        --n-repeats "$N_REPEATS" \
+        > "$session_log" 2>&1
+    local exit_code=$?
     
     echo ""
-    echo "[$(date)] 📊 [GPU $gpu_id] Model $model_name completed:"
-    echo "  ✅ Successful: $config_success"
-    echo "  ❌ Failed: $config_failed"
-    
-    # Stop the server
-    echo "[$(date)] 🛑 [GPU $gpu_id] Stopping server (PID: $server_pid)..."
-    kill $server_pid 2>/dev/null
-    sleep 3
+    if [ $exit_code -eq 0 ]; then
+        echo "[$(date)] ✅ [GPU $gpu_id] Model $model_name: all configurations succeeded"
+    else
+        echo "[$(date)] ❌ [GPU $gpu_id] Model $model_name: some configurations failed (see $session_log)"
+    fi
     
-    # Make sure server and port are cleaned up
-    pkill -f "sglang.*$port" 2>/dev/null || true
+    # Make sure the port is released even if the session crashed
     lsof -ti:$port | xargs kill -9 2>/dev/null || true
-    
-    echo "[$(date)] ✅ [GPU $gpu_id] Server stopped and port $port cleaned"
     echo ""
+    return $exit_code
 }
 
 # Start all models in parallel (each in background)
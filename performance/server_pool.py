@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Multi-GPU server pool scheduler for the (model, scenario, repeat) benchmark matrix
+
+- One long-lived server per device; a model's server is loaded once and all of
+  its scenarios and repeats run on it back to back
+- When a device finishes a model its server is stopped and the device is
+  refilled with the next pending model
+- A model whose server fails to start is retried on another device; a device
+  that fails to start servers repeatedly is retired from the pool
+- Launching, stopping and running a job are callables, so the same scheduler
+  drives real sglang servers (run_benchmark.py) and stub servers (testing)
+"""
+
+import sys
+import time
+import queue
+import threading
+from pathlib import Path
+from datetime import datetime
+
+PROJECT_ROOT = Path(__file__).parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def make_devices(gpus, base_port=30001):
+    """Device list from GPU ids, one server port per device"""
+    return [{"gpu": gpu, "port": base_port + i} for i, gpu in enumerate(gpus)]
+
+
+def build_job_matrix(models, scenarios, n_repeats):
+    """
+    Expand models × scenarios × repeats into per-model job lists
+
+    Returns:
+        [(model_config, [(scenario, repeat), ...]), ...]; jobs of one model are
+        grouped so they can share a single server
+    """
+    return [
+        (model, [(scenario, repeat) for scenario in scenarios for repeat in range(1, n_repeats + 1)])
+        for model in models
+    ]
+
+
+def start_stub_server(model_config, device):
+    """Start an in-process mock sglang server on the device port (no GPU needed)"""
+    from serving.mock_server import make_server
+
+    server = make_server("127.0.0.1", device["port"], **model_config.get("stub", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def stop_stub_server(server, device=None):
+    server.shutdown()
+    server.server_close()
+
+
+class ServerPool:
+    """Run per-model job lists on a pool of devices, one server per device at a time"""
+
+    def __init__(self, devices, launch, stop, run_job, max_launch_attempts=2, max_device_failures=2):
+        """
+        Args:
+            devices: list of device dicts ({"gpu": ..., "port": ...})
+            launch: launch(model_config, device) -> server handle (raise on failure)
+            stop: stop(server handle, device)
+            run_job: run_job(model_config, device, scenario, repeat) -> metrics dict ({} = failed)
+            max_launch_attempts: devices a model's server is tried on before its jobs are failed
+            max_device_failures: consecutive launch failures after which a device is retired
+        """
+        if not devices:
+            raise ValueError("ServerPool needs at least one device")
+        self.devices = devices
+        self.launch = launch
+        self.stop = stop
+        self.run_job = run_job
+        self.max_launch_attempts = max_launch_attempts
+        self.max_device_failures = max_device_failures
+        self.records = []
+        self.retired_devices = []
+        self.makespan_s = 0.0
+        self._lock = threading.Lock()
+
+    def _log(self, device, message):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] [GPU {device['gpu']}:{device['port']}] {message}",
+              flush=True)
+
+    def _record(self, **record):
+        with self._lock:
+            self.records.append(record)
+
+    def _fail_jobs(self, model_config, jobs, device, error):
+        for scenario, repeat in jobs:
+            self._record(model=model_config["name"], device=device, scenario=scenario, repeat=repeat,
+                         success=False, error=error, metrics={})
+
+    def _worker(self, device, pending):
+        consecutive_failures = 0
+        while True:
+            try:
+                model_config, jobs, attempts = pending.get_nowait()
+            except queue.Empty:
+                return
+            name = model_config["name"]
+            self._log(device, f"🚀 Loading {name} ({len(jobs)} jobs)")
+            load_start = time.perf_counter()
+            try:
+                server = self.launch(model_config, device)
+            except Exception as e:
+                consecutive_failures += 1
+                attempts += 1
+                self._log(device, f"❌ Server for {name} failed to start: {e}")
+                if attempts < self.max_launch_attempts:
+                    pending.put((model_config, jobs, attempts))
+                else:
+                    self._fail_jobs(model_config, jobs, device, f"launch failed: {e}")
+                if consecutive_failures >= self.max_device_failures:
+                    self._log(device, f"⚠️  Retiring device after {consecutive_failures} failed launches")
+                    with self._lock:
+                        self.retired_devices.append(device)
+                    return
+                continue
+            consecutive_failures = 0
+            load_time = time.perf_counter() - load_start
+
+            try:
+                for scenario, repeat in jobs:
+                    self._log(device, f"📊 {name} / {scenario['name']} run {repeat}")
+                    try:
+                        metrics = self.run_job(model_config, device, scenario, repeat)
+                        error = "" if metrics else "no metrics"
+                    except Exception as e:
+                        metrics, error = {}, repr(e)
+                    self._record(model=name, device=device, scenario=scenario, repeat=repeat,
+                                 success=bool(metrics), error=error, metrics=metrics,
+                                 server_load_s=load_time)
+                    status = "✅" if metrics else f"❌ {error}"
+                    self._log(device, f"   {status}")
+            finally:
+                self._log(device, f"🛑 Stopping {name}")
+                self.stop(server, device)
+
+    def run(self, model_jobs):
+        """
+        Execute the job matrix and return all job records
+
+        Models are handed out in order; each device takes the next pending
+        model as soon as it has finished its current one.
+        """
+        pending = queue.Queue()
+        for model_config, jobs in model_jobs:
+            pending.put((model_config, jobs, 0))
+
+        threads = [
+            threading.Thread(target=self._worker, args=(device, pending), daemon=True)
+            for device in self.devices
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.makespan_s = time.perf_counter() - start
+
+        # Left over when every device was retired, or a retry was queued after the others finished
+        while not pending.empty():
+            model_config, jobs, _ = pending.get_nowait()
+            self._fail_jobs(model_config, jobs, None, "not scheduled: no device available")
+        return self.records
+
+    def summary(self):
+        total = len(self.records)
+        succeeded = sum(1 for r in self.records if r["success"])
+        per_model = {}
+        for r in self.records:
+            gpu = r["device"]["gpu"] if r["device"] else None
+            stats = per_model.setdefault(r["model"], {"gpu": gpu, "succeeded": 0, "failed": 0})
+            stats["succeeded" if r["success"] else "failed"] += 1
+        return {
+            "devices": len(self.devices),
+            "jobs": total,
+            "succeeded": succeeded,
+            "failed": total - succeeded,
+            "retired_devices": self.retired_devices,
+            "makespan_s": self.makespan_s,
+            "models": per_model,
+        }
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Statistics for benchmark and GPQA comparisons
+
+One definition of spread is used everywhere: the sample standard deviation
+(ddof=1). Uncertainty is reported as a 95% bootstrap percentile confidence
+interval of the mean. The reports, run_benchmark.py averages and the early
+stop all use this module.
+
+- describe: mean, sample std, bootstrap CI of the mean
+- speedup_ci: ratio of mean throughputs (model vs original), groups resampled
+  independently, with a bootstrap p-value for "no difference"
+- paired_difference: GPQA accuracy difference paired by question (per-question
+  accuracy averaged over repeats), bootstrap CI and a sign-flip permutation test
+- required_repeats: repeats needed for a target relative CI half-width
+- precision_reached: relative t CI half-width of the runs so far is within a
+  target -> adaptive repeats (run_benchmark.py / run_gpqa_sglang.py --adaptive)
+- speedup_t_ci: Welch t interval of the speedup (on the log ratio, delta method)
+- comparison_conclusive: Welch speedup interval excludes 1 (different) or lies
+  within the equivalence margin (same) -> run_benchmark.py --early-stop
+
+Bootstrap resamples are drawn as one (n_boot, n) index matrix, so every
+statistic is a single vectorized reduction. With only a few runs the
+percentile bootstrap CI is optimistic (at n=3 it is about a third of the t
+interval), so it is used for reporting only and flagged low_confidence below
+LOW_CONFIDENCE_N runs. Every stop rule (early stop, adaptive precision,
+required_repeats) uses t intervals instead.
+
+Usage:
+    python performance/stats.py                       # speedup CIs vs original from the results store
+    python performance/stats.py --target-width 0.02   # + repeats needed for ±2% CIs
+    python performance/stats.py --gpqa results/original/.../results_x.json results/w8a8_smooth_ptq/.../results_y.json
+"""
+
+import sys
+import json
+import math
+import argparse
+from pathlib import Path
+from functools import lru_cache
+from collections import defaultdict
+
+import numpy as np
+
+CONFIDENCE = 0.95
+N_BOOTSTRAP = 10000
+N_PERMUTATIONS = 10000
+MIN_REPEATS = 3
+LOW_CONFIDENCE_N = 5  # Bootstrap CIs from fewer runs are labelled low-confidence
+EQUIVALENCE_MARGIN = 0.02  # Speedup CI within [0.98, 1.02] counts as "no difference"
+SEED = 0
+
+
+def _rng(seed=SEED):
+    return np.random.default_rng(seed)
+
+
+def bootstrap_means(values, n_boot=N_BOOTSTRAP, rng=None):
+    """Means of n_boot resamples (with replacement) of values"""
+    values = np.asarray(values, dtype=np.float64)
+    rng = rng or _rng()
+    idx = rng.integers(0, len(values), size=(n_boot, len(values)))
+    return values[idx].mean(axis=1)
+
+
+def percentile_ci(samples, confidence=CONFIDENCE):
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def describe(values, confidence=CONFIDENCE, n_boot=N_BOOTSTRAP):
+    """Mean, sample std and bootstrap CI of the mean (low_confidence below LOW_CONFIDENCE_N values)"""
+    values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return {"mean": None, "std": None, "n": 0, "ci_low": None, "ci_high": None, "ci_half": None,
+                "low_confidence": True}
+    mean = float(values.mean())
+    if n == 1:
+        return {"mean": mean, "std": 0.0, "n": 1, "ci_low": mean, "ci_high": mean, "ci_half": 0.0,
+                "low_confidence": True}
+    low, high = percentile_ci(bootstrap_means(values, n_boot), confidence)
+    return {
+        "mean": mean,
+        "std": float(values.std(ddof=1)),
+        "n": n,
+        "ci_low": low,
+        "ci_high": high,
+        "ci_half": (high - low) / 2,
+        "low_confidence": n < LOW_CONFIDENCE_N,
+    }
+
+
+def speedup_ci(treatment, baseline, confidence=CONFIDENCE, n_boot=N_BOOTSTRAP):
+    """
+    Speedup = mean(treatment) / mean(baseline), e.g. output throughput vs original
+
+    Returns:
+        dict with speedup, ci_low, ci_high, p_value (two-sided bootstrap p-value
+        of speedup == 1), significant (CI excludes 1) and low_confidence
+        (either side has fewer than LOW_CONFIDENCE_N runs)
+    """
+    treatment = np.asarray(treatment, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    rng = _rng()
+    ratios = bootstrap_means(treatment, n_boot, rng) / bootstrap_means(baseline, n_boot, rng)
+    low, high = percentile_ci(ratios, confidence)
+    # +1 as in paired_difference, so the p-value is never exactly 0
+    extreme = min(np.sum(ratios <= 1.0), np.sum(ratios >= 1.0))
+    p_value = min(1.0, 2 * (extreme + 1) / (n_boot + 1))
+    return {
+        "speedup": float(treatment.mean() / baseline.mean()),
+        "ci_low": low,
+        "ci_high": high,
+        "p_value": float(p_value),
+        "significant": bool(low > 1.0 or high < 1.0),
+        "n": len(treatment),
+        "n_baseline": len(baseline),
+        "low_confidence": min(len(treatment), len(baseline)) < LOW_CONFIDENCE_N,
+    }
+
+
+def speedup_t_ci(treatment, baseline, confidence=CONFIDENCE):
+    """
+    Welch t interval of mean(treatment) / mean(baseline)
+
+    The interval is built on the log ratio, whose standard error is
+    sqrt(s_t²/(n_t m_t²) + s_b²/(n_b m_b²)) by the delta method, with
+    Welch-Satterthwaite degrees of freedom (rounded down, so never optimistic).
+
+    Returns:
+        dict with speedup, ci_low, ci_high and df (None with fewer than 2 runs per side)
+    """
+    treatment = np.asarray(treatment, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    n_t, n_b = len(treatment), len(baseline)
+    if n_t < 2 or n_b < 2 or treatment.mean() <= 0 or baseline.mean() <= 0:
+        return None
+    ratio = float(treatment.mean() / baseline.mean())
+    var_t = treatment.var(ddof=1) / (n_t * treatment.mean() ** 2)
+    var_b = baseline.var(ddof=1) / (n_b * baseline.mean() ** 2)
+    se = math.sqrt(var_t + var_b)
+    if se == 0:
+        return {"speedup": ratio, "ci_low": ratio, "ci_high": ratio, "df": n_t + n_b - 2}
+    df = (var_t + var_b) ** 2 / (var_t ** 2 / (n_t - 1) + var_b ** 2 / (n_b - 1))
+    df = max(1, int(df))
+    half = _t_quantile(confidence, df) * se
+    return {"speedup": ratio, "ci_low": ratio * math.exp(-half), "ci_high": ratio * math.exp(half), "df": df}
+
+
+def comparison_conclusive(treatment, baseline, min_repeats=MIN_REPEATS, margin=EQUIVALENCE_MARGIN):
+    """
+    Whether more repeats can change the verdict of treatment vs baseline
+
+    Decided on the Welch t interval of the speedup (speedup_t_ci), not the
+    bootstrap CI, which is too narrow at the small n where the early stop acts.
+
+    Returns:
+        (conclusive, verdict) - verdict is "faster", "slower", "equivalent" or "inconclusive"
+    """
+    if len(treatment) < max(min_repeats, 2) or len(baseline) < 2:
+        return False, "inconclusive"
+    result = speedup_t_ci(treatment, baseline)
+    if result is None:
+        return False, "inconclusive"
+    if result["ci_low"] > 1.0:
+        return True, "faster"
+    if result["ci_high"] < 1.0:
+        return True, "slower"
+    if 1.0 - margin <= result["ci_low"] and result["ci_high"] <= 1.0 + margin:
+        return True, "equivalent"
+    return False, "inconclusive"
+
+
+def required_repeats(values, target_rel_half_width, confidence=CONFIDENCE, max_repeats=1000):
+    """
+    Repeats needed so that the CI half-width of the mean is <= target × mean
+
+    Uses the observed coefficient of variation with the t critical value,
+    iterating because the critical value depends on n.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2 or values.mean() == 0:
+        return None
+    cv = values.std(ddof=1) / abs(values.mean())
+    if cv == 0:
+        return len(values)
+    n = 2
+    while n < max_repeats:
+        if _t_quantile(confidence, n - 1) * cv / math.sqrt(n) <= target_rel_half_width:
+            return n
+        n += 1
+    return max_repeats
+
+
+def relative_half_width(values, confidence=CONFIDENCE):
+    """t CI half-width of the mean divided by the mean (None below 2 values or for a zero mean)"""
+    values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    if len(values) < 2 or values.mean() == 0:
+        return None
+    n = len(values)
+    return float(_t_quantile(confidence, n - 1) * values.std(ddof=1) / math.sqrt(n) / abs(values.mean()))
+
+
+def precision_reached(values, target_rel_half_width, min_repeats=MIN_REPEATS, confidence=CONFIDENCE):
+    """
+    Whether the runs so far pin the mean down to ± target × mean
+
+    Returns:
+        (reached, relative half-width) - never reached before min_repeats values
+    """
+    width = relative_half_width(values, confidence)
+    reached = width is not None and len(values) >= min_repeats and width <= target_rel_half_width
+    return reached, width
+
+
+@lru_cache(maxsize=None)
+def _t_quantile(confidence, df):
+    """Two-sided Student t critical value (no scipy): bisection on the numerically integrated density"""
+    target = confidence / 2  # Mass between 0 and the critical value
+    log_norm = math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - 0.5 * math.log(df * math.pi)
+
+    def mass(x):
+        t = np.linspace(0.0, x, 20001)
+        density = np.exp(log_norm - (df + 1) / 2 * np.log1p(t * t / df))
+        return float(np.sum((density[1:] + density[:-1]) / 2) * (t[1] - t[0]))
+
+    low, high = 0.0, 1000.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if mass(mid) < target:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def per_question_accuracy(samples):
+    """{question_id: mean correctness over repeats} from [{"question_id", "repeat", "correct"}]"""
+    totals = defaultdict(list)
+    for sample in samples:
+        totals[sample["question_id"]].append(float(sample["correct"]))
+    return {qid: sum(v) / len(v) for qid, v in totals.items()}
+
+
+def paired_difference(samples_a, samples_b, confidence=CONFIDENCE, n_boot=N_BOOTSTRAP, n_perm=N_PERMUTATIONS):
+    """
+    Accuracy difference (a - b) paired by question
+
+    Each question contributes its accuracy averaged over the repeats, so
+    question difficulty cancels out. The p-value is a sign-flip permutation
+    test of "no difference" on the per-question differences.
+    """
+    acc_a, acc_b = per_question_accuracy(samples_a), per_question_accuracy(samples_b)
+    common = sorted(set(acc_a) & set(acc_b))
+    if not common:
+        raise ValueError("No questions in common")
+    diffs = np.array([acc_a[q] - acc_b[q] for q in common])
+    rng = _rng()
+    low, high = percentile_ci(bootstrap_means(diffs, n_boot, rng), confidence)
+    observed = abs(diffs.mean())
+    signs = rng.choice(np.array([-1.0, 1.0]), size=(n_perm, len(diffs)))
+    flipped = np.abs((signs * diffs).mean(axis=1))
+    return {
+        "accuracy_a": float(np.mean([acc_a[q] for q in common])),
+        "accuracy_b": float(np.mean([acc_b[q] for q in common])),
+        "difference": float(diffs.mean()),
+        "ci_low": low,
+        "ci_high": high,
+        # +1 so a permutation test never reports p = 0
+        "p_value": float((np.sum(flipped >= observed - 1e-12) + 1) / (n_perm + 1)),
+        "questions": len(common),
+        "discordant": int(np.count_nonzero(diffs)),
+    }
+
+
+def load_gpqa_samples(path):
+    """Per-sample correctness saved by run_gpqa_sglang.py (results_*.json "samples")"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if not data.get("samples"):
+        raise ValueError(f"{path} has no per-sample results (re-run with the current run_gpqa_sglang.py)")
+    return data["model"], data["samples"]
+
+
+def benchmark_comparisons(store, baseline="original", metric="output_throughput", target_width=None):
+    """Speedup CI of every model × shape vs the baseline, from the results store"""
+    values = defaultdict(list)
+    columns = store.columns(["model", "batch_size", "input_len", "output_len", metric])
+    for model, b, i, o, value in zip(*(columns[c] for c in columns)):
+        if value is not None:
+            values[(str(model), (int(b), int(i), int(o)))].append(float(value))
+    rows = []
+    for (model, shape), runs in sorted(values.items()):
+        if model == baseline or (baseline, shape) not in values:
+            continue
+        base_runs = values[(baseline, shape)]
+        row = {"model": model, "shape": shape, **speedup_ci(runs, base_runs)}
+        row["verdict"] = comparison_conclusive(runs, base_runs)[1]
+        if target_width:
+            row["repeats_needed"] = max(required_repeats(runs, target_width) or 0,
+                                        required_repeats(base_runs, target_width) or 0)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and significance tests for benchmark and GPQA results")
+    parser.add_argument("--gpqa", type=str, nargs=2, metavar=("RESULT_A", "RESULT_B"),
+                        help="Compare two run_gpqa_sglang.py results_*.json (paired by question)")
+    parser.add_argument("--metric", type=str, default="output_throughput", help="Benchmark metric for speedups")
+    parser.add_argument("--baseline", type=str, default="original", help="Baseline model name")
+    parser.add_argument("--target-width", type=float, default=None,
+                        help="Also print the repeats needed for this relative CI half-width (e.g. 0.02)")
+    args = parser.parse_args()
+
+    if args.gpqa:
+        model_a, samples_a = load_gpqa_samples(args.gpqa[0])
+        model_b, samples_b = load_gpqa_samples(args.gpqa[1])
+        result = paired_difference(samples_a, samples_b)
+        print(f"📊 GPQA {model_a} vs {model_b} ({result['questions']} paired questions, "
+              f"{result['discordant']} differ)")
+        print(f"   accuracy: {result['accuracy_a']:.4f} vs {result['accuracy_b']:.4f}")
+        print(f"   difference: {result['difference'] * 100:+.2f} pp "
+              f"[{result['ci_low'] * 100:+.2f}, {result['ci_high'] * 100:+.2f}] ({CONFIDENCE:.0%} CI), "
+              f"p = {result['p_value']:.4f}")
+        return
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from results_store import open_store
+
+    store = open_store()
+    rows = benchmark_comparisons(store, args.baseline, args.metric, args.target_width)
+    store.close()
+    print(f"\n{'model':<28} {'shape':<14} {'n':>3} {'speedup':>8} {f'{CONFIDENCE:.0%} CI':>17} {'p':>7} "
+          f"{'verdict':<12}" + (" repeats" if args.target_width else ""))
+    for row in rows:
+        shape = "x".join(map(str, row["shape"]))
+        print(f"{row['model']:<28} {shape:<14} {row['n']:>3} {row['speedup']:>7.3f}x "
+              f"[{row['ci_low']:.3f}, {row['ci_high']:.3f}] {row['p_value']:>7.4f} {row['verdict']:<12}"
+              + (f" {row['repeats_needed']:>7}" if args.target_width else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded request trace against a server
+
+run_gpqa_sglang.py --record-trace logs the arrival offset and prompt/output
+token counts of every request (evaluation/trace.py). Replaying builds one
+synthetic request per trace row with the same prompt length and the same
+output length (ignore_eos), sent at the recorded offset through the open-loop
+load generator. This keeps GPQA's length distribution, with prompts of a few
+hundred tokens and a heavy tail of outputs up to max_tokens, for any model.
+
+Timing can be scaled in two ways:
+- time_scale: multiply every offset (0.5 = same requests in half the time)
+- rate: rescale offsets so the mean arrival rate is `rate` requests/s
+  (inf = send everything at once)
+
+Each replay appends one row with latency percentiles (TTFT, ITL, TPOT, e2e)
+and throughput to trace_result.jsonl.
+
+Usage:
+    python performance/trace_replay.py results/.../trace_0shot_greedy_1repeats.jsonl --model-name original --rate 4
+    python performance/run_benchmark.py --trace results/.../trace_*.jsonl --trace-time-scale 0.5 \
+        --model-name w8a8_smooth_ptq --model-path <MODEL_PATH>
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).parent))
+from load_generator import run_load, synthetic_requests
+
+TRACE_RESULT_FILE = Path(__file__).parent.parent / "trace_result.jsonl"
+
+
+def load_trace(path, limit=None):
+    """Trace rows sorted by arrival, offsets shifted to start at 0 (first `limit` arrivals)"""
+    rows = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    rows.sort(key=lambda r: r["arrival_s"])
+    if limit:
+        rows = rows[:limit]
+    if rows:
+        origin = rows[0]["arrival_s"]
+        rows = [dict(r, arrival_s=r["arrival_s"] - origin) for r in rows]
+    return rows
+
+
+def native_rate(trace):
+    """Mean arrival rate of a trace in requests/s (inf if every request arrived at once)"""
+    span = trace[-1]["arrival_s"] if trace else 0.0
+    return (len(trace) - 1) / span if span > 0 else float("inf")
+
+
+def trace_requests(trace, time_scale=1.0, rate=None, max_output_len=None, seed=0):
+    """
+    Load generator request specs reproducing a trace
+
+    Args:
+        trace: rows from load_trace
+        time_scale: factor applied to every arrival offset
+        rate: target mean arrival rate in requests/s (overrides time_scale)
+        max_output_len: optional cap on output tokens per request
+    """
+    if rate is not None:
+        time_scale = 0.0 if rate == float("inf") else native_rate(trace) / rate
+        if time_scale == float("inf"):
+            time_scale = 1.0  # A trace without spread cannot be slowed down
+    requests = []
+    for i, row in enumerate(trace):
+        output_len = max(int(row["output_tokens"]), 1)
+        if max_output_len:
+            output_len = min(output_len, max_output_len)
+        spec = synthetic_requests(1, max(int(row["prompt_tokens"]), 1), output_len, seed=seed + i)[0]
+        spec["arrival"] = row["arrival_s"] * time_scale
+        requests.append(spec)
+    return requests, time_scale
+
+
+def replay_trace(model_name, base_url, trace_path, time_scale=1.0, rate=None, max_concurrency=None,
+                 limit=None, max_output_len=None, seed=0):
+    """
+    Replay a trace and append the summary row to trace_result.jsonl
+
+    Returns:
+        (row, per-request results)
+    """
+    trace = load_trace(trace_path, limit)
+    if not trace:
+        raise ValueError(f"Trace {trace_path} is empty")
+    requests, scale = trace_requests(trace, time_scale, rate, max_output_len, seed)
+
+    prompt_lens = sorted(len(r["input_ids"]) for r in requests)
+    output_lens = sorted(r["output_len"] for r in requests)
+    print(f"\n  🎞️  Replaying {len(requests)} requests from {Path(trace_path).name} "
+          f"(time scale {scale:.3g}, {native_rate(trace) / scale if scale else float('inf'):.2f} req/s)")
+    print(f"     prompt tokens p50/max {prompt_lens[len(prompt_lens) // 2]}/{prompt_lens[-1]}, "
+          f"output tokens p50/max {output_lens[len(output_lens) // 2]}/{output_lens[-1]}")
+
+    metrics, results = run_load(base_url, requests, mode="open", max_concurrency=max_concurrency, seed=seed)
+    row = {
+        "model": model_name,
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "trace": str(trace_path),
+        "time_scale": scale,
+        "target_rate": rate,
+        "trace_rate": native_rate(trace),
+        "max_concurrency": max_concurrency,
+        "max_output_len": max_output_len,
+        **metrics,
+    }
+    with open(TRACE_RESULT_FILE, "a") as f:
+        f.write(json.dumps(row) + "\n")
+
+    print(f"     {'✅' if metrics['failed'] == 0 else '❌'} {metrics['completed']}/{metrics['num_requests']} "
+          f"in {metrics['duration_s']:.1f}s: {metrics['request_throughput']:.2f} req/s, "
+          f"{metrics['output_throughput']:.0f} output tok/s")
+    print(f"     TTFT p50/p99 {metrics['p50_ttft_s']:.3f}/{metrics['p99_ttft_s']:.3f}s, "
+          f"TPOT p50/p99 {metrics['p50_tpot_s'] * 1000:.1f}/{metrics['p99_tpot_s'] * 1000:.1f}ms, "
+          f"e2e p50/p99 {metrics['p50_e2e_latency_s']:.2f}/{metrics['p99_e2e_latency_s']:.2f}s")
+    return row, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a run_gpqa_sglang.py request trace against a running server")
+    parser.add_argument("trace", type=str, help="trace_*.jsonl written by run_gpqa_sglang.py --record-trace")
+    parser.add_argument("--base-url", type=str, default="http://127.0.0.1:30000", help="Server address")
+    parser.add_argument("--model-name", type=str, required=True, help="Model name recorded with the results")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every arrival offset")
+    parser.add_argument("--rate", type=float, default=None, help="Target mean arrival rate in req/s (overrides --time-scale)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Cap on in-flight requests")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N arrivals")
+    parser.add_argument("--max-output-len", type=int, default=None, help="Cap output tokens per request")
+    args = parser.parse_args()
+
+    replay_trace(args.model_name, args.base_url, args.trace, args.time_scale, args.rate,
+                 args.max_concurrency, args.limit, args.max_output_len)
+    print(f"\n💾 Results appended to: {TRACE_RESULT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
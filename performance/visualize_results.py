@@ -2,9 +2,14 @@
 """
 Performance Visualization Script
 Generates comprehensive performance comparison charts from benchmark results
+
+Only figures whose input groups (model × scenario rows, sweep and prefix-cache steps) changed
+since the last run are re-rendered (report_cache.py manifest), in parallel
+across a process pool; --force re-renders everything.
 """
 
-import json
+import sys
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -18,10 +23,12 @@ warnings.filterwarnings('ignore')
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
 
+sys.path.insert(0, str(Path(__file__).parent))
+from results_store import RESULT_FILE, open_store
+from report_cache import ReportManifest, digest, render_parallel, select_digests, source_digest
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
-PROJECT_ROOT = SCRIPT_DIR.parent
-RESULT_FILE = PROJECT_ROOT / "result.jsonl"
 OUTPUT_DIR = SCRIPT_DIR / "figures"
 OUTPUT_DIR.mkdir(exist_ok=True)
 
@@ -36,6 +43,8 @@ SCENARIO_CONFIGS = {
     (1, 16384, 32): "16K Long Context"
 }
 
+METRICS = ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']
+
 # Selected models for visualization
 SELECTED_MODELS = ["original", "w8a8_smooth_ptq", "w8a8_smooth_gptq", "w8a16_smooth_awq"]
 
@@ -56,75 +65,83 @@ MODEL_COLORS = {
 }
 
 
-def load_results(result_file: Path) -> List[Dict]:
-    """Load benchmark results from JSONL file"""
-    results = []
-    with open(result_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                results.append(json.loads(line))
-    return results
-
-
-def extract_model_name(run_name: str) -> str:
-    """Extract model name from run_name"""
-    # Remove config and run suffix
-    parts = run_name.rsplit('_run', 1)
-    if len(parts) == 2:
-        name_with_config = parts[0]
-        # Remove config suffix (base, interactive, etc.)
-        for config in ['base', 'interactive', 'prefill_bound', 'decode_bound', 
-                      'medium_batch', 'high_concurrency', 'long_context']:
-            if name_with_config.endswith('_' + config):
-                return name_with_config[:-len(config)-1]
-        return name_with_config
-    return run_name
-
-
-def group_by_model_and_scenario(results: List[Dict]) -> Dict[str, Dict[Tuple, List[Dict]]]:
+def compute_averages(store, models=None, shapes=None) -> Dict[str, Dict[Tuple, Dict]]:
     """
-    Group results by model and scenario
-    Returns: {model_name: {(batch, input, output): [result1, result2, ...]}}
+    Average metrics for each model and scenario (optionally only some), aggregated in the results store
+    Returns: {model_name: {scenario: {metric: avg_value}}}
     """
-    grouped = defaultdict(lambda: defaultdict(list))
-    
-    for result in results:
-        model_name = extract_model_name(result['run_name'])
-        scenario_key = (result['batch_size'], result['input_len'], result['output_len'])
-        grouped[model_name][scenario_key].append(result)
-    
-    return grouped
+    averages = defaultdict(dict)
+    
+    for group in store.aggregate(METRICS, models=models, shapes=shapes):
+        scenario_key = (group['batch_size'], group['input_len'], group['output_len'])
+        metrics = {}
+        for metric in METRICS:
+            stats = group.get(metric)
+            metrics[metric] = stats['mean'] if stats else 0
+            metrics[f'{metric}_std'] = stats['std'] if stats else 0  # Sample std, as in stats.py
+        averages[group['model']][scenario_key] = metrics
+    
+    return dict(averages)
+
 
+def scenario_figure_path(idx: int, scenario: Tuple, output_path: Path) -> Path:
+    name = SCENARIO_CONFIGS[scenario].lower().replace(" ", "_").replace("(", "").replace(")", "")
+    return output_path / f'1_{idx}_throughput_{name}.png'
 
-def compute_averages(grouped_data: Dict[str, Dict[Tuple, List[Dict]]]) -> Dict[str, Dict[Tuple, Dict]]:
+
+def plot_scenario_throughput(averages: Dict, idx: int, scenario: Tuple, output_path: Path):
     """
-    Compute average metrics for each model and scenario
-    Returns: {model_name: {scenario: {metric: avg_value}}}
+    Figure 1.idx: Bar chart of one scenario
+    Only includes selected models
     """
-    averages = {}
+    models = SELECTED_MODELS
+    fig, ax = plt.subplots(figsize=(10, 6))
     
-    for model_name, scenarios in grouped_data.items():
-        averages[model_name] = {}
-        
-        for scenario_key, results in scenarios.items():
-            if not results:
-                continue
-            
-            # Compute averages for each metric
-            metrics = {}
-            for metric in ['latency', 'output_throughput', 'overall_throughput', 'input_throughput']:
-                values = [r.get(metric, 0) for r in results if metric in r]
-                if values:
-                    metrics[metric] = np.mean(values)
-                    metrics[f'{metric}_std'] = np.std(values) if len(values) > 1 else 0
-                else:
-                    metrics[metric] = 0
-                    metrics[f'{metric}_std'] = 0
-            
-            averages[model_name][scenario_key] = metrics
+    # Prepare data for this scenario
+    values = []
+    errors = []
+    model_labels = []
+    colors = []
+    
+    for model in models:
+        if model in averages and scenario in averages[model]:
+            values.append(averages[model][scenario]['output_throughput'])
+            errors.append(averages[model][scenario]['output_throughput_std'])
+            model_labels.append(MODEL_DISPLAY_NAMES[model])
+            colors.append(MODEL_COLORS[model])
+        else:
+            values.append(0)
+            errors.append(0)
+            model_labels.append(MODEL_DISPLAY_NAMES[model])
+            colors.append(MODEL_COLORS[model])
+    
+    x = np.arange(len(models))
+    bars = ax.bar(x, values, color=colors, yerr=errors, capsize=5, alpha=0.85, edgecolor='black', linewidth=1.5)
+    
+    # Add value labels on bars (positioned above the bars)
+    for bar, val in zip(bars, values):
+        if val > 0:
+            height = bar.get_height()
+            # Position label slightly above the bar
+            y_offset = max(values) * 0.03  # 3% of max value as offset
+            ax.text(bar.get_x() + bar.get_width()/2., height + y_offset,
+                   f'{val:.0f}',
+                   ha='center', va='bottom', fontsize=10, fontweight='bold')
+    
+    ax.set_ylabel('Output Throughput (tok/s)', fontsize=12, fontweight='bold')
+    ax.set_title(f'Configuration {idx}: {SCENARIO_CONFIGS[scenario]}', 
+                 fontsize=13, fontweight='bold', pad=15)
+    ax.set_xticks(x)
+    ax.set_xticklabels(model_labels, rotation=0, ha='center', fontsize=10)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    ax.set_ylim(0, max(values) * 1.15 if max(values) > 0 else 100)
+    
+    plt.tight_layout()
+    output_file = scenario_figure_path(idx, scenario, output_path)
+    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.close()
     
-    return averages
+    print(f"Saved: {output_file}")
 
 
 def plot_overall_throughput_comparison(averages: Dict, output_path: Path):
@@ -132,57 +149,8 @@ def plot_overall_throughput_comparison(averages: Dict, output_path: Path):
     Figure 1: Generate 7 separate bar charts, one for each scenario
     Only includes selected models
     """
-    scenarios = list(SCENARIO_CONFIGS.keys())
-    models = SELECTED_MODELS
-    
-    for idx, scenario in enumerate(scenarios, 1):
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Prepare data for this scenario
-        values = []
-        errors = []
-        model_labels = []
-        colors = []
-        
-        for model in models:
-            if model in averages and scenario in averages[model]:
-                values.append(averages[model][scenario]['output_throughput'])
-                errors.append(averages[model][scenario]['output_throughput_std'])
-                model_labels.append(MODEL_DISPLAY_NAMES[model])
-                colors.append(MODEL_COLORS[model])
-            else:
-                values.append(0)
-                errors.append(0)
-                model_labels.append(MODEL_DISPLAY_NAMES[model])
-                colors.append(MODEL_COLORS[model])
-        
-        x = np.arange(len(models))
-        bars = ax.bar(x, values, color=colors, yerr=errors, capsize=5, alpha=0.85, edgecolor='black', linewidth=1.5)
-        
-        # Add value labels on bars (positioned above the bars)
-        for bar, val in zip(bars, values):
-            if val > 0:
-                height = bar.get_height()
-                # Position label slightly above the bar
-                y_offset = max(values) * 0.03  # 3% of max value as offset
-                ax.text(bar.get_x() + bar.get_width()/2., height + y_offset,
-                       f'{val:.0f}',
-                       ha='center', va='bottom', fontsize=10, fontweight='bold')
-        
-        ax.set_ylabel('Output Throughput (tok/s)', fontsize=12, fontweight='bold')
-        ax.set_title(f'Configuration {idx}: {SCENARIO_CONFIGS[scenario]}', 
-                     fontsize=13, fontweight='bold', pad=15)
-        ax.set_xticks(x)
-        ax.set_xticklabels(model_labels, rotation=0, ha='center', fontsize=10)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-        ax.set_ylim(0, max(values) * 1.15 if max(values) > 0 else 100)
-        
-        plt.tight_layout()
-        output_file = output_path / f'1_{idx}_throughput_{SCENARIO_CONFIGS[scenario].lower().replace(" ", "_").replace("(", "").replace(")", "")}.png'
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        print(f"Saved: {output_file}")
+    for idx, scenario in enumerate(SCENARIO_CONFIGS.keys(), 1):
+        plot_scenario_throughput(averages, idx, scenario, output_path)
 
 
 def plot_latency_throughput_scatter(averages: Dict, output_path: Path):
@@ -419,6 +387,149 @@ def plot_speedup_summary(averages: Dict, output_path: Path):
     print(f"Saved: {output_path / '4_speedup_summary.png'}")
 
 
+def latest_sweeps(sweep_rows: List[Dict]) -> Dict[str, List[Dict]]:
+    """Keep only the most recent sweep per model, steps sorted by offered load"""
+    latest = {}
+    for row in sweep_rows:
+        model = row["model"]
+        if model not in latest or row["timestamp"] > latest[model]:
+            latest[model] = row["timestamp"]
+    
+    sweeps = defaultdict(list)
+    for row in sweep_rows:
+        if row["timestamp"] == latest[row["model"]]:
+            sweeps[row["model"]].append(row)
+    for steps in sweeps.values():
+        steps.sort(key=lambda r: r["offered_load"])
+    return dict(sweeps)
+
+
+def plot_saturation_curves(sweeps: Dict[str, List[Dict]], output_path: Path):
+    """
+    Figure 5: Saturation (knee) curves from the offered-load sweep
+    Left: goodput vs offered load, right: p99 TTFT vs offered load with the SLO line
+    """
+    if not sweeps:
+        print("Warning: No sweep results found, skipping saturation curves")
+        return
+    
+    fig, (ax_goodput, ax_ttft) = plt.subplots(1, 2, figsize=(16, 6))
+    models = [m for m in SELECTED_MODELS if m in sweeps] + [m for m in sweeps if m not in SELECTED_MODELS]
+    slo_values = set()
+    units = set()
+    
+    for model in models:
+        steps = sweeps[model]
+        loads = [s["offered_load"] for s in steps]
+        color = MODEL_COLORS.get(model, "#888888")
+        label = MODEL_DISPLAY_NAMES.get(model, model).replace("\n", " ")
+        
+        ax_goodput.plot(loads, [s["goodput"] for s in steps], marker='o', linewidth=2,
+                        color=color, label=label)
+        ax_ttft.plot(loads, [s["p99_ttft_s"] for s in steps], marker='o', linewidth=2,
+                     color=color, label=label)
+        
+        # Mark the highest load that still met the SLO
+        sustainable = [s for s in steps if s["slo_met"]]
+        if sustainable:
+            knee = sustainable[-1]
+            ax_goodput.scatter([knee["offered_load"]], [knee["goodput"]], s=180, marker='*',
+                               color=color, edgecolor='black', zorder=5)
+        
+        slo_values.add(steps[0]["slo_ttft_p99_s"])
+        units.add("Offered Request Rate (req/s)" if steps[0]["sweep_mode"] == "rate" else "Concurrent Clients")
+    
+    for slo in slo_values:
+        ax_ttft.axhline(y=slo, color='red', linestyle='--', linewidth=2, alpha=0.7,
+                        label=f'SLO p99 TTFT = {slo:g}s')
+    
+    xlabel = units.pop() if len(units) == 1 else "Offered Load"
+    for ax in (ax_goodput, ax_ttft):
+        ax.set_xscale('log', base=2)
+        ax.set_xlabel(xlabel, fontsize=12, fontweight='bold')
+        ax.grid(alpha=0.3)
+        ax.legend(fontsize=9)
+    
+    ax_goodput.set_ylabel('Goodput (req/s within SLO)', fontsize=12, fontweight='bold')
+    ax_goodput.set_title('Goodput vs Offered Load\n(★ = max sustainable load)', fontsize=14, fontweight='bold')
+    ax_ttft.set_ylabel('p99 TTFT (s)', fontsize=12, fontweight='bold')
+    ax_ttft.set_yscale('log')
+    ax_ttft.set_title('p99 TTFT vs Offered Load', fontsize=14, fontweight='bold')
+    
+    plt.tight_layout()
+    plt.savefig(output_path / '5_saturation_curves.png', dpi=300, bbox_inches='tight')
+    plt.close()
+    
+    print(f"Saved: {output_path / '5_saturation_curves.png'}")
+
+
+def latest_prefix_runs(prefix_rows: List[Dict]) -> Dict[str, List[Dict]]:
+    """Keep only the most recent prefix-cache workload per model, steps sorted by shared ratio"""
+    latest = {}
+    for row in prefix_rows:
+        model = row["model"]
+        if model not in latest or row["timestamp"] > latest[model]:
+            latest[model] = row["timestamp"]
+    
+    runs = defaultdict(list)
+    for row in prefix_rows:
+        if row["timestamp"] == latest[row["model"]]:
+            runs[row["model"]].append(row)
+    for steps in runs.values():
+        steps.sort(key=lambda r: r["shared_ratio"])
+    return dict(runs)
+
+
+def plot_prefix_cache(prefix_runs: Dict[str, List[Dict]], output_path: Path):
+    """
+    Figure 6: Prefix-cache workload
+    Left: measured cache hit rate vs shared-prefix ratio (dashed: ideal cache),
+    middle: output throughput, right: mean TTFT
+    """
+    if not prefix_runs:
+        print("Warning: No prefix-cache results found, skipping prefix cache figure")
+        return
+    
+    fig, (ax_hit, ax_tput, ax_ttft) = plt.subplots(1, 3, figsize=(20, 6))
+    models = [m for m in SELECTED_MODELS if m in prefix_runs] + [m for m in prefix_runs if m not in SELECTED_MODELS]
+    
+    for model in models:
+        steps = prefix_runs[model]
+        ratios = [s["shared_ratio"] * 100 for s in steps]
+        color = MODEL_COLORS.get(model, "#888888")
+        label = MODEL_DISPLAY_NAMES.get(model, model).replace("\n", " ")
+        
+        ax_hit.plot(ratios, [s["cache_hit_rate"] * 100 for s in steps], marker='o', linewidth=2,
+                    color=color, label=label)
+        ax_hit.plot(ratios, [s["expected_hit_rate"] * 100 for s in steps], linestyle='--', linewidth=1.5,
+                    color=color, alpha=0.6)
+        ax_tput.plot(ratios, [s["output_throughput"] for s in steps], marker='o', linewidth=2,
+                     color=color, label=label)
+        ax_ttft.plot(ratios, [s["mean_ttft_s"] * 1000 for s in steps], marker='o', linewidth=2,
+                     color=color, label=label)
+    
+    first = prefix_runs[models[0]][0]
+    workload = (f"{first['num_prefixes']} prefixes, {first['prefix_len_dist']} length {first['prefix_len']} "
+                f"of {first['input_len']} tokens")
+    for ax in (ax_hit, ax_tput, ax_ttft):
+        ax.set_xlabel('Requests with a Shared Prefix (%)', fontsize=12, fontweight='bold')
+        ax.grid(alpha=0.3)
+        ax.legend(fontsize=9)
+    
+    ax_hit.set_ylabel('Cache Hit Rate (% of prompt tokens)', fontsize=12, fontweight='bold')
+    ax_hit.set_title(f'Prefix Cache Hit Rate\n(dashed = ideal cache; {workload})', fontsize=14, fontweight='bold')
+    ax_tput.set_ylabel('Output Throughput (tokens/s)', fontsize=12, fontweight='bold')
+    ax_tput.set_title('Output Throughput vs Prefix Sharing', fontsize=14, fontweight='bold')
+    ax_ttft.set_ylabel('Mean TTFT (ms)', fontsize=12, fontweight='bold')
+    ax_ttft.set_title('Mean TTFT vs Prefix Sharing', fontsize=14, fontweight='bold')
+    
+    plt.tight_layout()
+    plt.savefig(output_path / '6_prefix_cache.png', dpi=300, bbox_inches='tight')
+    plt.close()
+    
+    print(f"Saved: {output_path / '6_prefix_cache.png'}")
+
+
 def generate_summary_table(averages: Dict, output_path: Path):
     """
     Generate a summary table of key metrics
@@ -484,8 +595,33 @@ def generate_summary_table(averages: Dict, output_path: Path):
     print('\n'.join(summary_lines[:30]))  # Print first 30 lines
 
 
+def figure_specs(output_path: Path) -> List[Dict]:
+    """Figures and tables built from the selected models: target, scenarios read, outputs, renderer"""
+    all_scenarios = set(SCENARIO_CONFIGS)
+    specs = []
+    for idx, scenario in enumerate(SCENARIO_CONFIGS.keys(), 1):
+        specs.append({'target': f'1_{idx}', 'scenarios': {scenario},
+                      'outputs': [scenario_figure_path(idx, scenario, output_path)],
+                      'func': plot_scenario_throughput, 'args': (idx, scenario, output_path)})
+    specs.append({'target': '3_prefill_decode', 'scenarios': {(1, 2048, 32), (1, 256, 512)},
+                  'outputs': [output_path / '3_prefill_decode_comparison.png'],
+                  'func': plot_prefill_decode_comparison, 'args': (output_path,)})
+    specs.append({'target': '4_speedup', 'scenarios': all_scenarios,
+                  'outputs': [output_path / '4_speedup_summary.png'],
+                  'func': plot_speedup_summary, 'args': (output_path,)})
+    specs.append({'target': 'summary_table', 'scenarios': all_scenarios,
+                  'outputs': [output_path / 'summary_table.txt'],
+                  'func': generate_summary_table, 'args': (output_path,)})
+    return specs
+
+
 def main():
     """Main function to generate all visualizations"""
+    parser = argparse.ArgumentParser(description="Render performance figures from the results store")
+    parser.add_argument("--force", action="store_true", help="Re-render every figure, ignoring the manifest")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("Performance Visualization Tool")
     print("=" * 80)
@@ -497,16 +633,40 @@ def main():
         return
     
     print(f"Loading results from: {RESULT_FILE}")
-    results = load_results(RESULT_FILE)
-    print(f"Loaded {len(results)} benchmark results")
+    store = open_store()
+    print(f"Loaded {store.count()} benchmark results")
     print("")
     
-    # Group and compute averages
+    # Find the figures whose inputs changed
+    manifest = ReportManifest("visualize_results", force=args.force)
+    code = source_digest(__file__)
+    group_digests = store.group_digests()
+    specs = figure_specs(OUTPUT_DIR)
+    stale = []
+    for spec in specs:
+        spec['digest'] = digest(code, select_digests(group_digests, set(SELECTED_MODELS), spec['scenarios']))
+        if not manifest.is_fresh(spec['target'], spec['digest'], spec['outputs']):
+            stale.append(spec)
+    
+    sweep_digests = store.group_digests(by=("model",), table="sweep_steps")
+    sweep_digest = digest(code, sorted((key[0], value) for key, value in sweep_digests.items()))
+    sweep_output = OUTPUT_DIR / '5_saturation_curves.png'
+    sweep_stale = bool(sweep_digests) and not manifest.is_fresh('5_saturation', sweep_digest, [sweep_output])
+    
+    prefix_digests = store.group_digests(by=("model",), table="prefix_steps")
+    prefix_digest = digest(code, sorted((key[0], value) for key, value in prefix_digests.items()))
+    prefix_output = OUTPUT_DIR / '6_prefix_cache.png'
+    prefix_stale = bool(prefix_digests) and not manifest.is_fresh('6_prefix_cache', prefix_digest, [prefix_output])
+    
+    # Aggregate only the scenarios the stale figures read
     print("Processing data...")
-    grouped_data = group_by_model_and_scenario(results)
-    averages = compute_averages(grouped_data)
+    stale_scenarios = set().union(*(spec['scenarios'] for spec in stale))
+    averages = compute_averages(store, models=SELECTED_MODELS, shapes=sorted(stale_scenarios)) if stale else {}
+    sweeps = latest_sweeps(store.sweeps()) if sweep_stale else {}
+    prefix_runs = latest_prefix_runs(store.prefix_steps()) if prefix_stale else {}
+    store.close()
     
-    print(f"Found {len(averages)} models:")
+    print(f"Aggregated {len(stale_scenarios)} scenarios for {len(averages)} models")
     for model in averages.keys():
         num_scenarios = len(averages[model])
         print(f"  - {MODEL_DISPLAY_NAMES.get(model, model)}: {num_scenarios} scenarios")
@@ -516,18 +676,38 @@ def main():
     print("Generating visualizations...")
     print("-" * 80)
     
-    plot_overall_throughput_comparison(averages, OUTPUT_DIR)
     # plot_latency_throughput_scatter(averages, OUTPUT_DIR)  # Skipped per user request
-    plot_prefill_decode_comparison(averages, OUTPUT_DIR)
-    plot_speedup_summary(averages, OUTPUT_DIR)
+    jobs = [(spec['target'], spec['func'], (averages, *spec['args'])) for spec in stale
+            if spec['target'] != 'summary_table']
+    if sweep_stale:
+        jobs.append(('5_saturation', plot_saturation_curves, (sweeps, OUTPUT_DIR)))
+    elif not sweep_digests:
+        print("Warning: No sweep results found, skipping saturation curves")
+    if prefix_stale:
+        jobs.append(('6_prefix_cache', plot_prefix_cache, (prefix_runs, OUTPUT_DIR)))
+    elif not prefix_digests:
+        print("Warning: No prefix-cache results found, skipping prefix cache figure")
+    done = set(render_parallel(jobs, args.workers))
     
     print("-" * 80)
     print("")
     
     # Generate summary table
-    print("Generating summary table...")
-    generate_summary_table(averages, OUTPUT_DIR)
-    print("")
+    if any(spec['target'] == 'summary_table' for spec in stale):
+        print("Generating summary table...")
+        generate_summary_table(averages, OUTPUT_DIR)
+        done.add('summary_table')
+        print("")
+    
+    for spec in specs:
+        if spec['target'] in done:
+            manifest.record(spec['target'], spec['digest'])
+    if '5_saturation' in done:
+        manifest.record('5_saturation', sweep_digest)
+    if '6_prefix_cache' in done:
+        manifest.record('6_prefix_cache', prefix_digest)
+    manifest.save()
+    print(f"Figures and tables: {manifest.summary()}")
     
     print("=" * 80)
     print("All visualizations completed successfully!")
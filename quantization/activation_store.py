@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Layer-wise calibration activation store shared across quantization recipes
+
+Forward passes over the calibration set record, for the input of every
+Linear layer:
+    xtx     - Hessian accumulator XᵀX (float32, in_features × in_features)
+    absmax  - per-channel max |x|          (SmoothQuant smoothing scales)
+    absmean - per-channel mean |x|         (recorded for inspection only)
+
+Linears that consume the same tensor (q/k/v, gate/up) share one entry. The
+XᵀX matrices dominate the size: for Qwen3-4B about 124M floats per decoder
+layer (down_proj alone 9728² ≈ 378 MB), 16.7 GiB for all 36 layers, as
+reported by --inspect. They are accumulated on the GPU only for a chunk of
+decoder layers at a time (MAX_STATS_BYTES, one calibration pass per chunk)
+and written to disk when the chunk is done. The statistics are saved as .npy
+files next to an index.json and are loaded memory-mapped, so every later
+method reuses them instead of running the model over the calibration set
+again:
+    - smooth_from_stats: SmoothQuant scales from absmax, folded into the norms
+    - gptq_from_stats:   GPTQ weight rounding from the stored Hessians
+      (Hessians of smoothed layers are rescaled as S⁻¹ H S⁻¹)
+
+Note: GPTQ here uses the Hessians of the unquantized model for every layer
+(non-sequential GPTQ), whereas llmcompressor propagates quantized outputs
+layer by layer. Sparse and AWQ recipes do not read the store and still go
+through oneshot. quantize_model.py saves store-built checkpoints under a
+separate -ASTORE output suffix.
+
+Self-test on a tiny randomly initialized model (CPU, a few seconds):
+    python quantization/activation_store.py --self-test
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from calibration_cache import file_lock
+
+STORE_FORMAT_VERSION = 1
+
+# Device memory for XᵀX accumulators during capture; decoder layers beyond it go to later passes
+MAX_STATS_BYTES = 4 * 1024**3
+
+# (norm module, Linears it feeds) inside each decoder layer (Llama / Qwen layout)
+SMOOTH_MAPPINGS = [
+    ("input_layernorm", ("self_attn.q_proj", "self_attn.k_proj", "self_attn.v_proj")),
+    ("post_attention_layernorm", ("mlp.gate_proj", "mlp.up_proj")),
+]
+
+
+class _GroupStats:
+    """Running statistics of one Linear input"""
+
+    def __init__(self, in_features, device):
+        self.xtx = torch.zeros(in_features, in_features, dtype=torch.float32, device=device)
+        self.absmax = torch.zeros(in_features, dtype=torch.float32, device=device)
+        self.abssum = torch.zeros(in_features, dtype=torch.float64, device=device)
+        self.tokens = 0
+
+    def add(self, x):
+        x = x.reshape(-1, x.shape[-1]).float()
+        self.xtx.addmm_(x.t(), x)
+        absx = x.abs()
+        torch.maximum(self.absmax, absx.amax(dim=0), out=self.absmax)
+        self.abssum += absx.sum(dim=0, dtype=torch.float64)
+        self.tokens += x.shape[0]
+
+
+def linear_layers(model, ignore=("lm_head",)):
+    """name -> nn.Linear for every Linear not in `ignore` (matched on the full name or its last component)"""
+    return {
+        name: module for name, module in model.named_modules()
+        if isinstance(module, nn.Linear) and name.split(".")[-1] not in ignore and name not in ignore
+    }
+
+
+def decoder_layers(model):
+    """(name, ModuleList) of the decoder layer stack (model.layers on Llama / Qwen), (None, []) if not found"""
+    for name, module in model.named_modules():
+        if isinstance(module, nn.ModuleList) and name.split(".")[-1] == "layers":
+            return name, module
+    return None, []
+
+
+def capture_chunks(model, layers, max_bytes=MAX_STATS_BYTES):
+    """
+    Split Linears into runs of consecutive decoder layers whose XᵀX fit in max_bytes
+
+    Every Linear is counted separately, so inputs shared by q/k/v and gate/up
+    make this an upper bound. A decoder layer is never split; Linears outside
+    the decoder stack go into the last chunk.
+
+    Returns:
+        [(Linear names, index of the chunk's last decoder layer or None to run the full model)]
+    """
+    stack_name, stack = decoder_layers(model)
+    per_layer = [[] for _ in range(len(stack) + 1)]
+    for name in layers:
+        index = len(stack)
+        if stack_name and name.startswith(f"{stack_name}."):
+            index = int(name[len(stack_name) + 1:].split(".")[0])
+        per_layer[index].append(name)
+
+    chunks, current, current_bytes = [], [], 0
+    for index, names in enumerate(per_layer):
+        size = sum(layers[name].in_features ** 2 * 4 for name in names)
+        if current and current_bytes + size > max_bytes:
+            chunks.append((current, index - 1))
+            current, current_bytes = [], 0
+        current += names
+        current_bytes += size
+    if current:
+        chunks.append((current, None if per_layer[-1] else len(stack) - 1))
+    return chunks
+
+
+class _StopForward(Exception):
+    """Raised after the last decoder layer of a chunk; the rest of the forward is not needed"""
+
+
+def _write_group(out_dir, group, stats):
+    np.save(out_dir / f"{group}.xtx.npy", stats.xtx.cpu().numpy())
+    np.save(out_dir / f"{group}.absmax.npy", stats.absmax.cpu().numpy())
+    np.save(out_dir / f"{group}.absmean.npy", (stats.abssum / max(stats.tokens, 1)).float().cpu().numpy())
+    return {"in_features": stats.xtx.shape[0], "tokens": stats.tokens}
+
+
+@torch.no_grad()
+def capture_activation_stats(model, samples, out_dir, ignore=("lm_head",), max_stats_bytes=MAX_STATS_BYTES,
+                             logger=None):
+    """
+    Run the model over the calibration samples and write per-Linear input statistics to out_dir
+
+    The XᵀX accumulators of all layers do not fit next to the model (about
+    16.7 GiB for Qwen3-4B), so decoder layers are captured in chunks that fit
+    in max_stats_bytes: one calibration pass per chunk, cut off after the
+    chunk's last decoder layer, after which its groups are written and freed.
+
+    Args:
+        model: HF causal LM (any device map)
+        samples: re-iterable token id sequences (e.g. a calibration_cache.CalibrationSet)
+
+    Returns:
+        (layer -> group name, group name -> {"in_features", "tokens"})
+    """
+    log = logger.info if logger else print
+    out_dir = Path(out_dir)
+    layers = linear_layers(model, ignore)
+    _, stack = decoder_layers(model)
+    chunks = capture_chunks(model, layers, max_stats_bytes)
+    layer_group = {}
+    group_index = {}
+    device = next(model.parameters()).device
+    start = time.time()
+
+    for chunk_idx, (names, last_layer) in enumerate(chunks, 1):
+        groups = {}
+        last = {"input": None, "group": None}
+
+        def make_hook(name):
+            def hook(module, args):
+                x = args[0]
+                if name not in layer_group:
+                    # Consecutive Linears fed the very same tensor (q/k/v, gate/up) share statistics
+                    if x is last["input"]:
+                        layer_group[name] = last["group"]
+                    else:
+                        layer_group[name] = name
+                        groups[name] = _GroupStats(module.in_features, x.device)
+                group = layer_group[name]
+                if group == name:
+                    groups[group].add(x)
+                last["input"], last["group"] = x, group
+            return hook
+
+        def stop(module, args, output):
+            raise _StopForward
+
+        handles = [layers[name].register_forward_pre_hook(make_hook(name)) for name in names]
+        if last_layer is not None:
+            handles.append(stack[last_layer].register_forward_hook(stop))
+        try:
+            for i, ids in enumerate(samples):
+                input_ids = torch.as_tensor(np.asarray(ids), dtype=torch.long, device=device).unsqueeze(0)
+                try:
+                    model(input_ids=input_ids, use_cache=False)
+                except _StopForward:
+                    pass
+                last["input"], last["group"] = None, None
+                if (i + 1) % 64 == 0:
+                    log(f"  chunk {chunk_idx}/{len(chunks)}: captured {i + 1} samples ({time.time() - start:.0f}s)")
+        finally:
+            for handle in handles:
+                handle.remove()
+        for group, stats in groups.items():
+            group_index[group] = _write_group(out_dir, group, stats)
+        del groups
+        log(f"  chunk {chunk_idx}/{len(chunks)}: {len(names)} Linears written ({time.time() - start:.0f}s)")
+
+    log(f"✅ Captured statistics for {len(layer_group)} Linears in {len(group_index)} input groups "
+        f"({len(chunks)} passes, {time.time() - start:.0f}s)")
+    return layer_group, group_index
+
+
+def capture_store(store_dir, model, samples, meta, max_stats_bytes=MAX_STATS_BYTES, logger=None):
+    """Capture statistics into a new store (temp dir + rename, so readers never see a partial store)"""
+    store_dir = Path(store_dir)
+    store_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=store_dir.parent, prefix=f".{store_dir.name}."))
+    try:
+        os.chmod(tmp_dir, 0o755)
+        layer_group, group_index = capture_activation_stats(
+            model, samples, tmp_dir, max_stats_bytes=max_stats_bytes, logger=logger
+        )
+        index = {
+            "version": STORE_FORMAT_VERSION,
+            **meta,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "layers": layer_group,
+            "groups": group_index,
+        }
+        with open(tmp_dir / "index.json", "w") as f:
+            json.dump(index, f, indent=2)
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        os.rename(tmp_dir, store_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class ActivationStore:
+    """Read-only, memory-mapped view of a saved activation store"""
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / "index.json", "r") as f:
+            self.index = json.load(f)
+
+    @property
+    def layers(self):
+        return self.index["layers"]
+
+    def _load(self, layer, stat):
+        group = self.layers[layer]
+        return np.load(self.store_dir / f"{group}.{stat}.npy", mmap_mode="r")
+
+    def xtx(self, layer):
+        return self._load(layer, "xtx")
+
+    def absmax(self, layer):
+        return self._load(layer, "absmax")
+
+    def absmean(self, layer):
+        return self._load(layer, "absmean")
+
+    def tokens(self, layer):
+        return self.index["groups"][self.layers[layer]]["tokens"]
+
+    def hessian(self, layer, device="cpu"):
+        """GPTQ Hessian 2·XᵀX / n of the layer input"""
+        xtx = torch.from_numpy(np.array(self.xtx(layer))).to(device)
+        return xtx * (2.0 / max(self.tokens(layer), 1))
+
+
+def load_or_capture(store_dir, model, samples, meta, max_stats_bytes=MAX_STATS_BYTES, logger=None):
+    """
+    Open the store at `store_dir`, capturing it first if missing or built for other inputs
+
+    `meta` identifies the model and calibration set (e.g. model id + calibration
+    cache key); a store whose index does not match is rebuilt.
+    """
+    log = logger.info if logger else print
+    store_dir = Path(store_dir)
+
+    def matches():
+        index_file = store_dir / "index.json"
+        if not index_file.exists():
+            return False
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        return index.get("version") == STORE_FORMAT_VERSION and all(index.get(k) == v for k, v in meta.items())
+
+    if matches():
+        log(f"✅ Activation store hit: {store_dir}")
+        return ActivationStore(store_dir)
+
+    with file_lock(store_dir.parent / f"{store_dir.name}.lock"):
+        if matches():
+            log(f"✅ Activation store built by another process: {store_dir}")
+            return ActivationStore(store_dir)
+        log(f"Activation store miss, capturing: {store_dir}")
+        capture_store(store_dir, model, samples, meta, max_stats_bytes, logger=logger)
+    return ActivationStore(store_dir)
+
+
+@torch.no_grad()
+def smooth_from_stats(model, store, smoothing_strength, mappings=SMOOTH_MAPPINGS):
+    """
+    Apply SmoothQuant using stored activation absmax (no calibration forward)
+
+    s_j = max|X_j|^α / max|W_:,j|^(1-α); the norm weight is divided by s and
+    every balanced Linear's input columns are multiplied by s.
+
+    Returns:
+        layer name -> smoothing scales s (needed to rescale the stored Hessians)
+    """
+    applied = {}
+    for name, module in model.named_modules():
+        for norm_name, balance_names in mappings:
+            if not name.endswith(f".{norm_name}"):
+                continue
+            prefix = name[: -len(norm_name)]
+            balance_layers = [(prefix + b, model.get_submodule(prefix + b)) for b in balance_names]
+            act_absmax = torch.from_numpy(np.array(store.absmax(balance_layers[0][0])))
+            weight = module.weight
+            act_absmax = act_absmax.to(device=weight.device, dtype=torch.float32)
+            weight_absmax = torch.stack([
+                layer.weight.abs().amax(dim=0).float().to(weight.device) for _, layer in balance_layers
+            ]).amax(dim=0)
+            scales = act_absmax.pow(smoothing_strength) / weight_absmax.pow(1 - smoothing_strength)
+            scales = torch.where(torch.isfinite(scales) & (scales > 0), scales, torch.ones_like(scales))
+            scales = scales.clamp(min=1e-5)
+
+            module.weight.div_(scales.to(module.weight.dtype))
+            if getattr(module, "bias", None) is not None:
+                module.bias.div_(scales.to(module.bias.dtype))
+            for layer_name, layer in balance_layers:
+                layer.weight.mul_(scales.to(layer.weight.device, layer.weight.dtype).unsqueeze(0))
+                applied[layer_name] = scales.cpu()
+    return applied
+
+
+def int8_weight_scale(weight):
+    """Symmetric per-output-channel INT8 scale (same formula as compressed-tensors)"""
+    return (weight.abs().amax(dim=1, keepdim=True) / 127.5).clamp(min=1e-8)
+
+
+def gptq_quantize_weight(weight, hessian, dampening_frac=0.01, block_size=128):
+    """
+    GPTQ rounding of one weight matrix to symmetric per-channel INT8
+
+    Args:
+        weight: (out_features, in_features) tensor
+        hessian: (in_features, in_features) 2·XᵀX / n of the layer input
+
+    Returns:
+        (dequantized weight on the INT8 grid in float32, per-channel scale (out, 1))
+    """
+    W = weight.float().clone()
+    H = hessian.float().clone()
+    columns = W.shape[1]
+
+    dead = torch.diag(H) == 0
+    H[dead, dead] = 1
+    W[:, dead] = 0
+    scale = int8_weight_scale(W)
+
+    mean_diag = torch.mean(torch.diag(H))
+    damp = dampening_frac * mean_diag
+    for _ in range(3):
+        try:
+            H_damped = H + damp * torch.eye(columns, device=H.device)
+            L = torch.linalg.cholesky(H_damped)
+            Hinv = torch.linalg.cholesky(torch.cholesky_inverse(L), upper=True)
+            break
+        except RuntimeError:
+            # Rank-deficient Hessian (e.g. dampening 0): retry with a little dampening
+            damp = max(damp * 10, 1e-4 * mean_diag)
+    else:
+        raise RuntimeError("Hessian is not positive definite even after dampening")
+
+    Q = torch.zeros_like(W)
+    for i1 in range(0, columns, block_size):
+        i2 = min(i1 + block_size, columns)
+        W1 = W[:, i1:i2].clone()
+        Q1 = torch.zeros_like(W1)
+        Err1 = torch.zeros_like(W1)
+        Hinv1 = Hinv[i1:i2, i1:i2]
+        for i in range(i2 - i1):
+            w = W1[:, i]
+            d = Hinv1[i, i]
+            q = torch.clamp(torch.round(w.unsqueeze(1) / scale), -128, 127) * scale
+            q = q.squeeze(1)
+            Q1[:, i] = q
+            err = (w - q) / d
+            W1[:, i:] -= err.unsqueeze(1).matmul(Hinv1[i, i:].unsqueeze(0))
+            Err1[:, i] = err
+        Q[:, i1:i2] = Q1
+        W[:, i2:] -= Err1.matmul(Hinv[i1:i2, i2:])
+    return Q, scale
+
+
+@torch.no_grad()
+def gptq_from_stats(model, store, dampening_frac=0.01, smooth_scales=None, ignore=("lm_head",),
+                    logger=None):
+    """
+    GPTQ-round every Linear in place from the stored Hessians
+
+    Args:
+        smooth_scales: output of smooth_from_stats; the inputs of those layers were
+            divided by s, so their Hessians become S⁻¹ H S⁻¹
+
+    Returns:
+        layer name -> per-channel weight scale (to attach as weight_scale when finalizing)
+    """
+    log = logger.info if logger else print
+    smooth_scales = smooth_scales or {}
+    weight_scales = {}
+    layers = linear_layers(model, ignore)
+    start = time.time()
+    for i, (name, layer) in enumerate(layers.items()):
+        device = layer.weight.device
+        H = store.hessian(name, device=device)
+        if name in smooth_scales:
+            inv = 1.0 / smooth_scales[name].to(device)
+            H = H * inv.unsqueeze(0) * inv.unsqueeze(1)
+        Q, scale = gptq_quantize_weight(layer.weight, H, dampening_frac)
+        layer.weight.copy_(Q.to(layer.weight.dtype))
+        weight_scales[name] = scale.to(layer.weight.dtype)
+        if (i + 1) % 50 == 0:
+            log(f"  GPTQ {i + 1}/{len(layers)} layers ({time.time() - start:.0f}s)")
+    log(f"✅ GPTQ from stored Hessians: {len(layers)} layers ({time.time() - start:.0f}s)")
+    return weight_scales
+
+
+def _self_test():
+    """Verify capture, reload and reuse on a tiny random model (CPU)"""
+    from transformers import AutoModelForCausalLM, Qwen2Config
+
+    torch.manual_seed(0)
+    config = Qwen2Config(
+        vocab_size=256, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=128,
+    )
+    model = AutoModelForCausalLM.from_config(config).eval()
+    rng = np.random.default_rng(0)
+    samples = [rng.integers(0, 256, size=rng.integers(8, 32)) for _ in range(16)]
+
+    # Reference inputs of one layer, captured directly
+    target = "model.layers.1.mlp.down_proj"
+    seen = []
+    handle = model.get_submodule(target).register_forward_pre_hook(
+        lambda m, args: seen.append(args[0].reshape(-1, args[0].shape[-1]).float())
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        # One decoder layer per chunk, so the chunked capture is exercised too
+        assert len(capture_chunks(model, linear_layers(model), max_bytes=1)) == 2
+        store = load_or_capture(Path(tmp) / "store", model, samples, {"model": "tiny-random"}, max_stats_bytes=1)
+        handle.remove()
+        X = torch.cat(seen)
+        assert np.allclose(store.xtx(target), (X.t() @ X).numpy(), rtol=1e-4, atol=1e-3)
+        assert np.allclose(store.absmax(target), X.abs().amax(0).numpy())
+        assert store.layers["model.layers.0.self_attn.k_proj"] == "model.layers.0.self_attn.q_proj"
+        print(f"✅ Stored statistics match direct capture ({len(store.index['groups'])} groups)")
+
+        # Reused without another forward pass
+        again = load_or_capture(Path(tmp) / "store", model, [], {"model": "tiny-random"})
+        assert again.index["created"] == store.index["created"]
+
+        ids = torch.as_tensor(samples[0], dtype=torch.long).unsqueeze(0)
+        reference = model(input_ids=ids).logits
+        scales = smooth_from_stats(model, store, smoothing_strength=0.5)
+        smoothed = model(input_ids=ids).logits
+        assert torch.allclose(reference, smoothed, atol=1e-4), "smoothing changed the model output"
+        print(f"✅ SmoothQuant from stats preserves outputs ({len(scales)} layers smoothed)")
+
+        # GPTQ from the stored Hessian beats round-to-nearest on the layer output
+        layer = model.get_submodule(target)
+        W = layer.weight.detach().clone()
+        H = store.hessian(target)
+        Q, scale = gptq_quantize_weight(W, H, dampening_frac=0.01)
+        rtn = torch.clamp(torch.round(W / scale), -128, 127) * scale
+
+        def output_error(Wq):
+            delta = Wq - W
+            return torch.trace(delta @ H @ delta.t()).item()
+
+        assert output_error(Q) < output_error(rtn)
+        print(f"✅ GPTQ output error {output_error(Q):.3e} < RTN {output_error(rtn):.3e}")
+        gptq_from_stats(model, store, smooth_scales=scales)
+        print("✅ Self-test passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layer-wise calibration activation store")
+    parser.add_argument("--self-test", action="store_true", help="Verify on a tiny random model (CPU)")
+    parser.add_argument("--inspect", type=str, default=None, help="Print the index summary of a store directory")
+    args = parser.parse_args()
+
+    if args.self_test:
+        _self_test()
+    elif args.inspect:
+        store = ActivationStore(args.inspect)
+        index = store.index
+        total = sum(g["in_features"] ** 2 * 4 for g in index["groups"].values())
+        print(f"Model: {index.get('model')}  created: {index['created']}")
+        print(f"Linears: {len(index['layers'])}, input groups: {len(index['groups'])}, "
+              f"XᵀX on disk: {total / 1024**3:.2f} GiB")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
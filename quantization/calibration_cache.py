@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of the tokenized calibration set
+Built once and memory-mapped by every quantize_model.py method
+
+Layout of one cache entry (directory named by the cache key):
+    tokens.npy   - int32, all samples' token ids concatenated
+    offsets.npy  - int64, sample i is tokens[offsets[i]:offsets[i + 1]]
+    meta.json    - key inputs and summary stats (written last, marks the entry complete)
+
+The key covers everything that changes the token ids: tokenizer fingerprint
+(vocab, special tokens, chat template), dataset, seed, sample count and max
+length. Concurrent builders serialize on a per-key file lock; the first one
+builds, the others wait and then load its result.
+"""
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+import numpy as np
+
+CACHE_FORMAT_VERSION = 1
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of the tokenizer state that affects tokenization and chat templating"""
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode())
+    for token, index in sorted(tokenizer.get_vocab().items(), key=lambda item: item[1]):
+        digest.update(f"{index}:{token}\n".encode("utf-8", errors="surrogatepass"))
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode())
+    digest.update((getattr(tokenizer, "chat_template", None) or "").encode())
+    return digest.hexdigest()
+
+
+def calibration_cache_key(tokenizer_hash, dataset_id, split, seed, num_samples, max_length):
+    """Cache key of one calibration set configuration"""
+    payload = {
+        "version": CACHE_FORMAT_VERSION,
+        "tokenizer": tokenizer_hash,
+        "dataset": dataset_id,
+        "split": split,
+        "seed": seed,
+        "num_samples": num_samples,
+        "max_length": max_length,
+    }
+    canonical = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:24], payload
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive advisory lock (released automatically if the holder dies)"""
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CalibrationSet:
+    """Memory-mapped tokenized calibration samples"""
+
+    def __init__(self, entry_dir):
+        self.entry_dir = Path(entry_dir)
+        self.tokens = np.load(self.entry_dir / "tokens.npy", mmap_mode="r")
+        self.offsets = np.load(self.entry_dir / "offsets.npy", mmap_mode="r")
+        with open(self.entry_dir / "meta.json", "r") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_dataset(self):
+        """HF Dataset with input_ids / attention_mask columns, as expected by llmcompressor.oneshot"""
+        from datasets import Dataset
+
+        input_ids = [sample.tolist() for sample in self]
+        return Dataset.from_dict({
+            "input_ids": input_ids,
+            "attention_mask": [[1] * len(ids) for ids in input_ids],
+        })
+
+
+def write_entry(entry_dir, samples, key_payload):
+    """Write samples (lists of token ids) to a new cache entry via a temp dir + rename"""
+    entry_dir = Path(entry_dir)
+    lengths = np.fromiter((len(s) for s in samples), dtype=np.int64, count=len(samples))
+    offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.empty(int(offsets[-1]), dtype=np.int32)
+    for i, sample in enumerate(samples):
+        tokens[offsets[i]:offsets[i + 1]] = sample
+
+    tmp_dir = Path(tempfile.mkdtemp(dir=entry_dir.parent, prefix=f".{entry_dir.name}."))
+    try:
+        os.chmod(tmp_dir, 0o755)
+        np.save(tmp_dir / "tokens.npy", tokens)
+        np.save(tmp_dir / "offsets.npy", offsets)
+        meta = {
+            **key_payload,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "num_tokens": int(offsets[-1]),
+            "mean_length": float(lengths.mean()) if len(lengths) else 0.0,
+            "max_length_seen": int(lengths.max()) if len(lengths) else 0,
+        }
+        with open(tmp_dir / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        for name in ("tokens.npy", "offsets.npy", "meta.json"):
+            with open(tmp_dir / name, "rb") as f:
+                os.fsync(f.fileno())
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        os.rename(tmp_dir, entry_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_or_build(cache_dir, tokenizer, build_fn, dataset_id, split, seed, num_samples, max_length,
+                  logger=None):
+    """
+    Return the cached calibration set, building it under a lock if missing
+
+    Args:
+        cache_dir: root directory of the cache
+        tokenizer: HF tokenizer (fingerprinted for the key)
+        build_fn: build_fn() -> list of token id lists, called only on a miss
+        dataset_id, split, seed, num_samples, max_length: calibration set parameters
+
+    Returns:
+        CalibrationSet (memory-mapped)
+    """
+    log = logger.info if logger else print
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key, payload = calibration_cache_key(
+        tokenizer_fingerprint(tokenizer), dataset_id, split, seed, num_samples, max_length
+    )
+    entry_dir = cache_dir / key
+
+    if (entry_dir / "meta.json").exists():
+        log(f"✅ Calibration cache hit: {entry_dir}")
+        return CalibrationSet(entry_dir)
+
+    wait_start = time.time()
+    with file_lock(cache_dir / f"{key}.lock"):
+        # Another process may have finished the build while we waited for the lock
+        if (entry_dir / "meta.json").exists():
+            log(f"✅ Calibration cache built by another process "
+                f"(waited {time.time() - wait_start:.0f}s): {entry_dir}")
+            return CalibrationSet(entry_dir)
+
+        log(f"Calibration cache miss, building: {entry_dir}")
+        build_start = time.time()
+        samples = build_fn()
+        write_entry(entry_dir, samples, payload)
+        log(f"✅ Calibration cache written ({len(samples)} samples, {time.time() - build_start:.0f}s)")
+    return CalibrationSet(entry_dir)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped, read-only access to safetensors checkpoints without torch
+
+Tensors are numpy views into np.memmap'd shard files, so opening a 4B-parameter
+checkpoint costs only the headers; pages are read when a tensor is used and
+can be dropped by the OS afterwards. BF16 has no numpy dtype and is widened to
+float32 on access (a copy of that one tensor).
+"""
+import re
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from serving.checkpoint_integrity import INDEX_FILE, SINGLE_FILE, read_safetensors_header
+
+SAFETENSORS_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "BF16": np.uint16,  # widened by bf16_to_float32
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+
+
+def natural_key(name):
+    """Sort key that orders model.layers.2 before model.layers.10"""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def bf16_to_float32(raw):
+    """uint16 bit patterns of bfloat16 values -> float32"""
+    return (raw.astype(np.uint32) << 16).view(np.float32)
+
+
+class Checkpoint:
+    """Tensor name -> lazily memory-mapped numpy array, across all shards of a checkpoint"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if (self.path / INDEX_FILE).exists():
+            with open(self.path / INDEX_FILE, "r") as f:
+                shard_names = sorted(set(json.load(f)["weight_map"].values()))
+        elif (self.path / SINGLE_FILE).exists():
+            shard_names = [SINGLE_FILE]
+        else:
+            raise FileNotFoundError(f"No safetensors weights in {self.path}")
+
+        self._entries = {}
+        self._maps = {}
+        for shard in shard_names:
+            header, header_len = read_safetensors_header(self.path / shard)
+            for name, info in header.items():
+                if name != "__metadata__":
+                    self._entries[name] = (shard, 8 + header_len, info)
+
+        config_path = self.path / "config.json"
+        self.config = {}
+        if config_path.exists():
+            with open(config_path, "r") as f:
+                self.config = json.load(f)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def names(self):
+        return list(self._entries)
+
+    def dtype(self, name):
+        return self._entries[name][2]["dtype"]
+
+    def shape(self, name):
+        return tuple(self._entries[name][2]["shape"])
+
+    def nbytes(self, name):
+        start, end = self._entries[name][2]["data_offsets"]
+        return end - start
+
+    def raw(self, name):
+        """Zero-copy view in the stored dtype (BF16 as uint16 bit patterns)"""
+        shard, data_start, info = self._entries[name]
+        if shard not in self._maps:
+            self._maps[shard] = np.memmap(self.path / shard, dtype=np.uint8, mode="r")
+        start, end = info["data_offsets"]
+        buffer = self._maps[shard][data_start + start:data_start + end]
+        return buffer.view(SAFETENSORS_DTYPES[info["dtype"]]).reshape(info["shape"])
+
+    def get(self, name, rows=None):
+        """
+        Tensor as a numpy array; BF16 is widened to float32
+
+        rows (a slice or index array of the first axis) is applied to the memory-mapped
+        view before widening, so only the selected rows are read and converted.
+        """
+        array = self.raw(name)
+        if rows is not None:
+            array = array[rows]
+        return bf16_to_float32(array) if self.dtype(name) == "BF16" else array
+
+    def quantization_config(self):
+        return self.config.get("quantization_config") or self.config.get("compression_config") or {}
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+CPU reference kernels for symmetric INT8 quantization (NumPy only)
+
+Validates W8A16 / W8A8 checkpoints from quantize_model.py without a GPU or an
+sglang server:
+- per-channel, per-group (group_size=128) and per-token quantize / dequantize,
+  using the compressed-tensors convention: scale = absmax / 127.5 and q
+  clamped to [-128, 127]
+- INT8 x INT8 -> INT32 matmul with per-token x per-channel scale application
+  (the W8A8 linear that sglang's w8a8_int8 kernel computes)
+- streaming over a compressed checkpoint, one layer and one row block at a
+  time, reporting per-layer reconstruction error
+
+The INT8 matmul goes through float64 BLAS. Products of int8 values summed
+over K stay far below 2^53, so the result is exact and much faster than
+NumPy's non-BLAS integer matmul.
+
+Usage:
+    python quantization/int8_reference.py --benchmark
+    python quantization/int8_reference.py --checkpoint /data/.../Qwen3-4B-Instruct-2507-INT8-W8A8-SMOOTH-PTQ \\
+        [--reference /data/.../Qwen3-4B-Instruct-2507] [--json layer_errors.json]
+"""
+import json
+import time
+import argparse
+import resource
+from pathlib import Path
+
+import numpy as np
+
+from checkpoint_reader import Checkpoint, natural_key
+
+QMIN, QMAX = -128, 127
+GROUP_SIZE = 128
+# Output rows processed at once when streaming a layer (bounds memory per layer)
+ROW_BLOCK = 1024
+
+
+# ==================== Vectorized kernels ====================
+
+def _scale_from_absmax(absmax):
+    return np.maximum(absmax.astype(np.float32) / ((QMAX - QMIN) / 2), np.finfo(np.float32).eps)
+
+
+def _quantize(x, scale):
+    return np.clip(np.round(x / scale), QMIN, QMAX).astype(np.int8)
+
+
+def quantize_per_channel(w):
+    """[out, in] float -> (int8 [out, in], scale [out, 1])"""
+    scale = _scale_from_absmax(np.abs(w).max(axis=1, keepdims=True))
+    return _quantize(w, scale), scale
+
+
+def quantize_per_group(w, group_size=GROUP_SIZE):
+    """[out, in] float -> (int8 [out, in], scale [out, in // group_size])"""
+    out_features, in_features = w.shape
+    if in_features % group_size:
+        raise ValueError(f"in_features {in_features} is not a multiple of group_size {group_size}")
+    grouped = w.reshape(out_features, in_features // group_size, group_size)
+    scale = _scale_from_absmax(np.abs(grouped).max(axis=2))
+    q = _quantize(grouped, scale[:, :, None])
+    return q.reshape(out_features, in_features), scale
+
+
+def quantize_per_token(x):
+    """Dynamic activation quantization: [tokens, hidden] -> (int8, scale [tokens, 1])"""
+    return quantize_per_channel(x)
+
+
+def dequantize(q, scale):
+    """Inverse of any of the above; the group size is implied by the scale's column count"""
+    scale = np.asarray(scale, dtype=np.float32)
+    if scale.ndim < 2 or scale.shape[1] == 1:
+        return q.astype(np.float32) * scale
+    out_features, in_features = q.shape
+    groups = scale.shape[1]
+    grouped = q.reshape(out_features, groups, in_features // groups).astype(np.float32)
+    return (grouped * scale[:, :, None]).reshape(out_features, in_features)
+
+
+def int8_matmul(a_q, b_q):
+    """a_q [m, k] int8 @ b_q [n, k]^T int8 -> [m, n] int32 (exact)"""
+    return (a_q.astype(np.float64) @ b_q.astype(np.float64).T).astype(np.int32)
+
+
+def w8a8_linear(x, w_q, w_scale):
+    """y = x @ W^T with per-token dynamic INT8 activations and per-channel INT8 weights"""
+    x_q, x_scale = quantize_per_token(x)
+    acc = int8_matmul(x_q, w_q)
+    return acc.astype(np.float32) * x_scale * np.asarray(w_scale, dtype=np.float32).reshape(1, -1)
+
+
+def w8a16_linear(x, w_q, w_scale):
+    """y = x @ dequant(W)^T (weight-only INT8, channel or group scales)"""
+    return x.astype(np.float32) @ dequantize(w_q, w_scale).T
+
+
+# ==================== Naive loop implementations (for validation and benchmarking) ====================
+
+def naive_quantize_per_channel(w):
+    q = np.zeros(w.shape, dtype=np.int8)
+    scale = np.zeros((w.shape[0], 1), dtype=np.float32)
+    for i in range(w.shape[0]):
+        absmax = max(abs(float(v)) for v in w[i])
+        s = max(np.float32(absmax) / np.float32(127.5), np.finfo(np.float32).eps)
+        scale[i, 0] = s
+        for j in range(w.shape[1]):
+            q[i, j] = min(max(round(float(np.float32(w[i, j]) / np.float32(s))), QMIN), QMAX)
+    return q, scale
+
+
+def naive_quantize_per_group(w, group_size=GROUP_SIZE):
+    q = np.zeros(w.shape, dtype=np.int8)
+    scale = np.zeros((w.shape[0], w.shape[1] // group_size), dtype=np.float32)
+    for i in range(w.shape[0]):
+        for g in range(w.shape[1] // group_size):
+            block = w[i, g * group_size:(g + 1) * group_size]
+            s = max(np.float32(max(abs(float(v)) for v in block)) / np.float32(127.5), np.finfo(np.float32).eps)
+            scale[i, g] = s
+            for j, v in enumerate(block):
+                q[i, g * group_size + j] = min(max(round(float(np.float32(v) / np.float32(s))), QMIN), QMAX)
+    return q, scale
+
+
+def naive_int8_matmul(a_q, b_q):
+    out = np.zeros((a_q.shape[0], b_q.shape[0]), dtype=np.int32)
+    for i in range(a_q.shape[0]):
+        for j in range(b_q.shape[0]):
+            acc = 0
+            for k in range(a_q.shape[1]):
+                acc += int(a_q[i, k]) * int(b_q[j, k])
+            out[i, j] = acc
+    return out
+
+
+def _timed(fn, *args, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) / repeats
+
+
+def run_benchmark(seed=0):
+    """Vectorized vs naive on small shapes (results must match), then vectorized at Qwen3-4B shapes"""
+    rng = np.random.default_rng(seed)
+    w = rng.standard_normal((64, 512)).astype(np.float32)
+    a = rng.integers(QMIN, QMAX + 1, (16, 256), dtype=np.int8)
+    b = rng.integers(QMIN, QMAX + 1, (64, 256), dtype=np.int8)
+
+    print("=" * 70)
+    print("INT8 reference kernels: vectorized vs naive loop")
+    print("=" * 70)
+    print(f"{'kernel':<22} {'shape':<18} {'naive':>10} {'vectorized':>12} {'speedup':>9}  match")
+    cases = [
+        ("quantize_per_channel", "64x512", naive_quantize_per_channel, quantize_per_channel, (w,)),
+        ("quantize_per_group", "64x512 g128", naive_quantize_per_group, quantize_per_group, (w,)),
+        ("int8_matmul", "16x256 @ 64x256", naive_int8_matmul, int8_matmul, (a, b)),
+    ]
+    all_match = True
+    for name, shape, naive_fn, fast_fn, args in cases:
+        expected, naive_s = _timed(naive_fn, *args)
+        actual, fast_s = _timed(fast_fn, *args, repeats=20)
+        if isinstance(expected, tuple):
+            match = all(np.array_equal(e, f) for e, f in zip(expected, actual))
+        else:
+            match = np.array_equal(expected, actual)
+        all_match &= match
+        print(f"{name:<22} {shape:<18} {naive_s * 1e3:>8.1f}ms {fast_s * 1e3:>10.3f}ms "
+              f"{naive_s / fast_s:>8.0f}x  {'✅' if match else '❌'}")
+
+    print("")
+    print("Vectorized at Qwen3-4B MLP shapes (hidden 2560, intermediate 9728, 32 tokens)")
+    w_big = rng.standard_normal((9728, 2560)).astype(np.float32) * 0.02
+    x = rng.standard_normal((32, 2560)).astype(np.float32)
+    (w_q, w_scale), t_quant = _timed(quantize_per_channel, w_big)
+    (_, _), t_group = _timed(quantize_per_group, w_big)
+    y8, t_w8a8 = _timed(w8a8_linear, x, w_q, w_scale, repeats=3)
+    y16, t_w8a16 = _timed(w8a16_linear, x, w_q, w_scale, repeats=3)
+    ref = x @ w_big.T
+    flops = 2 * x.shape[0] * w_big.shape[0] * w_big.shape[1]
+    print(f"  quantize_per_channel 9728x2560: {t_quant * 1e3:.0f} ms")
+    print(f"  quantize_per_group   9728x2560: {t_group * 1e3:.0f} ms")
+    print(f"  w8a8_linear:  {t_w8a8 * 1e3:.1f} ms ({flops / t_w8a8 / 1e9:.1f} GOP/s), "
+          f"rel err {np.linalg.norm(y8 - ref) / np.linalg.norm(ref):.2e}")
+    print(f"  w8a16_linear: {t_w8a16 * 1e3:.1f} ms ({flops / t_w8a16 / 1e9:.1f} GFLOP/s), "
+          f"rel err {np.linalg.norm(y16 - ref) / np.linalg.norm(ref):.2e}")
+    return all_match
+
+
+# ==================== Checkpoint streaming ====================
+
+def unpack_int32(packed, num_bits, in_features):
+    """compressed-tensors pack-quantized: num_bits values per int32 lane, offset to unsigned"""
+    per_word = 32 // num_bits
+    mask = (1 << num_bits) - 1
+    words = packed.astype(np.int64) & 0xFFFFFFFF
+    values = np.stack([(words >> (num_bits * i)) & mask for i in range(per_word)], axis=-1)
+    values = values.reshape(packed.shape[0], -1)[:, :in_features]
+    return (values - (1 << (num_bits - 1))).astype(np.int8)
+
+
+def quantized_linears(ckpt):
+    """Prefixes of quantized Linear layers in a compressed-tensors checkpoint"""
+    return sorted((name[:-len(".weight_scale")] for name in ckpt.names() if name.endswith(".weight_scale")),
+                  key=natural_key)
+
+
+def load_int8_weight(ckpt, prefix, rows=None):
+    """(int8 weight, float32 scale) of one layer, optionally only a row slice"""
+    scale = ckpt.get(f"{prefix}.weight_scale", rows).astype(np.float32)
+    if f"{prefix}.weight_packed" in ckpt:
+        in_features = int(ckpt.get(f"{prefix}.weight_shape")[1])
+        q = unpack_int32(ckpt.get(f"{prefix}.weight_packed", rows), 8, in_features)
+    else:
+        weight = ckpt.get(f"{prefix}.weight", rows)
+        # naive-quantized stores the integer values in a float dtype
+        q = weight if weight.dtype == np.int8 else np.clip(np.round(weight), QMIN, QMAX).astype(np.int8)
+    return q, scale.reshape(q.shape[0], -1)
+
+
+def quantizes_activations(ckpt):
+    groups = ckpt.quantization_config().get("config_groups", {})
+    return any(group.get("input_activations") for group in groups.values())
+
+
+def layer_error(ckpt, prefix, reference=None, activations=False, tokens=16, seed=0):
+    """
+    Reconstruction error of one quantized Linear, streamed ROW_BLOCK output rows at a time
+
+    Without a reference checkpoint the weight error is unknown; the output error is then
+    the W8A8 kernel's error against the dequantized-weight float output (activation
+    quantization only). With a reference, both are measured against the original weights.
+    """
+    if f"{prefix}.weight_packed" in ckpt:
+        out_features = int(ckpt.get(f"{prefix}.weight_shape")[0])
+    else:
+        out_features = ckpt.shape(f"{prefix}.weight")[0]
+    in_features = None
+    x = None
+    sums = {"w_err": 0.0, "w_ref": 0.0, "y_err": 0.0, "y_ref": 0.0}
+    saturated = 0
+    strategy = None
+    for start in range(0, out_features, ROW_BLOCK):
+        rows = slice(start, min(start + ROW_BLOCK, out_features))
+        q, scale = load_int8_weight(ckpt, prefix, rows)
+        if x is None:
+            in_features = q.shape[1]
+            strategy = "channel" if scale.shape[1] == 1 else f"group{in_features // scale.shape[1]}"
+            x = np.random.default_rng(seed).standard_normal((tokens, in_features)).astype(np.float32)
+        saturated += int(np.count_nonzero((q == QMAX) | (q == QMIN)))
+        w_hat = dequantize(q, scale)
+        if reference is not None:
+            w_ref = reference.get(f"{prefix}.weight", rows).astype(np.float32)
+            sums["w_err"] += float(np.sum((w_hat - w_ref) ** 2))
+            sums["w_ref"] += float(np.sum(w_ref ** 2))
+            y_ref = x @ w_ref.T
+        else:
+            y_ref = x @ w_hat.T
+        y = w8a8_linear(x, q, scale[:, 0]) if activations and scale.shape[1] == 1 else x @ w_hat.T
+        sums["y_err"] += float(np.sum((y - y_ref) ** 2))
+        sums["y_ref"] += float(np.sum(y_ref ** 2))
+
+    return {
+        "layer": prefix,
+        "shape": [out_features, in_features],
+        "strategy": strategy,
+        "saturation": saturated / (out_features * in_features),
+        "weight_rel_err": (sums["w_err"] / sums["w_ref"]) ** 0.5 if reference is not None and sums["w_ref"] else None,
+        "output_rel_err": (sums["y_err"] / sums["y_ref"]) ** 0.5 if sums["y_ref"] else 0.0,
+    }
+
+
+def check_checkpoint(path, reference_path=None, tokens=16, limit=None):
+    """Per-layer reconstruction error of every quantized Linear in a checkpoint"""
+    ckpt = Checkpoint(path)
+    reference = Checkpoint(reference_path) if reference_path else None
+    activations = quantizes_activations(ckpt)
+    layers = quantized_linears(ckpt)[:limit]
+    print(f"📂 {path}: {len(layers)} quantized Linear layers, "
+          f"{'W8A8 (per-token activations)' if activations else 'weight-only'}")
+    if reference is not None:
+        print(f"📂 Reference: {reference_path}")
+
+    results = []
+    start = time.perf_counter()
+    header = f"{'layer':<48} {'shape':<12} {'strategy':<9} {'sat%':>6} {'w_err':>9} {'y_err':>9}"
+    print(header)
+    print("-" * len(header))
+    for prefix in layers:
+        result = layer_error(ckpt, prefix, reference, activations, tokens)
+        results.append(result)
+        w_err = f"{result['weight_rel_err']:.2e}" if result["weight_rel_err"] is not None else "-"
+        shape = "x".join(str(d) for d in result["shape"])
+        print(f"{prefix[-48:]:<48} {shape:<12} {result['strategy']:<9} "
+              f"{result['saturation'] * 100:>6.3f} {w_err:>9} {result['output_rel_err']:>9.2e}")
+
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("-" * len(header))
+    if results:
+        worst = max(results, key=lambda r: r["output_rel_err"])
+        print(f"Worst output error: {worst['layer']} ({worst['output_rel_err']:.2e})")
+    print(f"⏱️  {elapsed:.1f}s, peak RSS {peak_rss_mb:.0f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU reference INT8 kernels and checkpoint reconstruction check")
+    parser.add_argument("--benchmark", action="store_true", help="Vectorized vs naive kernels")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Compressed checkpoint directory")
+    parser.add_argument("--reference", type=str, default=None, help="Original (BF16) checkpoint for weight error")
+    parser.add_argument("--tokens", type=int, default=16, help="Random probe activations per layer")
+    parser.add_argument("--limit", type=int, default=None, help="Only check the first N layers")
+    parser.add_argument("--json", type=str, default=None, help="Write per-layer results to this file")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        ok = run_benchmark()
+        if not ok:
+            raise SystemExit(1)
+    if args.checkpoint:
+        results = check_checkpoint(args.checkpoint, args.reference, args.tokens, args.limit)
+        if args.json:
+            Path(args.json).write_text(json.dumps(results, indent=2))
+            print(f"💾 Results saved to: {args.json}")
+    if not args.benchmark and not args.checkpoint:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Per-layer quantization error profiler
+
+Compares a quantized checkpoint with the original BF16 one, Linear by Linear,
+to show which layers a preset damages (e.g. why w8a8_smooth_ptq loses GPQA
+accuracy). Both checkpoints are memory-mapped (checkpoint_reader.py) and each
+layer is streamed in row blocks, so neither model is loaded into RAM. Layers
+are distributed over a process pool; each worker maps the shards once.
+
+Per Linear:
+    mse, max_abs_err, rel_err (||W_q - W|| / ||W||), cosine similarity,
+    outlier_cols - input channels whose original |W| column max exceeds
+                   --outlier-factor × the layer median (hard to quantize per-row)
+    hot_rows     - output channels whose error exceeds --outlier-factor × the
+                   layer median row error
+
+Rows are written to layer_errors.csv (one row per model × layer, keyed by the
+same model names as result.jsonl), replacing earlier rows of the same model.
+
+Usage:
+    python quantization/layer_profiler.py \\
+        --quantized /data/jisenli2/huggingface/Qwen3-4B-Instruct-2507-INT8-W8A8-SMOOTH-PTQ \\
+        --reference /data/jisenli2/huggingface/Qwen3-4B-Instruct-2507 [--workers 8]
+"""
+import os
+import re
+import csv
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from checkpoint_reader import Checkpoint
+from int8_reference import ROW_BLOCK, dequantize, load_int8_weight, quantized_linears
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LAYER_ERROR_FILE = PROJECT_ROOT / "layer_errors.csv"
+OUTLIER_FACTOR = 6.0
+
+CSV_FIELDS = [
+    "model", "layer", "layer_index", "layer_type", "out_features", "in_features", "params",
+    "strategy", "mse", "max_abs_err", "rel_err", "cosine", "outlier_cols", "hot_rows",
+]
+
+# Per-process state, set by _init_worker
+_worker = {}
+
+
+def model_name_from_path(path):
+    """.../Qwen3-4B-Instruct-2507-INT8-W8A8-SMOOTH-PTQ -> w8a8_smooth_ptq (the run_benchmark model name)"""
+    name = Path(path).name
+    if "-INT8-" in name:
+        return name.split("-INT8-", 1)[1].lower().replace("-", "_")
+    return name.lower()
+
+
+def parse_layer(prefix):
+    """model.layers.12.self_attn.q_proj -> (12, "q_proj")"""
+    match = re.search(r"\.layers\.(\d+)\.", prefix)
+    return (int(match.group(1)) if match else -1), prefix.rsplit(".", 1)[-1]
+
+
+def _init_worker(quantized_path, reference_path, outlier_factor):
+    _worker["quantized"] = Checkpoint(quantized_path)
+    _worker["reference"] = Checkpoint(reference_path)
+    _worker["outlier_factor"] = outlier_factor
+
+
+def profile_layer(prefix):
+    """Error metrics of one Linear, streamed ROW_BLOCK output rows at a time"""
+    quantized, reference = _worker["quantized"], _worker["reference"]
+    factor = _worker["outlier_factor"]
+    out_features, in_features = reference.shape(f"{prefix}.weight")
+
+    sq_err = dot = ref_sq = q_sq = 0.0
+    max_abs_err = 0.0
+    row_mse = np.empty(out_features, dtype=np.float64)
+    col_absmax = np.zeros(in_features, dtype=np.float32)
+    strategy = None
+    for start in range(0, out_features, ROW_BLOCK):
+        rows = slice(start, min(start + ROW_BLOCK, out_features))
+        q, scale = load_int8_weight(quantized, prefix, rows)
+        strategy = strategy or ("channel" if scale.shape[1] == 1 else f"group{in_features // scale.shape[1]}")
+        w_hat = dequantize(q, scale).astype(np.float64)
+        w_ref = reference.get(f"{prefix}.weight", rows).astype(np.float64)
+        diff = w_hat - w_ref
+        row_mse[rows] = np.mean(diff ** 2, axis=1)
+        sq_err += float(np.sum(diff ** 2))
+        max_abs_err = max(max_abs_err, float(np.abs(diff).max()))
+        dot += float(np.sum(w_hat * w_ref))
+        ref_sq += float(np.sum(w_ref ** 2))
+        q_sq += float(np.sum(w_hat ** 2))
+        np.maximum(col_absmax, np.abs(w_ref).max(axis=0).astype(np.float32), out=col_absmax)
+
+    layer_index, layer_type = parse_layer(prefix)
+    return {
+        "layer": prefix,
+        "layer_index": layer_index,
+        "layer_type": layer_type,
+        "out_features": out_features,
+        "in_features": in_features,
+        "params": out_features * in_features,
+        "strategy": strategy,
+        "mse": sq_err / (out_features * in_features),
+        "max_abs_err": max_abs_err,
+        "rel_err": (sq_err / ref_sq) ** 0.5 if ref_sq else 0.0,
+        "cosine": dot / (ref_sq * q_sq) ** 0.5 if ref_sq and q_sq else 1.0,
+        "outlier_cols": int(np.count_nonzero(col_absmax > factor * np.median(col_absmax))),
+        "hot_rows": int(np.count_nonzero(row_mse > factor * np.median(row_mse))),
+    }
+
+
+def profile_checkpoint(quantized_path, reference_path, workers=None, outlier_factor=OUTLIER_FACTOR, limit=None):
+    """Profile every quantized Linear; returns rows sorted by layer order"""
+    layers = quantized_linears(Checkpoint(quantized_path))[:limit]
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(str(quantized_path), str(reference_path), outlier_factor),
+    ) as pool:
+        # Small chunks keep the workers balanced (MLP layers are ~4x attention layers)
+        return list(pool.map(profile_layer, layers, chunksize=2))
+
+
+def save_rows(model_name, rows, output_file=LAYER_ERROR_FILE):
+    """Write rows to the CSV, replacing any earlier rows of the same model"""
+    output_file = Path(output_file)
+    kept = []
+    if output_file.exists():
+        with open(output_file, "r", newline="") as f:
+            kept = [row for row in csv.DictReader(f) if row["model"] != model_name]
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(kept)
+        for row in rows:
+            writer.writerow({"model": model_name, **{k: row[k] for k in CSV_FIELDS if k != "model"}})
+
+
+def print_report(model_name, rows, top=15):
+    print(f"\n{'=' * 96}")
+    print(f"📊 Layer error profile: {model_name} ({len(rows)} Linear layers)")
+    print(f"{'=' * 96}")
+
+    by_type = defaultdict(list)
+    for row in rows:
+        by_type[row["layer_type"]].append(row)
+    print(f"{'type':<12} {'layers':>6} {'mean rel_err':>13} {'max rel_err':>12} {'min cosine':>11} "
+          f"{'outlier_cols':>13} {'hot_rows':>9}")
+    for layer_type, group in sorted(by_type.items()):
+        print(f"{layer_type:<12} {len(group):>6} {np.mean([r['rel_err'] for r in group]):>13.3e} "
+              f"{max(r['rel_err'] for r in group):>12.3e} {min(r['cosine'] for r in group):>11.6f} "
+              f"{sum(r['outlier_cols'] for r in group):>13} {sum(r['hot_rows'] for r in group):>9}")
+
+    print(f"\nTop {min(top, len(rows))} layers by relative error:")
+    print(f"{'layer':<44} {'rel_err':>9} {'mse':>9} {'max_abs':>9} {'cosine':>9} {'out_cols':>8} {'hot_rows':>8}")
+    for row in sorted(rows, key=lambda r: r["rel_err"], reverse=True)[:top]:
+        print(f"{row['layer'][-44:]:<44} {row['rel_err']:>9.3e} {row['mse']:>9.2e} {row['max_abs_err']:>9.2e} "
+              f"{row['cosine']:>9.6f} {row['outlier_cols']:>8} {row['hot_rows']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-layer quantization error profiler (memory-mapped)")
+    parser.add_argument("--quantized", type=str, required=True, help="Quantized checkpoint directory")
+    parser.add_argument("--reference", type=str, required=True, help="Original BF16 checkpoint directory")
+    parser.add_argument("--name", type=str, default=None,
+                        help="Model name in the output (default: derived from the directory, e.g. w8a8_smooth_ptq)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: min(8, CPUs))")
+    parser.add_argument("--outlier-factor", type=float, default=OUTLIER_FACTOR,
+                        help="Outlier threshold as a multiple of the layer median")
+    parser.add_argument("--limit", type=int, default=None, help="Only profile the first N layers")
+    parser.add_argument("--output", type=str, default=str(LAYER_ERROR_FILE), help="CSV output file")
+    parser.add_argument("--top", type=int, default=15, help="Worst layers to print")
+    args = parser.parse_args()
+
+    model_name = args.name or model_name_from_path(args.quantized)
+    start = time.perf_counter()
+    rows = profile_checkpoint(args.quantized, args.reference, args.workers, args.outlier_factor, args.limit)
+    print_report(model_name, rows, args.top)
+    save_rows(model_name, rows, args.output)
+    print(f"\n⏱️  {len(rows)} layers in {time.perf_counter() - start:.1f}s")
+    print(f"💾 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
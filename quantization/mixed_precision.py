@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Mixed-precision layer selection from per-layer sensitivity scores
+
+Chooses which Linear layers stay in BF16 so that the most sensitive ones are
+protected within a budget:
+    --max-bf16-fraction  BF16 params as a fraction of all quantized-Linear params
+    --target-memory      total Linear weight memory in GB (INT8 = 1 B/param, BF16 = 2 B/param)
+    --max-layers         number of layers kept in BF16
+
+sglang/vLLM load q/k/v_proj as one qkv_proj and gate/up_proj as one
+gate_up_proj, and a fused module takes a single scheme, so the members of a
+fused group are one item: kept in BF16 together or not at all, with summed
+params and summed sensitivity. Every plan is checked for split groups.
+
+Maximizing the summed sensitivity of the kept items under a parameter budget
+is a 0/1 knapsack. It is solved exactly by dynamic programming over the cost
+discretized to at most --resolution units, which takes milliseconds for the
+~250 Linears of Qwen3-4B.
+
+Sensitivity tables: layer_errors.csv from layer_profiler.py (any numeric column
+via --metric, e.g. rel_err or mse), or a JSON list of {"layer", "params", <metric>}
+rows, e.g. calibration-loss deltas. --synthetic builds a Qwen3-4B-shaped table
+with heavy-tailed scores for dry runs.
+
+The plan (JSON) is consumed by quantize_model.py --keep-bf16, which appends the
+layers to the `ignore` list of every modifier of the chosen recipe;
+--emit-recipe prints the same override as a recipes.yaml method.
+
+Usage:
+    python quantization/mixed_precision.py --sensitivity layer_errors.csv --model w8a8_smooth_ptq \\
+        --max-bf16-fraction 0.05 --output mp_plan.json
+    python quantization/quantize_model.py --method w8a8_smooth_ptq --keep-bf16 mp_plan.json
+"""
+import csv
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from recipe_registry import DEFAULT_REGISTRY, load_registry, with_ignore
+
+# Qwen3-4B Linear shapes (out_features, in_features) per decoder layer
+QWEN3_4B_LINEARS = {
+    "self_attn.q_proj": (4096, 2560),
+    "self_attn.k_proj": (1024, 2560),
+    "self_attn.v_proj": (1024, 2560),
+    "self_attn.o_proj": (2560, 4096),
+    "mlp.gate_proj": (9728, 2560),
+    "mlp.up_proj": (9728, 2560),
+    "mlp.down_proj": (2560, 9728),
+}
+QWEN3_4B_NUM_LAYERS = 36
+
+# Linears the serving engines fuse into one module (one quantization scheme per group)
+FUSED_GROUPS = (
+    ("self_attn.q_proj", "self_attn.k_proj", "self_attn.v_proj"),
+    ("mlp.gate_proj", "mlp.up_proj"),
+)
+
+
+def fused_group(layer):
+    """Full names of the fused group `layer` belongs to (just the layer if it is not fused)"""
+    for group in FUSED_GROUPS:
+        for member in group:
+            if layer.endswith("." + member):
+                prefix = layer[:-len(member)]
+                return tuple(prefix + name for name in group)
+    return (layer,)
+
+
+def group_items(rows):
+    """Knapsack items: rows merged per fused group (summed params and score), in table order"""
+    items = {}
+    for row in rows:
+        key = fused_group(row["layer"])
+        item = items.setdefault(key, {"layers": [], "params": 0, "score": 0.0})
+        item["layers"].append(row["layer"])
+        item["params"] += row["params"]
+        item["score"] += row["score"]
+    return list(items.values())
+
+
+def check_fused_groups(layers, all_layers=None):
+    """
+    Raise ValueError if `layers` holds only part of a fused group
+
+    Args:
+        layers: layer names kept in BF16
+        all_layers: layers of the sensitivity table; group members missing
+            from it are not required (None = every member is required)
+    """
+    kept = set(layers)
+    present = set(all_layers) if all_layers is not None else None
+    split = []
+    for layer in layers:
+        members = [m for m in fused_group(layer) if present is None or m in present]
+        missing = [m for m in members if m not in kept]
+        if missing:
+            split.append(f"{layer} without {', '.join(missing)}")
+    if split:
+        raise ValueError("Plan splits fused modules (q/k/v and gate/up need one scheme): " + "; ".join(split))
+
+
+def load_sensitivity(path, metric="rel_err", model=None):
+    """Rows {"layer", "params", "score"} from a layer_errors.csv or a JSON list"""
+    path = Path(path)
+    if path.suffix == ".csv":
+        with open(path, "r", newline="") as f:
+            raw = [row for row in csv.DictReader(f) if model is None or row.get("model") == model]
+    else:
+        with open(path, "r") as f:
+            raw = json.load(f)
+    if not raw:
+        raise ValueError(f"No sensitivity rows in {path}" + (f" for model {model}" if model else ""))
+    models = {row.get("model") for row in raw if row.get("model")}
+    if len(models) > 1:
+        raise ValueError(f"{path} has several models ({', '.join(sorted(models))}), pass --model")
+    return [
+        {"layer": row["layer"], "params": int(row["params"]), "score": float(row[metric])}
+        for row in raw
+    ]
+
+
+def synthetic_table(num_layers=QWEN3_4B_NUM_LAYERS, seed=0):
+    """Qwen3-4B-shaped rows with log-normal scores; first/last layers and down_proj are more sensitive"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_layers):
+        for name, (out_features, in_features) in QWEN3_4B_LINEARS.items():
+            score = rng.lognormal(mean=-4.5, sigma=0.6)
+            if i in (0, 1, num_layers - 1):
+                score *= 4
+            if name == "mlp.down_proj":
+                score *= 2
+            rows.append({"layer": f"model.layers.{i}.{name}", "params": out_features * in_features, "score": score})
+    return rows
+
+
+def knapsack(rows, budget_params, resolution=4000):
+    """
+    Indices of rows maximizing the summed score with summed params <= budget_params
+
+    Costs are rounded up to budget / resolution, so the budget is never exceeded
+    (the solution is optimal for the discretized costs).
+    """
+    if budget_params <= 0 or not rows:
+        return []
+    unit = max(1, -(-budget_params // resolution))
+    capacity = budget_params // unit
+    costs = [-(-row["params"] // unit) for row in rows]
+    # best[c] = best score with cost <= c; keep[i] marks where row i improved best
+    best = np.zeros(capacity + 1)
+    keep = np.zeros((len(rows), capacity + 1), dtype=bool)
+    for i, (row, cost) in enumerate(zip(rows, costs)):
+        if cost > capacity:
+            continue
+        candidate = best[:capacity + 1 - cost] + row["score"]
+        improved = candidate > best[cost:]
+        keep[i, cost:] = improved
+        best[cost:] = np.where(improved, candidate, best[cost:])
+    chosen = []
+    c = capacity
+    for i in range(len(rows) - 1, -1, -1):
+        if keep[i, c]:
+            chosen.append(i)
+            c -= costs[i]
+    return sorted(chosen)
+
+
+def select_layers(rows, max_bf16_fraction=None, target_memory_gb=None, max_layers=None, resolution=4000):
+    """
+    Pick the layers to keep in BF16 (whole fused groups only)
+
+    Returns:
+        plan dict with keep_bf16 (layer names) and budget / coverage statistics
+    """
+    total_params = sum(row["params"] for row in rows)
+    budgets = []
+    if max_bf16_fraction is not None:
+        budgets.append(int(max_bf16_fraction * total_params))
+    if target_memory_gb is not None:
+        # Keeping a layer in BF16 costs one extra byte per parameter over INT8
+        budgets.append(int(target_memory_gb * 1e9) - total_params)
+    if max_layers is not None:
+        ranked = sorted(rows, key=lambda r: r["score"], reverse=True)[:max_layers]
+        budgets.append(sum(row["params"] for row in ranked))
+    if not budgets:
+        raise ValueError("Give at least one budget: max_bf16_fraction, target_memory_gb or max_layers")
+    budget = min(budgets)
+
+    items = group_items(rows)
+    chosen = knapsack(items, budget, resolution)
+    if max_layers is not None and sum(len(items[i]["layers"]) for i in chosen) > max_layers:
+        # Most sensitive groups first, as long as their layers still fit
+        trimmed, count = [], 0
+        for i in sorted(chosen, key=lambda i: items[i]["score"], reverse=True):
+            if count + len(items[i]["layers"]) <= max_layers:
+                trimmed.append(i)
+                count += len(items[i]["layers"])
+        chosen = trimmed
+    kept_layers = {layer for i in chosen for layer in items[i]["layers"]}
+    kept = [row for row in rows if row["layer"] in kept_layers]
+    check_fused_groups([row["layer"] for row in kept], [row["layer"] for row in rows])
+    kept_params = sum(row["params"] for row in kept)
+    total_score = sum(row["score"] for row in rows)
+    return {
+        "keep_bf16": [row["layer"] for row in kept],
+        "budget_params": max(budget, 0),
+        "kept_params": kept_params,
+        "total_params": total_params,
+        "bf16_fraction": kept_params / total_params if total_params else 0.0,
+        "linear_weight_gb": (total_params + kept_params) / 1e9,
+        "score_covered": sum(row["score"] for row in kept) / total_score if total_score else 0.0,
+        "constraints": {
+            "max_bf16_fraction": max_bf16_fraction,
+            "target_memory_gb": target_memory_gb,
+            "max_layers": max_layers,
+        },
+    }
+
+
+def load_plan(path):
+    """Read a plan JSON, rejecting plans that split a fused group"""
+    with open(path, "r") as f:
+        plan = json.load(f)
+    check_fused_groups(plan["keep_bf16"])
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Select Linear layers to keep in BF16 under a budget")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--sensitivity", type=str, help="layer_errors.csv or JSON rows with layer/params/<metric>")
+    source.add_argument("--synthetic", action="store_true", help="Use a synthetic Qwen3-4B sensitivity table")
+    parser.add_argument("--model", type=str, default=None, help="Model rows to use from a multi-model CSV")
+    parser.add_argument("--metric", type=str, default="rel_err", help="Sensitivity column (higher = more sensitive)")
+    parser.add_argument("--max-bf16-fraction", type=float, default=None, help="Max BF16 share of Linear params")
+    parser.add_argument("--target-memory", type=float, default=None, help="Max Linear weight memory in GB")
+    parser.add_argument("--max-layers", type=int, default=None, help="Max number of BF16 layers")
+    parser.add_argument("--resolution", type=int, default=4000, help="Knapsack cost resolution")
+    parser.add_argument("--output", type=str, default=None, help="Write the plan JSON here")
+    parser.add_argument("--emit-recipe", type=str, default=None, metavar="BASE_METHOD",
+                        help="Print a recipes.yaml method: BASE_METHOD with the BF16 layers ignored")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rows, source_name = synthetic_table(), "synthetic"
+    else:
+        rows, source_name = load_sensitivity(args.sensitivity, args.metric, args.model), args.sensitivity
+    plan = select_layers(rows, args.max_bf16_fraction, args.target_memory, args.max_layers, args.resolution)
+    plan.update({"source": source_name, "model": args.model, "metric": args.metric})
+
+    print("=" * 70)
+    print(f"🎯 Mixed-precision plan ({source_name}, metric {args.metric})")
+    print("=" * 70)
+    print(f"Linear layers: {len(rows)} ({len(group_items(rows))} fused items), params: {plan['total_params'] / 1e9:.2f}B")
+    print(f"Keep in BF16: {len(plan['keep_bf16'])} layers, {plan['kept_params'] / 1e6:.0f}M params "
+          f"({plan['bf16_fraction'] * 100:.2f}%), budget {plan['budget_params'] / 1e6:.0f}M")
+    print(f"Linear weight memory: {plan['linear_weight_gb']:.2f} GB "
+          f"(all INT8: {plan['total_params'] / 1e9:.2f} GB)")
+    print(f"Sensitivity covered: {plan['score_covered'] * 100:.1f}%")
+    for layer in plan["keep_bf16"]:
+        print(f"  - {layer}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(plan, indent=2))
+        print(f"💾 Plan saved to: {args.output}")
+    if args.emit_recipe:
+        registry = load_registry(DEFAULT_REGISTRY)
+        spec = with_ignore(registry["methods"][args.emit_recipe], plan["keep_bf16"])
+        name = f"{args.emit_recipe}_mp{len(plan['keep_bf16'])}"
+        print("")
+        print(yaml.safe_dump({"methods": {name: spec}}, sort_keys=False, width=120))
+
+
+if __name__ == "__main__":
+    main()
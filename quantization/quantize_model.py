@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """
 Quantize Qwen3-4B-Instruct-2507 model to INT8
-Supports various W8A16 and W8A8 quantization methods
+Supports various W8A16 and W8A8 quantization methods (defined in recipes.yaml)
 """
 import logging
 import os
+import json
 import argparse
 from datetime import datetime
 from pathlib import Path
@@ -12,10 +13,13 @@ from pathlib import Path
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from datasets import load_dataset
 from llmcompressor import oneshot
-from llmcompressor.modifiers.quantization import GPTQModifier
-from llmcompressor.modifiers.awq import AWQModifier
-from llmcompressor.modifiers.smoothquant import SmoothQuantModifier
-from llmcompressor.modifiers.pruning import SparseGPTModifier
+from llmcompressor.modifiers.quantization import QuantizationModifier
+
+from calibration_cache import load_or_build
+from activation_store import load_or_capture, smooth_from_stats, gptq_from_stats
+from mixed_precision import load_plan
+from recipe_registry import DEFAULT_REGISTRY, load_registry, resolve_jobs, build_recipe, stats_plan, with_ignore
+from sharded_save import DEFAULT_MAX_SHARD_SIZE, DEFAULT_SAVE_WORKERS, save_compressed_model
 
 # Basic configuration
 MODEL_ID = "Qwen/Qwen3-4B-Instruct-2507"
@@ -24,6 +28,14 @@ LOG_DIR = "/home/jisenli2/qwen_quantization/logs/quantization_logs"
 
 NUM_CALIBRATION_SAMPLES = 512
 MAX_SEQUENCE_LENGTH = 2048
+CALIBRATION_DATASET = "HuggingFaceH4/ultrachat_200k"
+CALIBRATION_SPLIT = "train_sft"
+CALIBRATION_SEED = 42
+# Tokenized calibration set shared by all methods (see calibration_cache.py)
+CALIBRATION_CACHE_DIR = "/data/jisenli2/quant_cache/calibration"
+# Store-built checkpoints use non-sequential GPTQ, so they never share a directory
+# (or a benchmark/GPQA model name) with the llmcompressor checkpoint of the same method
+ACTIVATION_STORE_SUFFIX = "ASTORE"
 
 # Setup logger
 def setup_logger(method_name=None):
@@ -67,62 +79,12 @@ def setup_logger(method_name=None):
     
     return logger
 
-def main():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Quantize Qwen3-4B-Instruct-2507 model")
-    parser.add_argument(
-        "--method",
-        type=str,
-        required=True,
-        choices=[
-            # W8A16 methods
-            "w8a16_ptq",
-            "w8a16_gptq", 
-            "w8a16_awq",
-            "w8a16_sparse_gptq",
-            "w8a16_sparse_awq",
-            "w8a16_smooth_gptq",
-            "w8a16_smooth_ptq",
-            "w8a16_smooth_awq",
-            # W8A8 methods (priority, note: AWQ doesn't support A8)
-            "w8a8_smooth_gptq",
-            "w8a8_sparse_smooth_gptq",
-            "w8a8_smooth_ptq",
-        ],
-        help="Quantization method"
-    )
-    args = parser.parse_args()
-    
-    # Initialize logger (pass method name for clear log filename)
-    logger = setup_logger(method_name=args.method)
-    
-    logger.info("=" * 60)
-    logger.info(f"Quantization Method: {args.method.upper()}")
-    logger.info("=" * 60)
-    logger.info("")
-    logger.info("=" * 60)
-    logger.info("Step 1/5: Load Model and Tokenizer")
-    logger.info("=" * 60)
-    
-    model = AutoModelForCausalLM.from_pretrained(
-        MODEL_ID,
-        device_map="auto",
-        torch_dtype="auto",
-    )
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
-    
-    logger.info(f"✅ Model loaded: {MODEL_ID}")
-    logger.info(f"✅ Tokenizer loaded")
-    
-    logger.info("")
-    logger.info("=" * 60)
-    logger.info("Step 2/5: Prepare Calibration Data")
-    logger.info("=" * 60)
-    
+def tokenize_calibration_dataset(tokenizer, logger):
+    """Load, shuffle, chat-template and tokenize the calibration samples"""
     # Load and preprocess dataset
     logger.info("Loading dataset...")
-    ds = load_dataset("HuggingFaceH4/ultrachat_200k", split="train_sft")
-    ds = ds.shuffle(seed=42).select(range(NUM_CALIBRATION_SAMPLES))
+    ds = load_dataset(CALIBRATION_DATASET, split=CALIBRATION_SPLIT)
+    ds = ds.shuffle(seed=CALIBRATION_SEED).select(range(NUM_CALIBRATION_SAMPLES))
     logger.info(f"Loaded {len(ds)} samples")
     
     def preprocess(example):
@@ -142,229 +104,75 @@ def main():
     
     logger.info("Tokenizing...")
     ds = ds.map(tokenize, remove_columns=ds.column_names, desc="Tokenizing", num_proc=4)  # Add progress bar and multiprocessing
+    return ds
+
+
+def build_calibration_samples(tokenizer, logger):
+    """Token id lists of the calibration set (what the calibration cache stores)"""
+    return [list(ids) for ids in tokenize_calibration_dataset(tokenizer, logger)["input_ids"]]
+
+
+def quantize_from_activation_store(model, store, plan, logger):
+    """
+    SmoothQuant + GPTQ from stored statistics, then attach compressed-tensors quantization
     
-    logger.info(f"✅ Calibration data prepared: {NUM_CALIBRATION_SAMPLES} samples")
+    The data-free QuantizationModifier pass only sets up the scheme (static per-channel
+    weights, dynamic per-token activations for W8A8); its weight scales are then
+    replaced by the ones GPTQ rounded against, so compression reproduces the GPTQ grid.
+    
+    Args:
+        plan: (SmoothQuant strength or None, scheme, GPTQ dampening, ignore) from recipe_registry.stats_plan
+    """
+    from compressed_tensors.utils import update_offload_parameter
+    
+    smoothing_strength, scheme, dampening, ignore = plan
+    smooth_scales = None
+    if smoothing_strength is not None:
+        smooth_scales = smooth_from_stats(model, store, smoothing_strength)
+        logger.info(f"✅ SmoothQuant from stats: {len(smooth_scales)} layers (strength {smoothing_strength})")
+    weight_scales = gptq_from_stats(model, store, dampening, smooth_scales=smooth_scales, ignore=ignore, logger=logger)
+    
+    oneshot(
+        model=model,
+        recipe=[QuantizationModifier(targets="Linear", scheme=scheme, ignore=ignore)],
+    )
+    for name, scale in weight_scales.items():
+        update_offload_parameter(model.get_submodule(name), "weight_scale", scale)
+
+
+def run_job(job_name, spec, tokenizer, ds, calibration, args, logger, store_state):
+    """
+    Quantize a fresh copy of the model with one recipe and save it
+    
+    store_state caches the activation store between jobs of one invocation, so a grid
+    captures calibration statistics at most once.
+    """
+    import time
     
     logger.info("")
     logger.info("=" * 60)
-    logger.info("Step 3/5: Configure Quantization Algorithm")
+    logger.info(f"Step 3/5: Configure Quantization Algorithm ({job_name})")
     logger.info("=" * 60)
     
-    # Select recipe based on method
-    # ==================== W8A16 Methods ====================
-    if args.method == "w8a16_ptq":
-        recipe = [
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A16",
-                ignore=["lm_head"],
-                dampening_frac=0.0
-            )
-        ]
-        output_suffix = "W8A16-PTQ"
-        logger.info("Method: Simple PTQ (W8A16) - Fast Baseline")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Dampening: 0.0")
-        
-    elif args.method == "w8a16_gptq":
-        recipe = [
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A16",
-                ignore=["lm_head"],
-                dampening_frac=0.01
-            )
-        ]
-        output_suffix = "W8A16-GPTQ"
-        logger.info("Method: GPTQ (W8A16)")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Dampening: 0.01")
-        
-    elif args.method == "w8a16_awq":
-        # AWQ uses config_groups, group_size=128 (standard configuration)
-        recipe = [
-            AWQModifier(
-                ignore=["lm_head"],
-                config_groups={
-                    "group_0": {
-                        "targets": ["Linear"],
-                        "weights": {
-                            "num_bits": 8,
-                            "type": "int",
-                            "symmetric": True,
-                            "strategy": "group",  # Group quantization
-                            "group_size": 128,  # AWQ standard group_size
-                        }
-                    }
-                }
-            )
-        ]
-        output_suffix = "W8A16-AWQ"
-        logger.info("Method: AWQ (W8A16)")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Activation-aware Weight Quantization")
-        logger.info("  - group_size=128 (standard grouping)")
-        
-    elif args.method == "w8a16_sparse_gptq":
-        recipe = [
-            SparseGPTModifier(
-                targets="Linear",
-                sparsity=0.5
-            ),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A16",
-                ignore=["lm_head"],
-                dampening_frac=0.01
-            )
-        ]
-        output_suffix = "W8A16-SPARSE-GPTQ"
-        logger.info("Method: SparseGPT → GPTQ (W8A16)")
-        logger.info("  - Sparsity: 50%")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Prune first, then quantize")
-        
-    elif args.method == "w8a16_sparse_awq":
-        recipe = [
-            SparseGPTModifier(
-                targets="Linear",
-                sparsity=0.5
-            ),
-            AWQModifier(
-                ignore=["lm_head"],
-                config_groups={
-                    "group_0": {
-                        "targets": ["Linear"],
-                        "weights": {
-                            "num_bits": 8,
-                            "type": "int",
-                            "symmetric": True,
-                            "strategy": "group",
-                            "group_size": 128,
-                        }
-                    }
-                }
-            )
-        ]
-        output_suffix = "W8A16-SPARSE-AWQ"
-        logger.info("Method: SparseGPT → AWQ (W8A16)")
-        logger.info("  - Sparsity: 50%")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Prune first, then quantize")
-        logger.info("  - group_size=128 (standard grouping)")
-        
-    elif args.method == "w8a16_smooth_gptq":
-        recipe = [
-            SmoothQuantModifier(smoothing_strength=0.5),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A16",
-                ignore=["lm_head"],
-                dampening_frac=0.01
-            )
-        ]
-        output_suffix = "W8A16-SMOOTH-GPTQ"
-        logger.info("Method: SmoothQuant + GPTQ (W8A16)")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Smoothing: 0.5 (for comparison, less benefit with W8A16)")
-        
-    elif args.method == "w8a16_smooth_ptq":
-        recipe = [
-            SmoothQuantModifier(smoothing_strength=0.5),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A16",
-                ignore=["lm_head"],
-                dampening_frac=0.0  # PTQ: no dampening
-            )
-        ]
-        output_suffix = "W8A16-SMOOTH-PTQ"
-        logger.info("Method: SmoothQuant + PTQ (W8A16)")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Smoothing: 0.5, Dampening: 0.0 (fast PTQ)")
-        
-    elif args.method == "w8a16_smooth_awq":
-        recipe = [
-            SmoothQuantModifier(smoothing_strength=0.5),
-            AWQModifier(
-                ignore=["lm_head"],
-                config_groups={
-                    "group_0": {
-                        "targets": ["Linear"],
-                        "weights": {
-                            "num_bits": 8,
-                            "type": "int",
-                            "symmetric": True,
-                            "strategy": "group",
-                            "group_size": 128,
-                        }
-                    }
-                }
-            )
-        ]
-        output_suffix = "W8A16-SMOOTH-AWQ"
-        logger.info("Method: SmoothQuant + AWQ (W8A16)")
-        logger.info("  - Weights: INT8, Activations: FP16")
-        logger.info("  - Smoothing: 0.5 (for comparison)")
-        logger.info("  - group_size=128 (standard grouping)")
-        
-    # ==================== W8A8 Methods ====================
-    elif args.method == "w8a8_smooth_gptq":
-        recipe = [
-            SmoothQuantModifier(smoothing_strength=0.8),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A8",
-                ignore=["lm_head"],
-                dampening_frac=0.01
-            )
-        ]
-        output_suffix = "W8A8-SMOOTH-GPTQ"
-        logger.info("Method: SmoothQuant + GPTQ (W8A8)")
-        logger.info("  - Weights: INT8, Activations: INT8")
-        logger.info("  - Smoothing: 0.8")
-        
-    elif args.method == "w8a8_sparse_smooth_gptq":
-        recipe = [
-            SparseGPTModifier(
-                targets="Linear",
-                sparsity=0.5
-            ),
-            SmoothQuantModifier(smoothing_strength=0.8),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A8",
-                ignore=["lm_head"],
-                dampening_frac=0.01
-            )
-        ]
-        output_suffix = "W8A8-SPARSE-SMOOTH-GPTQ"
-        logger.info("Method: SparseGPT → SmoothQuant + GPTQ (W8A8)")
-        logger.info("  - Sparsity: 50%")
-        logger.info("  - Weights: INT8, Activations: INT8")
-        logger.info("  - Smoothing: 0.8")
-        logger.info("  - More memory/throughput efficient, but more accuracy loss")
-        
-    elif args.method == "w8a8_smooth_ptq":
-        recipe = [
-            SmoothQuantModifier(smoothing_strength=0.8),
-            GPTQModifier(
-                targets="Linear",
-                scheme="W8A8",
-                ignore=["lm_head"],
-                dampening_frac=0.0
-            )
-        ]
-        output_suffix = "W8A8-SMOOTH-PTQ"
-        logger.info("Method: SmoothQuant + Simple PTQ (W8A8)")
-        logger.info("  - Weights: INT8, Activations: INT8")
-        logger.info("  - Smoothing: 0.8")
-        logger.info("  - Dampening: 0.0 (fast baseline, medium accuracy)")
-        
-    # Set output directory
+    # Every job starts from the unquantized weights
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_ID,
+        device_map="auto",
+        torch_dtype="auto",
+    )
+    
+    for line in spec["description"]:
+        logger.info(line)
+    plan = stats_plan(spec)
+    use_store = bool(args.activation_store) and plan is not None
+    output_suffix = spec["output_suffix"]
+    if use_store:
+        output_suffix = f"{output_suffix}-{ACTIVATION_STORE_SUFFIX}"
+        logger.info(f"  - Algorithm: non-sequential GPTQ/SmoothQuant from the activation store")
     OUTPUT_DIR = f"{MODEL_BASE_DIR}/Qwen3-4B-Instruct-2507-INT8-{output_suffix}"
     
-    logger.info(f"  - Ignored layers: lm_head")
+    keep_bf16 = spec.get("keep_bf16", [])
+    logger.info(f"  - Ignored layers: lm_head" + (f" + {len(keep_bf16)} mixed-precision layers" if keep_bf16 else ""))
     logger.info(f"  - Calibration samples: {NUM_CALIBRATION_SAMPLES}")
     logger.info(f"  - Output directory: {OUTPUT_DIR}")
     logger.info("")
@@ -375,18 +183,34 @@ def main():
     logger.info("Step 4/5: Apply Quantization")
     logger.info("=" * 60)
     
-    import time
     start_time = time.time()
     
-    # Apply quantization (llmcompressor will automatically show progress bar)
-    logger.info("Starting quantization...")
-    oneshot(
-        model=model,
-        dataset=ds,
-        recipe=recipe,
-        max_seq_length=MAX_SEQUENCE_LENGTH,
-        num_calibration_samples=NUM_CALIBRATION_SAMPLES,
-    )
+    if use_store:
+        # Calibration statistics are captured once and shared by all GPTQ/PTQ variants
+        if "store" not in store_state:
+            logger.info(f"Using activation store: {args.activation_store}")
+            store_meta = {
+                "model": MODEL_ID,
+                "calibration": calibration.meta if calibration is not None else {
+                    "dataset": CALIBRATION_DATASET, "seed": CALIBRATION_SEED,
+                    "num_samples": NUM_CALIBRATION_SAMPLES, "max_length": MAX_SEQUENCE_LENGTH,
+                },
+            }
+            samples = calibration if calibration is not None else ds["input_ids"]
+            store_state["store"] = load_or_capture(args.activation_store, model, samples, store_meta, logger=logger)
+        quantize_from_activation_store(model, store_state["store"], plan, logger)
+    else:
+        if args.activation_store:
+            logger.info(f"⚠️  {job_name} is not supported by the activation store, running full calibration")
+        # Apply quantization (llmcompressor will automatically show progress bar)
+        logger.info("Starting quantization...")
+        oneshot(
+            model=model,
+            dataset=ds,
+            recipe=build_recipe(spec),
+            max_seq_length=MAX_SEQUENCE_LENGTH,
+            num_calibration_samples=NUM_CALIBRATION_SAMPLES,
+        )
     
     elapsed_time = time.time() - start_time
     logger.info(f"✅ Quantization completed (elapsed time: {elapsed_time/60:.1f} minutes)")
@@ -396,18 +220,197 @@ def main():
     logger.info("Step 5/5: Save Quantized Model")
     logger.info("=" * 60)
     
-    model.save_pretrained(OUTPUT_DIR, save_compressed=True)
-    tokenizer.save_pretrained(OUTPUT_DIR)
+    save_start = time.time()
+    if args.save_workers > 0:
+        integrity = save_compressed_model(
+            model, tokenizer, OUTPUT_DIR,
+            max_shard_size=args.max_shard_size,
+            workers=args.save_workers,
+            logger=logger,
+        )
+        if not integrity["ok"]:
+            raise RuntimeError(f"Saved checkpoint failed integrity check: {'; '.join(integrity['errors'])}")
+        logger.info(f"✅ Integrity check passed: {integrity['shards']} shards, {integrity['tensors']} tensors")
+    else:
+        model.save_pretrained(OUTPUT_DIR, save_compressed=True)
+        tokenizer.save_pretrained(OUTPUT_DIR)
+    save_time = time.time() - save_start
+    logger.info(f"✅ Quantized model saved to: {OUTPUT_DIR} ({save_time:.0f}s)")
+    
+    if use_store:
+        # recipe.yaml only shows the data-free scheme pass, so record how the weights were rounded
+        smoothing_strength, scheme, dampening, _ = plan
+        provenance = {
+            "job": job_name,
+            "algorithm": "non-sequential GPTQ from stored Hessians"
+                         + (" + SmoothQuant from stored absmax" if smoothing_strength is not None else ""),
+            "activation_store": str(Path(args.activation_store).resolve()),
+            "smoothing_strength": smoothing_strength,
+            "scheme": scheme,
+            "dampening_frac": dampening,
+        }
+        with open(Path(OUTPUT_DIR) / "activation_store_recipe.json", "w") as f:
+            json.dump(provenance, f, indent=2)
+        logger.info(f"📝 Activation store provenance: {OUTPUT_DIR}/activation_store_recipe.json")
+    
+    del model
+    return {
+        "job": job_name,
+        "output_suffix": output_suffix,
+        "output_dir": OUTPUT_DIR,
+        "grid_params": spec.get("grid_params", {}),
+        "activation_store": str(Path(args.activation_store).resolve()) if use_store else None,
+        "elapsed_min": elapsed_time / 60,
+        "save_s": save_time,
+    }
+
+
+def main():
+    registry = load_registry(DEFAULT_REGISTRY)
+    
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Quantize Qwen3-4B-Instruct-2507 model")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        "--method",
+        type=str,
+        default=None,
+        help=f"Quantization method from the recipe registry: {', '.join(registry['methods'])}"
+    )
+    target.add_argument(
+        "--grid",
+        type=str,
+        default=None,
+        help=f"Run every job of a parameter grid from the recipe registry: {', '.join(registry['grids'])}"
+    )
+    parser.add_argument(
+        "--recipes",
+        type=str,
+        default=str(DEFAULT_REGISTRY),
+        help="Recipe registry file (default: quantization/recipes.yaml)"
+    )
+    parser.add_argument(
+        "--calibration-cache",
+        type=str,
+        default=CALIBRATION_CACHE_DIR,
+        help="Directory of the shared tokenized calibration cache ('' to disable)"
+    )
+    parser.add_argument(
+        "--activation-store",
+        type=str,
+        default=None,
+        help="Reuse per-Linear calibration statistics from this directory (captured on first use); "
+             "applies to recipes that are GPTQ with optional SmoothQuant. GPTQ is then NON-SEQUENTIAL "
+             "(Hessians of the unquantized model) and the output gets a -ASTORE suffix; AWQ and sparse "
+             "recipes ignore the store and run full calibration"
+    )
+    parser.add_argument(
+        "--keep-bf16",
+        type=str,
+        default=None,
+        help="Mixed-precision plan from mixed_precision.py: its layers stay in BF16 (added to every ignore list)"
+    )
+    parser.add_argument(
+        "--max-shard-size",
+        type=str,
+        default=DEFAULT_MAX_SHARD_SIZE,
+        help="Maximum safetensors shard size of the saved checkpoint (e.g. 2GB, 512MB)"
+    )
+    parser.add_argument(
+        "--save-workers",
+        type=int,
+        default=DEFAULT_SAVE_WORKERS,
+        help="Threads writing shards in parallel (0 = plain save_pretrained, no checksums)"
+    )
+    args = parser.parse_args()
+    
+    if args.recipes != str(DEFAULT_REGISTRY):
+        registry = load_registry(args.recipes)
+    if args.method and args.method not in registry["methods"]:
+        parser.error(f"unknown method '{args.method}' (see recipe_registry.py --list)")
+    if args.grid and args.grid not in registry["grids"]:
+        parser.error(f"unknown grid '{args.grid}' (see recipe_registry.py --list)")
+    jobs = resolve_jobs(registry, method=args.method, grid=args.grid)
+    if args.keep_bf16:
+        keep_bf16 = load_plan(args.keep_bf16)["keep_bf16"]
+        jobs = [(f"{name}_mp{len(keep_bf16)}", with_ignore(spec, keep_bf16)) for name, spec in jobs]
+    run_label = args.grid or args.method
+    
+    # Initialize logger (pass method name for clear log filename)
+    logger = setup_logger(method_name=run_label)
+    
+    logger.info("=" * 60)
+    if args.grid:
+        logger.info(f"Quantization Grid: {args.grid.upper()} ({len(jobs)} jobs)")
+        for job_name, spec in jobs:
+            logger.info(f"  - {job_name} -> {spec['output_suffix']}")
+    else:
+        logger.info(f"Quantization Method: {args.method.upper()}")
+    logger.info("=" * 60)
+    logger.info("")
+    logger.info("=" * 60)
+    logger.info("Step 1/5: Load Tokenizer")
+    logger.info("=" * 60)
+    
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    logger.info(f"✅ Tokenizer loaded: {MODEL_ID} (model weights are loaded per job)")
+    
+    logger.info("")
+    logger.info("=" * 60)
+    logger.info("Step 2/5: Prepare Calibration Data")
+    logger.info("=" * 60)
+    
+    calibration = None
+    if args.calibration_cache:
+        calibration = load_or_build(
+            args.calibration_cache,
+            tokenizer,
+            lambda: build_calibration_samples(tokenizer, logger),
+            CALIBRATION_DATASET,
+            CALIBRATION_SPLIT,
+            CALIBRATION_SEED,
+            NUM_CALIBRATION_SAMPLES,
+            MAX_SEQUENCE_LENGTH,
+            logger=logger,
+        )
+        ds = calibration.to_dataset()
+    else:
+        ds = tokenize_calibration_dataset(tokenizer, logger)
+    
+    logger.info(f"✅ Calibration data prepared: {NUM_CALIBRATION_SAMPLES} samples")
+    
+    results = []
+    store_state = {}
+    for index, (job_name, spec) in enumerate(jobs, 1):
+        if len(jobs) > 1:
+            logger.info("")
+            logger.info(f"▶ Job {index}/{len(jobs)}: {job_name}")
+        try:
+            results.append(run_job(job_name, spec, tokenizer, ds, calibration, args, logger, store_state))
+        except Exception as e:
+            # One failing grid point should not lose the rest of the sweep
+            if len(jobs) == 1:
+                raise
+            logger.error(f"❌ Job {job_name} failed: {e}")
+            results.append({"job": job_name, "output_suffix": spec["output_suffix"], "error": str(e)})
     
-    logger.info(f"✅ Quantized model saved to: {OUTPUT_DIR}")
     logger.info("")
     logger.info("=" * 60)
     logger.info("🎉 Quantization process completed!")
     logger.info("=" * 60)
     logger.info(f"📂 Original model: {MODEL_ID}")
-    logger.info(f"📂 Quantized model: {OUTPUT_DIR}")
-    logger.info(f"📊 Quantization scheme: {output_suffix}")
+    for result in results:
+        if "error" in result:
+            logger.info(f"❌ {result['job']}: {result['error']}")
+        else:
+            logger.info(f"📂 Quantized model: {result['output_dir']} ({result['elapsed_min']:.1f} min)")
+            logger.info(f"📊 Quantization scheme: {result['output_suffix']}")
+    
+    if args.grid:
+        summary_file = os.path.join(LOG_DIR, f"grid_{args.grid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(summary_file, "w", encoding="utf-8") as f:
+            json.dump({"grid": args.grid, "recipes": args.recipes, "jobs": results}, f, indent=2)
+        logger.info(f"📊 Grid summary: {summary_file}")
 
 if __name__ == "__main__":
     main()
-
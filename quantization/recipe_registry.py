@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Declarative quantization recipe registry
+Methods and parameter grids live in recipes.yaml instead of code
+
+A method is a modifier stack ({type: <llmcompressor modifier>, **kwargs}) plus an
+output suffix and description. A grid takes a base method and a list of
+parameters (<ModifierClass>.<kwarg path>) with candidate values; expanding it
+yields one job per combination, each a complete method spec with its own
+name and output suffix.
+
+Usage:
+    python quantization/recipe_registry.py --list
+    python quantization/recipe_registry.py --expand w8a8_smooth_gptq_search
+"""
+import copy
+import argparse
+import itertools
+from pathlib import Path
+
+import yaml
+
+DEFAULT_REGISTRY = Path(__file__).parent / "recipes.yaml"
+
+
+def load_registry(path=DEFAULT_REGISTRY):
+    """Load recipes.yaml -> {"methods": {name: spec}, "grids": {name: grid}}"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    methods = data.get("methods") or {}
+    grids = data.get("grids") or {}
+    for name, spec in methods.items():
+        if not spec.get("modifiers"):
+            raise ValueError(f"Recipe '{name}' has no modifiers")
+        spec.setdefault("output_suffix", name.upper().replace("_", "-"))
+        spec.setdefault("description", [f"Method: {name}"])
+    for name, grid in grids.items():
+        if grid.get("base") not in methods:
+            raise ValueError(f"Grid '{name}' refers to unknown base method '{grid.get('base')}'")
+    return {"methods": methods, "grids": grids}
+
+
+def _format_value(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _set_param(spec, param, value):
+    """Set <ModifierClass>.<kwarg>[.<nested key>...] on every matching modifier of a spec"""
+    modifier_type, *path = param.split(".")
+    if not path:
+        raise ValueError(f"Grid parameter '{param}' must be <ModifierClass>.<kwarg>")
+    matched = False
+    for modifier in spec["modifiers"]:
+        if modifier["type"] != modifier_type:
+            continue
+        target = modifier
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+        matched = True
+    if not matched:
+        raise ValueError(f"Grid parameter '{param}': no {modifier_type} in the base recipe")
+
+
+def expand_grid(registry, grid_name):
+    """
+    Expand a grid into concrete jobs
+
+    Returns:
+        list of (job name, method spec); the spec has the grid values applied and
+        records them under "grid_params"
+    """
+    grid = registry["grids"][grid_name]
+    base_name = grid["base"]
+    base = registry["methods"][base_name]
+    params = grid["params"]
+
+    jobs = []
+    for values in itertools.product(*(p["values"] for p in params)):
+        # YAML anchors share objects between methods, so always work on a deep copy
+        spec = copy.deepcopy(base)
+        tags = []
+        for p, value in zip(params, values):
+            _set_param(spec, p["param"], value)
+            tags.append(f"{p.get('tag', p['param'].split('.')[-1])}{_format_value(value)}")
+        spec["output_suffix"] = "-".join([base["output_suffix"]] + [t.upper() for t in tags])
+        spec["grid_params"] = {p["param"]: value for p, value in zip(params, values)}
+        spec["description"] = list(base["description"]) + [
+            f"  - Grid {grid_name}: " + ", ".join(f"{k}={_format_value(v)}" for k, v in spec["grid_params"].items())
+        ]
+        jobs.append(("_".join([base_name] + tags), spec))
+    return jobs
+
+
+def resolve_jobs(registry, method=None, grid=None):
+    """Jobs for one --method or one --grid"""
+    if grid:
+        return expand_grid(registry, grid)
+    return [(method, copy.deepcopy(registry["methods"][method]))]
+
+
+def with_ignore(spec, layers, tag=None):
+    """
+    Copy of a method spec that leaves `layers` (full module names) unquantized
+
+    The layers are appended to the ignore list of every modifier except SmoothQuant
+    (smoothing is an exact rescaling, so it is harmless for BF16 layers).
+    """
+    spec = copy.deepcopy(spec)
+    for modifier in spec["modifiers"]:
+        if modifier["type"] == "SmoothQuantModifier":
+            continue
+        ignore = list(modifier.get("ignore", ["lm_head"]))
+        modifier["ignore"] = ignore + [layer for layer in layers if layer not in ignore]
+    tag = tag or f"MP{len(layers)}"
+    spec["output_suffix"] = f"{spec['output_suffix']}-{tag}"
+    spec["keep_bf16"] = list(layers)
+    spec["description"] = list(spec["description"]) + [f"  - Mixed precision: {len(layers)} Linear layers kept in BF16"]
+    return spec
+
+
+def build_recipe(spec):
+    """Instantiate the llmcompressor modifier stack of a method spec"""
+    from llmcompressor.modifiers.quantization import GPTQModifier
+    from llmcompressor.modifiers.awq import AWQModifier
+    from llmcompressor.modifiers.smoothquant import SmoothQuantModifier
+    from llmcompressor.modifiers.pruning import SparseGPTModifier
+
+    modifier_types = {
+        "GPTQModifier": GPTQModifier,
+        "AWQModifier": AWQModifier,
+        "SmoothQuantModifier": SmoothQuantModifier,
+        "SparseGPTModifier": SparseGPTModifier,
+    }
+    recipe = []
+    for modifier in spec["modifiers"]:
+        kwargs = {k: v for k, v in modifier.items() if k != "type"}
+        if modifier["type"] not in modifier_types:
+            raise ValueError(f"Unknown modifier type '{modifier['type']}'")
+        recipe.append(modifier_types[modifier["type"]](**copy.deepcopy(kwargs)))
+    return recipe
+
+
+def stats_plan(spec):
+    """
+    (SmoothQuant strength or None, scheme, dampening, ignore) if the recipe can run from
+    the activation store (an optional SmoothQuant followed by one GPTQ), else None
+    """
+    types = [m["type"] for m in spec["modifiers"]]
+    if types not in (["GPTQModifier"], ["SmoothQuantModifier", "GPTQModifier"]):
+        return None
+    gptq = spec["modifiers"][-1]
+    if gptq.get("targets", "Linear") not in ("Linear", ["Linear"]):
+        return None
+    strength = spec["modifiers"][0]["smoothing_strength"] if len(types) == 2 else None
+    return strength, gptq["scheme"], gptq.get("dampening_frac", 0.01), list(gptq.get("ignore", ["lm_head"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the quantization recipe registry")
+    parser.add_argument("--registry", type=str, default=str(DEFAULT_REGISTRY), help="Path to recipes.yaml")
+    parser.add_argument("--list", action="store_true", help="List methods and grids")
+    parser.add_argument("--expand", type=str, default=None, help="Print the jobs of a grid")
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    if args.expand:
+        for name, spec in expand_grid(registry, args.expand):
+            print(f"{name:<45} -> {spec['output_suffix']}")
+        return
+    print("Methods:")
+    for name, spec in registry["methods"].items():
+        chain = " → ".join(m["type"].replace("Modifier", "") for m in spec["modifiers"])
+        store = " [activation store]" if stats_plan(spec) else ""
+        print(f"  {name:<26} {chain}{store}")
+    print("Grids:")
+    for name, grid in registry["grids"].items():
+        size = 1
+        for p in grid["params"]:
+            size *= len(p["values"])
+        print(f"  {name:<26} base={grid['base']}, {size} jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Parallel, sharded save of compressed checkpoints
+
+Replaces the single-pass model.save_pretrained(save_compressed=True) of Step 5:
+the compressed state dict is split into shards of at most --max-shard-size,
+and a thread pool serializes, hashes, writes and fsyncs the shards concurrently
+(safetensors serialization, sha256 and file I/O all release the GIL). Only the
+shards in flight are held in host memory.
+
+The index is the commit marker. Any old index is removed before the first
+shard is written, and the new one is written last, atomically (temp file +
+fsync + rename). A crashed save therefore never looks complete. The index
+keeps the standard transformers layout and adds per-shard sizes and sha256
+sums under metadata.shards, which serving/checkpoint_integrity.py checks
+before a server is launched.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from serving.checkpoint_integrity import INDEX_FILE, SINGLE_FILE, verify_checkpoint
+
+DEFAULT_MAX_SHARD_SIZE = "2GB"
+DEFAULT_SAVE_WORKERS = 4
+
+_SIZE_UNITS = {"KB": 10**3, "MB": 10**6, "GB": 10**9, "KIB": 2**10, "MIB": 2**20, "GIB": 2**30, "B": 1}
+
+
+def parse_size(size):
+    """'2GB' / '512MiB' / 1000000 -> bytes (decimal units, as in transformers' max_shard_size)"""
+    if isinstance(size, int):
+        return size
+    text = str(size).strip().upper()
+    for unit in sorted(_SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * _SIZE_UNITS[unit])
+    return int(text)
+
+
+def _tensor_bytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+
+def dedupe_shared(state_dict):
+    """Drop aliases of tensors already in the state dict (tied embeddings); the first name wins"""
+    seen = set()
+    unique = {}
+    for name, tensor in state_dict.items():
+        key = (tensor.device, tensor.data_ptr(), tuple(tensor.shape)) if tensor.device.type != "meta" else None
+        if key is not None and key in seen:
+            continue
+        if key is not None:
+            seen.add(key)
+        unique[name] = tensor
+    return unique
+
+
+def plan_shards(state_dict, max_shard_bytes):
+    """Greedy split in state-dict order (keeps each layer's tensors together) -> list of name lists"""
+    shards, current, current_bytes = [], [], 0
+    for name, tensor in state_dict.items():
+        size = _tensor_bytes(tensor)
+        if current and current_bytes + size > max_shard_bytes:
+            shards.append(current)
+            current, current_bytes = [], 0
+        current.append(name)
+        current_bytes += size
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_shard(path, tensors):
+    """Serialize, hash and durably write one shard -> (size, sha256)"""
+    from safetensors.torch import save
+
+    data = save({name: t.detach().to("cpu").contiguous() for name, t in tensors.items()}, metadata={"format": "pt"})
+    digest = hashlib.sha256(data).hexdigest()
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data), digest
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_state_dict_sharded(state_dict, output_dir, max_shard_size=DEFAULT_MAX_SHARD_SIZE,
+                            workers=DEFAULT_SAVE_WORKERS, logger=None):
+    """
+    Write state_dict as safetensors shards plus an index with per-shard checksums
+
+    Returns:
+        the index dict written to model.safetensors.index.json
+    """
+    log = logger.info if logger else print
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Invalidate any previous checkpoint first: no index => not a complete checkpoint
+    for stale in [output_dir / INDEX_FILE, output_dir / SINGLE_FILE, *output_dir.glob("model-*-of-*.safetensors")]:
+        if stale.exists():
+            stale.unlink()
+
+    state_dict = dedupe_shared(state_dict)
+    shards = plan_shards(state_dict, parse_size(max_shard_size))
+    names = [f"model-{i + 1:05d}-of-{len(shards):05d}.safetensors" for i in range(len(shards))]
+    total_size = sum(_tensor_bytes(t) for t in state_dict.values())
+    log(f"Saving {len(state_dict)} tensors ({total_size / 1e9:.2f} GB) as {len(shards)} shards "
+        f"with {workers} writers")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(_write_shard, output_dir / name, {key: state_dict[key] for key in keys})
+            for name, keys in zip(names, shards)
+        ]
+        written = [future.result() for future in futures]
+    _fsync_dir(output_dir)
+
+    index = {
+        "metadata": {
+            "total_size": total_size,
+            "shards": {name: {"size": size, "sha256": digest} for name, (size, digest) in zip(names, written)},
+        },
+        "weight_map": {key: name for name, keys in zip(names, shards) for key in keys},
+    }
+    _write_json_atomic(output_dir / INDEX_FILE, index)
+    _fsync_dir(output_dir)
+
+    elapsed = time.perf_counter() - start
+    written_bytes = sum(size for size, _ in written)
+    log(f"✅ Shards written in {elapsed:.1f}s ({written_bytes / 1e9 / max(elapsed, 1e-9):.2f} GB/s)")
+    return index
+
+
+def compressed_state_dict(model):
+    """
+    Compress the model the way save_pretrained(save_compressed=True) does and return its state dict
+
+    Returns:
+        (state dict, compressor or None); the compressor adds quantization_config to config.json
+    """
+    from llmcompressor.transformers.compression.compressed_tensors_utils import get_model_compressor
+
+    compressor = get_model_compressor(model=model, save_compressed=True)
+    if compressor is None:
+        return model.state_dict(), None
+    if hasattr(compressor, "compress_model"):
+        # In-place compression (newer compressed-tensors)
+        compressor.compress_model(model)
+        state_dict = model.state_dict()
+    else:
+        state_dict = compressor.compress(model)
+    if any(t.device.type == "meta" for t in state_dict.values()):
+        # Offloaded parameters only have placeholders on the module
+        from accelerate.utils import get_state_dict_offloaded_model
+        state_dict = get_state_dict_offloaded_model(model)
+    return state_dict, compressor
+
+
+def save_compressed_model(model, tokenizer, output_dir, max_shard_size=DEFAULT_MAX_SHARD_SIZE,
+                          workers=DEFAULT_SAVE_WORKERS, logger=None):
+    """
+    Sharded, parallel replacement for model.save_pretrained(output_dir, save_compressed=True)
+
+    Returns:
+        verify_checkpoint report of the written checkpoint (fast check)
+    """
+    output_dir = Path(output_dir)
+    state_dict, compressor = compressed_state_dict(model)
+    save_state_dict_sharded(state_dict, output_dir, max_shard_size, workers, logger=logger)
+
+    model.config.save_pretrained(output_dir)
+    if getattr(model, "generation_config", None) is not None:
+        model.generation_config.save_pretrained(output_dir)
+    if compressor is not None:
+        compressor.update_config(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return verify_checkpoint(output_dir)
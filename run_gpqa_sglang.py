@@ -16,12 +16,20 @@ Usage:
         --base-url http://127.0.0.1:30000/v1 \
         --variant extended \
         --max-tokens 32768
+    
+    # Concurrent requests (saturate sglang continuous batching)
+    python run_gpqa_sglang.py --model original --n-repeats 50 --concurrency 64
+    
+    # Adaptive repeats: stop once the accuracy CI is within ±2% of the mean (3-50 repeats)
+    python run_gpqa_sglang.py --model original --adaptive --target-ci 0.02 --max-repeats 50 --concurrency 64
 """
 import sys
 import json
+import time
 import argparse
+import dataclasses
 from pathlib import Path
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 # Add parent directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -30,12 +38,46 @@ sys.path.insert(0, str(Path(__file__).parent))
 from simple_evals.gpqa_eval import GPQAEval
 from simple_evals.types import SamplerBase, SamplerResponse
 from simple_evals import common
+from evaluation.async_engine import AsyncRequestEngine, concurrent_dispatch, current_sample
+from evaluation.journal import REPEAT_KEY, ResultJournal, annotate_examples, sample_key, usage_to_dict
+from evaluation.response_cache import ResponseCache, request_cache_key
+from evaluation.latency import LatencyRecorder, sample_timing
+from evaluation.grading import ANSWER_PATTERN, grade_samples
+from evaluation.trace import TraceRecorder
+from evaluation.early_stop import AnswerWatcher, TruncationLog
+from evaluation.scheduling import LengthPredictor, LengthScheduler, find_journals
+from performance.stats import MIN_REPEATS, precision_reached, required_repeats
+
+# Answer regex of the grader itself (the local copy is only a fallback for forks without it)
+GRADER_ANSWER_PATTERN = getattr(common, "ANSWER_PATTERN_MULTICHOICE", ANSWER_PATTERN)
 
 
 class SglangSampler(SamplerBase):
     """
     Sglang Backend Sampler
     Supports OpenAI-compatible API
+
+    With concurrency > 1, requests are sent through AsyncOpenAI on a shared
+    event loop so that up to `concurrency` of them are in flight at once.
+    
+    When a journal is attached, every response for an evaluation sample is
+    appended to it as soon as it arrives, and samples already present in the
+    journal are replayed instead of being sent to the server.
+    
+    When a response cache is attached (greedy mode only), byte-identical
+    requests are answered from disk without touching the server.
+    
+    With stream=True, responses are streamed and per-sample TTFT,
+    inter-token times, decode time and tokens/s are recorded.
+    
+    When a trace recorder is attached, every request sent to the server is
+    logged with its arrival offset and prompt/output token counts (for
+    trace replay in performance/run_benchmark.py --trace).
+    
+    With a truncation log (streaming only), each stream is watched with the
+    grader's answer pattern and closed once the answer is stable; those
+    samples are logged separately, never stored in the response cache and
+    left out of the latency statistics and the trace.
     """
     
     def __init__(
@@ -46,7 +88,14 @@ class SglangSampler(SamplerBase):
         presence_penalty: float | None = None,
         max_tokens: int = 16384,
         seed: int = 1234,
-        system_message: str = "You are a helpful assistant."
+        system_message: str = "You are a helpful assistant.",
+        concurrency: int = 1,
+        journal: ResultJournal | None = None,
+        response_cache: ResponseCache | None = None,
+        model_name: str = "default",
+        stream: bool = False,
+        trace: TraceRecorder | None = None,
+        truncation: TruncationLog | None = None
     ):
         """
         Args:
@@ -57,6 +106,13 @@ class SglangSampler(SamplerBase):
             max_tokens: maximum number of tokens to generate
             seed: random seed (for reproducibility)
             system_message: system prompt message
+            concurrency: maximum number of in-flight requests (1 = blocking client)
+            journal: optional per-sample result journal (for checkpoint/resume)
+            response_cache: optional on-disk response cache (deterministic requests only)
+            model_name: model identity used in cache keys (the server ignores it)
+            stream: stream responses and record per-sample latency
+            trace: optional request trace recorder
+            truncation: stop streams at a stable answer and log those samples here
         """
         # Increase timeout for complex questions (default 600s too short)
         # GPQA questions + max_tokens=16k may take a long time
@@ -65,12 +121,30 @@ class SglangSampler(SamplerBase):
             api_key="dummy",
             timeout=3600.0  # 60 minute timeout
         )
+        self.concurrency = concurrency
+        self.async_client = None
+        self.engine = None
+        if concurrency > 1:
+            self.async_client = AsyncOpenAI(
+                base_url=base_url,
+                api_key="dummy",
+                timeout=3600.0,
+                max_retries=2
+            )
+            self.engine = AsyncRequestEngine(max_in_flight=concurrency)
         self.temperature = temperature
         self.top_p = top_p
         self.presence_penalty = presence_penalty
         self.max_tokens = max_tokens
         self.seed = seed
         self.system_message = system_message
+        self.journal = journal
+        self.response_cache = response_cache
+        self.model_name = model_name
+        self.stream = stream
+        self.latency = LatencyRecorder() if stream else None
+        self.trace = trace
+        self.truncation = truncation if stream else None
     
     def _pack_message(self, content: str, role: str):
         """Pack message into OpenAI format"""
@@ -89,6 +163,21 @@ class SglangSampler(SamplerBase):
         # Add system message
         messages = [self._pack_message(self.system_message, "system")] + message_list
         
+        # Replay samples already answered in a previous (interrupted) run
+        key = sample_key(current_sample())
+        if self.journal is not None:
+            record = self.journal.lookup(key)
+            if record is not None:
+                if self.latency is not None and record.get("latency") and not record.get("truncated"):
+                    self.latency.record(record["latency"])
+                if self.truncation is not None and record.get("truncated"):
+                    self.truncation.add(key, record["truncated"]["answer"], record["truncated"]["chunks"])
+                return SamplerResponse(
+                    response_text=record["response_text"],
+                    response_metadata={"usage": record["usage"], "replayed": True},
+                    actual_queried_message_list=messages,
+                )
+        
         # Build request parameters (only pass non-None parameters)
         request_kwargs = {
             "model": "default",  # sglang ignores this parameter
@@ -105,14 +194,154 @@ class SglangSampler(SamplerBase):
         if self.presence_penalty is not None:
             request_kwargs["presence_penalty"] = self.presence_penalty
         
+        # Byte-identical greedy requests are answered from the response cache
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = request_cache_key(
+                self.model_name, messages, self.temperature, self.top_p,
+                self.presence_penalty, self.max_tokens, self.seed
+            )
+            entry = self.response_cache.get(cache_key)
+            if entry is not None:
+                if self.journal is not None:
+                    self.journal.append(key, entry["response_text"], entry["usage"])
+                return SamplerResponse(
+                    response_text=entry["response_text"],
+                    response_metadata={"usage": entry["usage"], "cached": True},
+                    actual_queried_message_list=messages,
+                )
+        
         # Call sglang (only use OpenAI-compatible parameters)
-        response = self.client.chat.completions.create(**request_kwargs)
+        arrival = self.trace.now() if self.trace is not None and key is not None else None
+        watcher = None
+        if self.truncation is not None:
+            watcher = AnswerWatcher(self.truncation.pattern, self.truncation.grace_chunks)
+        response_text, usage, timing = self._complete(request_kwargs, watcher)
+        # A response stopped at the answer is shorter than what the model would
+        # generate, so it stays out of the trace and the latency statistics
+        truncated = watcher is not None and watcher.stopped
+        if arrival is not None and not truncated:
+            self.trace.record(arrival, usage, self.trace.now() - arrival, key)
+        
+        response_metadata = {"usage": usage}
+        journal_extra = None
+        if timing is not None:
+            if key is not None and not truncated:  # skip ad-hoc calls such as the connection test
+                self.latency.record(timing)
+            # The raw inter-token list is only kept in the aggregate histogram
+            timing = {k: v for k, v in timing.items() if k != "inter_token_s"}
+            response_metadata["latency"] = timing
+            journal_extra = {"latency": timing}
+        
+        if truncated:
+            # The usage chunk only comes at the end of a stream; count chunks instead
+            usage = usage or {"prompt_tokens": None, "completion_tokens": watcher.chunks, "total_tokens": None}
+            response_metadata["usage"] = usage
+            self.truncation.add(key, watcher.answer, watcher.chunks)
+            response_metadata["truncated"] = True
+            journal_extra["truncated"] = {"answer": watcher.answer, "chunks": watcher.chunks}
+        
+        # A truncated response is not what a full request returns, so it is never cached
+        if self.response_cache is not None and not truncated:
+            self.response_cache.put(cache_key, response_text, usage_to_dict(usage))
+        if self.journal is not None:
+            self.journal.append(key, response_text, usage, extra=journal_extra)
         
         return SamplerResponse(
-            response_text=response.choices[0].message.content,
-            response_metadata={"usage": response.usage},
+            response_text=response_text,
+            response_metadata=response_metadata,
             actual_queried_message_list=messages,
         )
+    
+    def _complete(self, request_kwargs, watcher: AnswerWatcher | None = None):
+        """
+        Send one chat completion request (through the async engine when enabled)
+        
+        Args:
+            request_kwargs: chat completion parameters
+            watcher: optional answer watcher that may end the stream early
+        
+        Returns:
+            (response_text, usage, timing) where timing is None unless streaming
+        """
+        if self.stream:
+            request_kwargs = {
+                **request_kwargs,
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }
+            if self.engine is None:
+                return self._consume_stream(request_kwargs, watcher)
+            return self.engine.submit(lambda: self._consume_stream_async(request_kwargs, watcher))
+        
+        if self.engine is None:
+            response = self.client.chat.completions.create(**request_kwargs)
+        else:
+            response = self.engine.submit(
+                lambda: self.async_client.chat.completions.create(**request_kwargs)
+            )
+        return response.choices[0].message.content, response.usage, None
+    
+    def _consume_stream(self, request_kwargs, watcher=None):
+        """
+        Read a streamed response with the blocking client, timing each content chunk
+        
+        Closing the stream when the watcher fires makes the server abort the request.
+        """
+        start = time.perf_counter()
+        pieces, chunk_times, usage = [], [], None
+        stream = self.client.chat.completions.create(**request_kwargs)
+        for chunk in stream:
+            usage = self._collect_chunk(chunk, pieces, chunk_times) or usage
+            if watcher is not None and self._fed(watcher, pieces):
+                stream.close()
+                break
+        end = time.perf_counter()
+        return self._stream_result(start, pieces, chunk_times, end, usage)
+    
+    async def _consume_stream_async(self, request_kwargs, watcher=None):
+        """Async counterpart of _consume_stream (runs on the engine loop)"""
+        start = time.perf_counter()
+        pieces, chunk_times, usage = [], [], None
+        stream = await self.async_client.chat.completions.create(**request_kwargs)
+        async for chunk in stream:
+            usage = self._collect_chunk(chunk, pieces, chunk_times) or usage
+            if watcher is not None and self._fed(watcher, pieces):
+                await stream.close()
+                break
+        end = time.perf_counter()
+        return self._stream_result(start, pieces, chunk_times, end, usage)
+    
+    @staticmethod
+    def _fed(watcher, pieces):
+        """Feed content that arrived since the last call to the watcher; True to stop"""
+        stop = False
+        while watcher.chunks < len(pieces) and not stop:
+            stop = watcher.feed(pieces[watcher.chunks])
+        return stop
+    
+    @staticmethod
+    def _stream_result(start, pieces, chunk_times, end, usage):
+        """(response_text, usage, timing) of a consumed stream"""
+        completion_tokens = usage.completion_tokens if usage is not None else None
+        return "".join(pieces), usage, sample_timing(start, chunk_times, end, completion_tokens)
+    
+    @staticmethod
+    def _collect_chunk(chunk, pieces, chunk_times):
+        """Append a chunk's content and arrival time; return its usage (final chunk only)"""
+        if chunk.choices:
+            content = chunk.choices[0].delta.content
+            if content:
+                pieces.append(content)
+                chunk_times.append(time.perf_counter())
+        return getattr(chunk, "usage", None)
+    
+    def close(self):
+        """Release the async engine and its HTTP connections"""
+        if self.engine is not None:
+            self.engine.run_coroutine(self.async_client.close())
+            self.engine.close()
+            self.engine = None
 
 
 # Preset configurations
@@ -178,6 +407,70 @@ PRESETS = {
 }
 
 
+def run_adaptive(gpqa_eval, sampler, concurrency, target_rel_ci, min_repeats, max_repeats, scheduler=None):
+    """
+    Evaluate one repeat (every question once) at a time until the accuracy is precise enough
+
+    gpqa_eval must be built with n_repeats=max_repeats and annotated, so the
+    journal keys (question, repeat) and permutations match a fixed-repeat run.
+    Each repeat's accuracy is one observation; evaluation stops once the t CI
+    half-width of their mean is within target_rel_ci × mean (after min_repeats
+    repeats) or after max_repeats repeats. With a length scheduler, each
+    round's journaled lengths feed the predictions of the next round.
+
+    Returns:
+        (merged EvalResult, stop dict); gpqa_eval.examples is left holding the
+        evaluated rows, in the order of the merged convos
+    """
+    all_examples = gpqa_eval.examples
+    # Records resumed from the journal are already part of the scheduler's history
+    resumed = set(sampler.journal.records) if sampler.journal is not None else set()
+    evaluated = []
+    rounds = []
+    stop = {"reason": "max_repeats", "target_rel_ci": target_rel_ci, "rel_ci_half_width": None}
+    try:
+        for repeat in range(max_repeats):
+            gpqa_eval.examples = [row for row in all_examples if row[REPEAT_KEY] == repeat]
+            with concurrent_dispatch(common, concurrency, scheduler):
+                rounds.append(gpqa_eval(sampler))
+            evaluated.extend(gpqa_eval.examples)
+            if scheduler is not None and sampler.journal is not None:
+                scheduler.predictor.add_records(
+                    sampler.journal.records[key] for key in map(sample_key, gpqa_eval.examples)
+                    if key in sampler.journal.records and key not in resumed
+                )
+            
+            scores = [r.score for r in rounds]
+            reached, width = precision_reached(scores, target_rel_ci, min_repeats)
+            stop["rel_ci_half_width"] = width
+            print(f"🔁 第 {repeat + 1}/{max_repeats} 轮: 准确率 {scores[-1]:.4f}, 平均 {sum(scores) / len(scores):.4f}"
+                  + (f", CI 半宽 ±{width:.2%}" if width is not None else ""))
+            if reached:
+                stop["reason"] = "precision"
+                break
+    finally:
+        gpqa_eval.examples = evaluated
+    
+    stop["repeats"] = len(rounds)
+    if stop["reason"] == "max_repeats":
+        stop["repeats_needed"] = required_repeats([r.score for r in rounds], target_rel_ci)
+    
+    # Every round has the same questions, so the overall score (and each mean
+    # metric) is the mean over rounds
+    metrics = {
+        key: sum(r.metrics[key] for r in rounds) / len(rounds)
+        for key in rounds[0].metrics if all(key in r.metrics for r in rounds)
+    }
+    merged = dataclasses.replace(
+        rounds[0],
+        score=sum(r.score for r in rounds) / len(rounds),
+        metrics=metrics,
+        htmls=[html for r in rounds for html in r.htmls],
+        convos=[convo for r in rounds for convo in r.convos],
+    )
+    return merged, stop
+
+
 def main():
     # 构建预设模型的帮助信息
     preset_help = "使用预设模型: " + ", ".join([
@@ -221,6 +514,26 @@ def main():
         default="http://127.0.0.1:30000/v1",
         help="Sglang 服务器地址 (默认: http://127.0.0.1:30000/v1)"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="最大并发请求数，>1 时使用异步客户端以充分利用服务器连续批处理 (默认: 1)"
+    )
+    parser.add_argument(
+        "--schedule",
+        type=str,
+        default="dataset",
+        choices=["dataset", "longest-first"],
+        help="样本分发顺序: dataset (数据集顺序) 或 longest-first (按历史/提示长度预测的输出长度，最长优先，减少长尾等待)"
+    )
+    parser.add_argument(
+        "--length-history",
+        type=str,
+        nargs="+",
+        default=None,
+        help="用于预测输出长度的历史样本日志 journal_*.jsonl (默认: 输出目录下该模型的日志，没有则用所有模型的日志)"
+    )
     
     # 评估配置
     parser.add_argument(
@@ -242,6 +555,29 @@ def main():
         default=1,
         help="每个样本重复次数（仅当 num-examples=None 时支持 >1）"
     )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="自适应重复：逐轮评估（每轮所有问题各一次），直到各轮准确率均值的 95%% CI 半宽 <= --target-ci × 均值（忽略 --n-repeats）"
+    )
+    parser.add_argument(
+        "--target-ci",
+        type=float,
+        default=0.02,
+        help="--adaptive 的目标相对 CI 半宽 (默认: 0.02 = ±2%%)"
+    )
+    parser.add_argument(
+        "--min-repeats",
+        type=int,
+        default=MIN_REPEATS,
+        help=f"--adaptive 的最少轮数 (默认: {MIN_REPEATS})"
+    )
+    parser.add_argument(
+        "--max-repeats",
+        type=int,
+        default=50,
+        help="--adaptive 的最多轮数 (默认: 50)"
+    )
     parser.add_argument(
         "--n-shot",
         type=int,
@@ -281,6 +617,44 @@ def main():
         default=None,
         help="可选的配置名称，用于进一步区分实验，如 'qwen_prompt', 'ablation_study' 等。不提供则自动生成基础配置名"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式生成，记录每个样本的首 token 延迟 (TTFT)、token 间隔、解码时间和 tokens/s"
+    )
+    parser.add_argument(
+        "--stop-at-answer",
+        action="store_true",
+        help="流式生成中一旦出现稳定的最终答案 (与评分相同的正则) 即中止请求，被截断的样本单独记录到 truncated_*.jsonl (隐含 --stream)"
+    )
+    parser.add_argument(
+        "--stop-grace-chunks",
+        type=int,
+        default=8,
+        help="匹配到答案后再接收的 chunk 数，之后中止 (默认: 8)"
+    )
+    parser.add_argument(
+        "--record-trace",
+        action="store_true",
+        help="记录请求 trace (到达时间偏移、prompt/输出 token 数) 到 trace_*.jsonl，可用 performance/run_benchmark.py --trace 回放"
+    )
+    parser.add_argument(
+        "--response-cache",
+        type=str,
+        default=None,
+        help="响应缓存目录（仅 --greedy 模式生效）：相同请求直接从磁盘返回，无需访问服务器"
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=2048,
+        help="响应缓存大小上限 (MB)，超出后按 LRU 淘汰 (默认: 2048)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="从已有的样本日志 (journal) 恢复，跳过已完成的 (问题, 重复) 对，并从日志重新汇总最终得分"
+    )
     parser.add_argument(
         "--output-dir",
         type=str,
@@ -289,6 +663,14 @@ def main():
     )
     
     args = parser.parse_args()
+    if args.stop_at_answer:
+        args.stream = True
+    if args.adaptive and args.num_examples:
+        parser.error("--adaptive 需要完整问题集（不能与 --num-examples 同时使用）")
+    
+    # 自适应模式下按最多轮数构建样本（日志键和选项排列与固定重复次数的运行一致）
+    n_repeats = args.max_repeats if args.adaptive else args.n_repeats
+    repeat_label = f"adaptive{args.max_repeats}" if args.adaptive else f"{args.n_repeats}"
     
     # 处理采样参数
     if args.greedy:
@@ -320,8 +702,12 @@ def main():
     print(f"模型: {model_name}")
     print(f"      ({preset_desc})")
     print(f"服务器: {args.base_url}")
+    print(f"并发: {args.concurrency} 个请求")
     print(f"变体: {args.variant}")
-    print(f"样本数: {args.num_examples or 'ALL'} × {args.n_repeats} repeats")
+    if args.adaptive:
+        print(f"样本数: ALL × 自适应 {args.min_repeats}-{args.max_repeats} repeats (目标 CI ±{args.target_ci:.1%})")
+    else:
+        print(f"样本数: {args.num_examples or 'ALL'} × {args.n_repeats} repeats")
     shot_mode = f"{args.n_shot}-shot" if args.n_shot > 0 else "Zero-shot"
     
     if args.greedy:
@@ -333,11 +719,13 @@ def main():
     
     print(f"采样: {shot_mode}, {sampling_mode}, Max-Tokens={args.max_tokens}, Seed={args.seed}")
     print(f"      参数: {sampling_detail}")
+    if args.stop_at_answer:
+        print(f"      答案稳定后提前终止 (匹配后再收 {args.stop_grace_chunks} 个 chunk)")
     
     # 提前计算配置名称用于显示
     sampling_part_preview = "greedy" if args.greedy else "dosample"
     shot_part_preview = f"{args.n_shot}shot" if args.n_shot > 0 else "zeroshot"
-    repeat_part_preview = f"{args.n_repeats}repeat"
+    repeat_part_preview = f"{repeat_label}repeat"
     config_preview = f"{sampling_part_preview}_{shot_part_preview}_{repeat_part_preview}"
     if args.num_examples:
         config_preview += f"_{args.num_examples}samples"
@@ -351,48 +739,11 @@ def main():
     print(f"输出: {args.output_dir}/")
     print(f"{'='*70}\n")
     
-    # 创建 Sampler
-    sampler = SglangSampler(
-        base_url=args.base_url,
-        temperature=temperature,
-        top_p=top_p,
-        presence_penalty=presence_penalty,
-        max_tokens=args.max_tokens,
-        seed=args.seed
-    )
-    
-    # 测试连接
-    print("🔌 测试连接...")
-    try:
-        test_response = sampler([{"role": "user", "content": "Hello"}])
-        print(f"✅ 连接成功（响应: {test_response.response_text[:50]}...）\n")
-    except Exception as e:
-        print(f"❌ 连接失败: {e}")
-        print(f"   请确保 sglang 服务器正在运行:")
-        print(f"   python -m sglang.launch_server \\")
-        print(f"       --model-path /path/to/model \\")
-        print(f"       --host 127.0.0.1 \\")
-        print(f"       --port 30000")
-        sys.exit(1)
-    
-    # 加载 GPQA 并开始评估
-    print(f"📚 加载 GPQA ({args.variant}) 并开始评估...\n")
-    
-    gpqa_eval = GPQAEval(
-        n_repeats=args.n_repeats,
-        variant=args.variant,
-        num_examples=args.num_examples,
-        n_shot=args.n_shot
-    )
-    
-    # 运行评估
-    result = gpqa_eval(sampler)
-    
     # 自动生成基础配置名
     # 格式: <采样模式>_<few-shot>_<n_repeat>[_自定义名称]
     sampling_part = "greedy" if args.greedy else "dosample"
     shot_part = f"{args.n_shot}shot" if args.n_shot > 0 else "zeroshot"
-    repeat_part = f"{args.n_repeats}repeat"  # 始终显示 repeat
+    repeat_part = f"{repeat_label}repeat"  # 始终显示 repeat
     
     # 基础配置名
     auto_config_name = f"{sampling_part}_{shot_part}_{repeat_part}"
@@ -421,7 +772,7 @@ def main():
     filename_parts.append(sampling_part)
     
     # n_repeats (始终显示)
-    filename_parts.append(f"{args.n_repeats}repeats")
+    filename_parts.append(f"{repeat_label}repeats")
     
     # seed (如果不是默认值1234)
     if args.seed != 1234:
@@ -435,6 +786,10 @@ def main():
     if args.num_examples:
         filename_parts.append(f"{args.num_examples}samples")
     
+    # 答案提前终止 (如果启用)
+    if args.stop_at_answer:
+        filename_parts.append("stopanswer")
+    
     filename_suffix = "_".join(filename_parts)
     
     # 保存结果 - 按模型名称、变体、最终配置名组织到子文件夹
@@ -446,19 +801,194 @@ def main():
     
     html_file = result_dir / f"results_{filename_suffix}.html"
     json_file = result_dir / f"results_{filename_suffix}.json"
+    journal_file = result_dir / f"journal_{filename_suffix}.jsonl"
+    trace_file = result_dir / f"trace_{filename_suffix}.jsonl"
+    truncated_file = result_dir / f"truncated_{filename_suffix}.jsonl"
+    
+    # 长度感知调度：预测输出长度，最长优先分发
+    # 历史须在创建样本日志之前读取：非恢复模式会清空本配置的日志，而它正是最相关的历史
+    scheduler = None
+    if args.schedule == "longest-first":
+        predictor = LengthPredictor()
+        history = args.length_history or find_journals(args.output_dir, model_name)
+        used = predictor.load_journals(history)
+        scheduler = LengthScheduler(predictor, args.concurrency)
+        print(f"📏 最长优先调度: {len(history)} 个历史日志, {used} 条记录覆盖 {predictor.questions} 个问题"
+              + ("" if used else " (无历史，按提示长度预测)") + "\n")
+    
+    # 样本日志：每个响应到达即追加写入，崩溃后可用 --resume 继续
+    journal = ResultJournal(
+        journal_file,
+        sampling_config={
+            "model": model_name,
+            "variant": args.variant,
+            "n_shot": args.n_shot,
+            "temperature": temperature,
+            "top_p": top_p,
+            "presence_penalty": presence_penalty,
+            "max_tokens": args.max_tokens,
+            "seed": args.seed,
+        },
+        resume=args.resume,
+    )
+    if args.resume:
+        print(f"♻️  恢复模式: 日志中已有 {len(journal.records)} 个样本 ({journal_file.name})")
+        if journal.skipped_records:
+            print(f"   ⚠️  忽略 {journal.skipped_records} 条配置不匹配或损坏的记录")
+    
+    # 响应缓存：仅 Greedy 模式下请求结果是确定的
+    response_cache = None
+    if args.response_cache:
+        if args.greedy:
+            response_cache = ResponseCache(args.response_cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+            print(f"🗄️  响应缓存: {args.response_cache} ({response_cache.stats()['entries']} 条, 上限 {args.cache_max_mb} MB)")
+        else:
+            print(f"⚠️  Do-sample 模式结果不确定，忽略 --response-cache")
+    
+    # 请求 trace：仅记录实际发送到服务器的请求（日志恢复和缓存命中不计入）
+    trace = TraceRecorder(trace_file) if args.record_trace else None
+    if trace is not None:
+        print(f"🧾 请求 trace: {trace_file}")
+    
+    # 答案提前终止：截断的样本单独记录，便于衡量对准确率的影响
+    truncation = TruncationLog(args.stop_grace_chunks, GRADER_ANSWER_PATTERN) if args.stop_at_answer else None
+    
+    # 创建 Sampler
+    sampler = SglangSampler(
+        base_url=args.base_url,
+        temperature=temperature,
+        top_p=top_p,
+        presence_penalty=presence_penalty,
+        max_tokens=args.max_tokens,
+        seed=args.seed,
+        concurrency=args.concurrency,
+        journal=journal,
+        response_cache=response_cache,
+        model_name=model_name,
+        stream=args.stream,
+        trace=trace,
+        truncation=truncation
+    )
+    
+    # 测试连接
+    print("🔌 测试连接...")
+    try:
+        test_response = sampler([{"role": "user", "content": "Hello"}])
+        print(f"✅ 连接成功（响应: {test_response.response_text[:50]}...）\n")
+    except Exception as e:
+        print(f"❌ 连接失败: {e}")
+        print(f"   请确保 sglang 服务器正在运行:")
+        print(f"   python -m sglang.launch_server \\")
+        print(f"       --model-path /path/to/model \\")
+        print(f"       --host 127.0.0.1 \\")
+        print(f"       --port 30000")
+        if not args.resume:
+            sampler.close()
+            journal.close()
+            if trace is not None:
+                trace.close()
+            sys.exit(1)
+        print(f"   ⚠️  恢复模式: 继续，仅日志中已有的样本可用\n")
+    
+    # 加载 GPQA 并开始评估
+    print(f"📚 加载 GPQA ({args.variant}) 并开始评估...\n")
+    
+    gpqa_eval = GPQAEval(
+        n_repeats=n_repeats,
+        variant=args.variant,
+        num_examples=args.num_examples,
+        n_shot=args.n_shot
+    )
+    # 为每个样本标注 (问题 ID, 重复序号)，作为日志的键
+    annotate_examples(gpqa_eval.examples)
+    
+    # 运行评估（由线程池分发样本，并发模式下异步引擎限制在途请求数）
+    adaptive_stop = None
+    try:
+        if args.adaptive:
+            result, adaptive_stop = run_adaptive(
+                gpqa_eval, sampler, args.concurrency, args.target_ci, args.min_repeats, args.max_repeats,
+                scheduler=scheduler
+            )
+            if adaptive_stop["reason"] == "precision":
+                print(f"🛑 {adaptive_stop['repeats']} 轮后达到目标精度 (±{adaptive_stop['rel_ci_half_width']:.2%})")
+            else:
+                needed = adaptive_stop["repeats_needed"]
+                print(f"⚠️  {args.max_repeats} 轮内未达到目标精度" + (f"（约需 {needed} 轮）" if needed else ""))
+        else:
+            with concurrent_dispatch(common, args.concurrency, scheduler):
+                result = gpqa_eval(sampler)
+    finally:
+        sampler.close()
+        journal.close()
+        if trace is not None:
+            trace.close()
+    
+    journal_summary = journal.summary()
+    print(f"📓 样本日志: {journal_summary['replayed']} 个从日志恢复, {journal_summary['appended']} 个新生成")
+    if sampler.latency is not None:
+        latency_summary = sampler.latency.summary()
+        if latency_summary:
+            print(f"⏱️  延迟 ({latency_summary['num_samples']} 个样本): "
+                  f"TTFT p50/p99 = {latency_summary['ttft_s']['p50']:.3f}/{latency_summary['ttft_s']['p99']:.3f}s, "
+                  f"ITL p50/p99 = {latency_summary['inter_token_s'].get('p50', 0)*1000:.1f}/"
+                  f"{latency_summary['inter_token_s'].get('p99', 0)*1000:.1f}ms, "
+                  f"解码 p50 = {latency_summary['tokens_per_s'].get('p50', 0):.1f} tok/s")
+    if scheduler is not None:
+        schedule_summary = scheduler.summary()
+        print(f"📏 调度: 实际耗时 {schedule_summary['wall_s']:.1f}s; 按实测样本耗时模拟 "
+              f"数据集顺序 {schedule_summary['simulated_naive_s']:.1f}s → 最长优先 "
+              f"{schedule_summary['simulated_scheduled_s']:.1f}s (缩短 {schedule_summary['improvement']:.1%}, "
+              f"下界 {schedule_summary['lower_bound_s']:.1f}s)")
+    if trace is not None:
+        print(f"🧾 请求 trace: {trace.recorded} 个请求 (回放: python performance/run_benchmark.py --trace {trace_file})")
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        print(f"🗄️  响应缓存: 命中 {cache_stats['hits']}, 未命中 {cache_stats['misses']} "
+              f"(命中率 {cache_stats['hit_rate']*100:.1f}%), 淘汰 {cache_stats['evictions']}")
     
     html_file.write_text(common.make_report(result))
     
+    # 逐样本正确性（按问题配对比较两个模型: performance/stats.py --gpqa）
+    samples = grade_samples(gpqa_eval.examples, result.convos, GRADER_ANSWER_PATTERN)
+    early_stop_summary = None
+    if truncation is not None:
+        early_stop_summary = truncation.summary(samples)
+        with open(truncated_file, "w", encoding="utf-8") as f:
+            for sample, convo in zip(samples, result.convos):
+                key = (sample["question_id"], sample["repeat"])
+                sample["truncated"] = key in truncation
+                if sample["truncated"]:
+                    row = {**sample, **truncation.samples[key], "response_text": convo[-1]["content"]}
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        accuracies = [
+            f"{acc:.4f}" if acc is not None else "-"
+            for acc in (early_stop_summary["accuracy_truncated"], early_stop_summary["accuracy_complete"])
+        ]
+        print(f"✂️  提前终止: {early_stop_summary['truncated']} 个样本 (准确率 {accuracies[0]}), "
+              f"完整生成 {early_stop_summary['complete']} 个 (准确率 {accuracies[1]})")
+    
     # 构建配置字典
     config_dict = {
         "variant": args.variant,
-        "n_repeats": args.n_repeats,
+        "n_repeats": adaptive_stop["repeats"] if adaptive_stop else args.n_repeats,
         "num_examples": args.num_examples,
         "n_shot": args.n_shot,
         "greedy": args.greedy,
         "max_tokens": args.max_tokens,
         "seed": args.seed,
+        "concurrency": args.concurrency,
+        "stream": args.stream,
+        "schedule": args.schedule,
+        "stop_at_answer": args.stop_grace_chunks if args.stop_at_answer else None,
     }
+    if adaptive_stop:
+        config_dict.update({
+            "adaptive": True,
+            "min_repeats": args.min_repeats,
+            "max_repeats": args.max_repeats,
+            "target_rel_ci": args.target_ci,
+        })
     
     # 记录实际使用的采样参数
     if args.greedy:
@@ -484,8 +1014,20 @@ def main():
         "auto_config_name": auto_config_name,  # 自动生成的基础部分
         "score": result.score,
         "metrics": result.metrics,
-        "config": config_dict
+        "latency": sampler.latency.summary() if sampler.latency is not None else None,
+        "config": config_dict,
+        "journal": journal_summary,
+        "stop": adaptive_stop,
+        "samples": samples
     }
+    if response_cache is not None:
+        json_output["response_cache"] = response_cache.stats()
+    if trace is not None:
+        json_output["trace"] = trace.summary()
+    if scheduler is not None:
+        json_output["schedule"] = scheduler.summary()
+    if early_stop_summary is not None:
+        json_output["early_stop"] = early_stop_summary
     
     # 如果提供了自定义 config_name，也单独记录
     if args.config_name:
@@ -499,12 +1041,19 @@ def main():
     print(f"{'='*70}")
     print(f"准确率: {result.score:.4f} ({result.score*100:.2f}%)")
     print(f"统计指标数: {len(result.metrics)} 个")
+    if samples:
+        print(f"逐样本结果: {len(samples)} 个 (配对检验: python performance/stats.py --gpqa <结果A.json> <结果B.json>)")
     print(f"配置名称: {final_config_name}")
     if args.config_name:
         print(f"  (基础: {auto_config_name} + 自定义: {args.config_name})")
     print(f"输出目录: {result_dir}/")
     print(f"  ├─ {html_file.name}")
-    print(f"  └─ {json_file.name}")
+    print(f"  ├─ {json_file.name}")
+    if trace is not None:
+        print(f"  ├─ {trace_file.name}")
+    if truncation is not None:
+        print(f"  ├─ {truncated_file.name}")
+    print(f"  └─ {journal_file.name}")
     print(f"{'='*70}\n")
 
 
@@ -8,7 +8,14 @@ import sys
 import time
 import argparse
 import subprocess
-import requests
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from serving.readiness import wait_until_ready
+from serving.checkpoint_integrity import verify_checkpoint
+
+SERVER_LOG_DIR = PROJECT_ROOT / "logs" / "eval_logs" / "server_logs"
 
 
 def start_server(model_path, gpu_id, port):
@@ -31,22 +38,29 @@ def start_server(model_path, gpu_id, port):
     else:
         print(f"🚀 Starting server: GPU {gpu_id}, Port {port}, Model: {model_path}")
     
-    process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return process
+    # Server output goes to a log file: it is watched for fatal errors during startup,
+    # and an unread PIPE would block the server once the buffer fills
+    SERVER_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = SERVER_LOG_DIR / f"server_gpu{gpu_id}_port{port}_{time.strftime('%Y%m%d_%H%M%S')}.log"
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(cmd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    print(f"📝 Server log: {log_path}")
+    return process, log_path
 
 
-def wait_for_server(port, timeout=300):
-    """Wait for server to be ready"""
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            response = requests.get(f"http://localhost:{port}/health", timeout=2)
-            if response.status_code == 200:
-                print(f"✅ Server ready on port {port}")
-                return True
-        except:
-            pass
-        time.sleep(5)
+def wait_for_server(port, timeout=300, process=None, log_path=None, started_at=None):
+    """Wait for server to be ready (health probes with backoff, fails fast on server errors)"""
+    report = wait_until_ready(
+        f"http://localhost:{port}",
+        process=process,
+        log_file=log_path,
+        timeout=timeout,
+        started_at=started_at,
+    )
+    if report["ready"]:
+        print(f"✅ Server ready on port {port} (cold start {report['cold_start_s']:.1f}s)")
+        return True
+    print(f"❌ Server on port {port} not ready: {report['error']}")
     return False
 
 
@@ -84,15 +98,29 @@ def main():
     parser.add_argument("--config-name", default=None, help="Optional configuration name")
     parser.add_argument("--sampling-mode", default="dosample", choices=["dosample", "greedy"])
     parser.add_argument("--n-repeats", type=int, default=10, help="Number of repeats")
+    parser.add_argument("--verify-checksums", action="store_true",
+                        help="Verify per-shard sha256 sums before launching (default: size/header check only)")
     args = parser.parse_args()
     
+    # Fail in milliseconds on a truncated checkpoint instead of at server load time
+    integrity = verify_checkpoint(args.model_path, deep=args.verify_checksums)
+    if not integrity["ok"]:
+        print(f"❌ Checkpoint failed integrity check: {args.model_path}")
+        for error in integrity["errors"]:
+            print(f"   - {error}")
+        return 1
+    if not integrity["skipped"]:
+        print(f"🔍 Checkpoint OK: {integrity['shards']} shards ({integrity['elapsed_s'] * 1000:.0f} ms)")
+    
     # Start server
-    server_process = start_server(args.model_path, args.gpu_id, args.port)
+    started_at = time.perf_counter()
+    server_process, server_log = start_server(args.model_path, args.gpu_id, args.port)
     
     try:
         # Wait for server to be ready
-        if not wait_for_server(args.port):
-            print(f"❌ Server startup timeout")
+        if not wait_for_server(args.port, timeout=900, process=server_process,
+                               log_path=server_log, started_at=started_at):
+            print(f"❌ Server startup failed")
             return 1
         
         # Run evaluation
@@ -0,0 +1,4 @@
+"""
+Sglang Server Utilities
+Shared helpers for launching, probing and stubbing sglang servers
+"""
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Quick integrity check of local safetensors checkpoints
+
+Run before launching a server so a truncated or half-written checkpoint fails in
+milliseconds instead of after a multi-minute sglang load. The fast check reads
+only the index and each shard's safetensors header: every shard must exist,
+match the size recorded at save time, and its header must describe exactly the
+bytes on disk. With deep=True shards are also hashed against the sha256 sums
+written by quantization/sharded_save.py (checkpoints saved by plain
+save_pretrained have no sums, so only the fast check applies).
+
+Usage:
+    python serving/checkpoint_integrity.py /data/.../Qwen3-4B-Instruct-2507-INT8-W8A8-SMOOTH-GPTQ [--deep]
+"""
+import json
+import time
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+INDEX_FILE = "model.safetensors.index.json"
+SINGLE_FILE = "model.safetensors"
+# safetensors headers are small; anything larger means a corrupt length prefix
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+
+class CheckpointIntegrityError(RuntimeError):
+    """A local checkpoint is missing files, truncated or fails its checksums"""
+
+
+def sha256_file(path, chunk_size=16 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_safetensors_header(path):
+    """Return (header dict, header length in bytes) of a safetensors file"""
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise ValueError("file shorter than the header length prefix")
+        (header_len,) = struct.unpack("<Q", prefix)
+        if header_len > MAX_HEADER_BYTES:
+            raise ValueError(f"implausible header length {header_len}")
+        raw = f.read(header_len)
+    if len(raw) < header_len:
+        raise ValueError("truncated header")
+    return json.loads(raw), header_len
+
+
+def check_shard(path, expected=None, deep=False):
+    """
+    Check one shard file
+
+    Args:
+        path: shard path
+        expected: {"size": bytes, "sha256": hex} recorded at save time, if any
+        deep: also verify the sha256 sum
+
+    Returns:
+        (list of tensor names in the shard, error message or None)
+    """
+    path = Path(path)
+    expected = expected or {}
+    if not path.exists():
+        return [], f"{path.name}: missing"
+    size = path.stat().st_size
+    if "size" in expected and size != expected["size"]:
+        return [], f"{path.name}: size {size} != recorded {expected['size']}"
+    try:
+        header, header_len = read_safetensors_header(path)
+    except (ValueError, OSError) as e:
+        return [], f"{path.name}: unreadable header ({e})"
+    tensors = [name for name in header if name != "__metadata__"]
+    data_end = max((header[name]["data_offsets"][1] for name in tensors), default=0)
+    if 8 + header_len + data_end != size:
+        return tensors, f"{path.name}: header describes {8 + header_len + data_end} bytes, file has {size}"
+    if deep and "sha256" in expected and sha256_file(path) != expected["sha256"]:
+        return tensors, f"{path.name}: sha256 mismatch"
+    return tensors, None
+
+
+def verify_checkpoint(path, deep=False, workers=8):
+    """
+    Check a checkpoint directory
+
+    Returns:
+        dict with path, ok, skipped, shards, tensors, checksums, deep, errors, elapsed_s;
+        non-local paths (HF hub ids) are reported as ok with skipped set
+    """
+    start = time.perf_counter()
+    path = Path(path)
+    report = {
+        "path": str(path),
+        "ok": False,
+        "skipped": None,
+        "shards": 0,
+        "tensors": 0,
+        "checksums": False,
+        "deep": deep,
+        "errors": [],
+        "elapsed_s": 0.0,
+    }
+    if not path.is_dir():
+        report["ok"] = True
+        report["skipped"] = "not a local directory"
+        return report
+
+    if not (path / "config.json").exists():
+        report["errors"].append("config.json: missing")
+
+    index_path = path / INDEX_FILE
+    if index_path.exists():
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            report["errors"].append(f"{INDEX_FILE}: unreadable ({e})")
+            index = {"weight_map": {}}
+        weight_map = index.get("weight_map", {})
+        recorded = index.get("metadata", {}).get("shards", {})
+        shard_names = sorted(set(weight_map.values()))
+    elif (path / SINGLE_FILE).exists():
+        weight_map, recorded, shard_names = {}, {}, [SINGLE_FILE]
+    else:
+        report["errors"].append("no safetensors weights found")
+        weight_map, recorded, shard_names = {}, {}, []
+
+    report["shards"] = len(shard_names)
+    report["checksums"] = bool(recorded) and all("sha256" in recorded.get(name, {}) for name in shard_names)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shard_names) or 1))) as pool:
+        results = list(pool.map(lambda name: check_shard(path / name, recorded.get(name), deep), shard_names))
+
+    for name, (tensors, error) in zip(shard_names, results):
+        report["tensors"] += len(tensors)
+        if error:
+            report["errors"].append(error)
+            continue
+        # The index must not point at tensors its shard does not contain
+        listed = {tensor for tensor, shard in weight_map.items() if shard == name}
+        missing = listed - set(tensors)
+        if missing:
+            report["errors"].append(f"{name}: {len(missing)} indexed tensors missing (e.g. {sorted(missing)[0]})")
+
+    report["ok"] = not report["errors"]
+    report["elapsed_s"] = time.perf_counter() - start
+    return report
+
+
+def ensure_checkpoint(path, deep=False):
+    """verify_checkpoint that raises CheckpointIntegrityError on failure"""
+    report = verify_checkpoint(path, deep=deep)
+    if not report["ok"]:
+        raise CheckpointIntegrityError(f"Checkpoint {path} failed integrity check: " + "; ".join(report["errors"]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check safetensors checkpoints before serving them")
+    parser.add_argument("paths", nargs="+", help="Checkpoint directories")
+    parser.add_argument("--deep", action="store_true", help="Also verify per-shard sha256 sums")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.paths:
+        report = verify_checkpoint(path, deep=args.deep)
+        if report["skipped"]:
+            print(f"⏭️  {path}: skipped ({report['skipped']})")
+        elif report["ok"]:
+            sums = "sha256 verified" if args.deep and report["checksums"] else (
+                "checksums recorded" if report["checksums"] else "no checksums")
+            print(f"✅ {path}: {report['shards']} shards, {report['tensors']} tensors, {sums} "
+                  f"({report['elapsed_s'] * 1000:.0f} ms)")
+        else:
+            failed += 1
+            print(f"❌ {path}:")
+            for error in report["errors"]:
+                print(f"   - {error}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
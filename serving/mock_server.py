@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Mock sglang Server (OpenAI-compatible stub)
+Lets the evaluation and benchmark tooling run end-to-end without a GPU
+
+Endpoints:
+    GET  /health
+    GET  /get_model_info
+    GET  /get_server_info
+    POST /v1/chat/completions   (supports "stream": true)
+    POST /generate              (native API, input_ids + max_new_tokens, supports "stream": true)
+    POST /flush_cache           (refused with 400 while requests are running, like sglang)
+
+/generate reports cached_tokens as the longest prefix shared with an earlier
+prompt since the last flush, a stand-in for sglang's radix cache.
+
+Usage:
+    python -m serving.mock_server --port 30000 --delay 0.5 --token-rate 100
+    python run_gpqa_sglang.py --model original --num-examples 3 --concurrency 8
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_CACHED_PROMPTS = 1024
+
+
+class MockState:
+    """Server-wide settings and counters shared by all handler threads"""
+
+    def __init__(self, delay=0.0, token_interval=0.0, max_running=None,
+                 response_text="The answer is clear.\n\nAnswer: A"):
+        self.delay = delay
+        self.token_interval = token_interval
+        # Requests beyond max_running wait in a queue, like a saturated server
+        self.running_slots = threading.Semaphore(max_running) if max_running else None
+        self.response_text = response_text
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.last_gen_throughput = 0.0
+        self.cache_flushes = 0
+        self.cached_prompts = []
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json({})
+        elif self.path == "/get_model_info":
+            self._send_json({"model_path": "mock", "tokenizer_path": "mock", "is_generation": True})
+        elif self.path == "/get_server_info":
+            self._send_json({
+                "model_path": "mock",
+                "internal_states": [{"last_gen_throughput": self.state.last_gen_throughput}],
+            })
+        else:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+
+    def do_POST(self):
+        if self.path == "/v1/chat/completions":
+            self._chat_completions(self._read_json())
+        elif self.path == "/generate":
+            self._generate(self._read_json())
+        elif self.path == "/flush_cache":
+            self._flush_cache()
+        else:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        self.wfile.write(f"data: {data}\n\n".encode())
+        self.wfile.flush()
+
+    def _enter(self):
+        state = self.state
+        with state.lock:
+            state.in_flight += 1
+            state.total_requests += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+
+    def _exit(self):
+        with self.state.lock:
+            self.state.in_flight -= 1
+
+    def _flush_cache(self):
+        self._read_json()
+        with self.state.lock:
+            busy = self.state.in_flight > 0
+            if not busy:
+                self.state.cache_flushes += 1
+                self.state.cached_prompts = []
+        if busy:
+            self._send_json({"error": "Cache not flushed: requests are running"}, status=400)
+        else:
+            self._send_json({"message": "Cache flushed."})
+
+    def _chat_completions(self, request):
+        state = self.state
+        self._enter()
+        try:
+            time.sleep(state.delay)
+            prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+            completion_tokens = len(state.response_text.split())
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_chars // 4 + completion_tokens,
+            }
+            if request.get("stream"):
+                self._stream_chat(request, usage)
+                return
+            self._send_json({
+                "id": f"mock-{state.total_requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "default"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": state.response_text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        finally:
+            self._exit()
+
+    def _stream_chat(self, request, usage):
+        """Emit one SSE chunk per whitespace-separated token of the canned response"""
+        state = self.state
+        chunk_base = {
+            "id": f"mock-{state.total_requests}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "default"),
+        }
+        self._start_sse()
+        tokens = state.response_text.split(" ")
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(state.token_interval)
+            content = token if i == 0 else " " + token
+            self._send_event({**chunk_base, "choices": [
+                {"index": 0, "delta": {"role": "assistant", "content": content}, "finish_reason": None}
+            ]})
+        self._send_event({**chunk_base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_event({**chunk_base, "choices": [], "usage": usage})
+        self._send_event("[DONE]")
+
+    def _cached_tokens(self, input_ids):
+        """Longest prefix of input_ids shared with a prompt seen since the last flush"""
+        with self.state.lock:
+            previous = list(self.state.cached_prompts)
+            self.state.cached_prompts.append(input_ids)
+            # Bounded like a real cache (oldest prompts evicted first)
+            del self.state.cached_prompts[:-MAX_CACHED_PROMPTS]
+        best = 0
+        for prompt in previous:
+            n = 0
+            for a, b in zip(prompt, input_ids):
+                if a != b:
+                    break
+                n += 1
+            best = max(best, n)
+        return best
+
+    def _generate(self, request):
+        """Native sglang /generate: emit max_new_tokens tokens, one every token_interval seconds"""
+        state = self.state
+        self._enter()
+        try:
+            prompt_tokens = len(request.get("input_ids") or []) or len((request.get("text") or "").split())
+            cached_tokens = self._cached_tokens(request.get("input_ids") or [])
+            max_new_tokens = (request.get("sampling_params") or {}).get("max_new_tokens", 16)
+            start = time.perf_counter()
+            if state.running_slots is not None:
+                state.running_slots.acquire()
+            try:
+                self._emit_generation(request, prompt_tokens, max_new_tokens, start, cached_tokens)
+            finally:
+                if state.running_slots is not None:
+                    state.running_slots.release()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self._exit()
+
+    def _emit_generation(self, request, prompt_tokens, max_new_tokens, start, cached_tokens=0):
+        state = self.state
+        time.sleep(state.delay)
+        if not request.get("stream"):
+            time.sleep(state.token_interval * max(max_new_tokens - 1, 0))
+            self._send_json({
+                "text": " tok" * max_new_tokens,
+                "meta_info": {"prompt_tokens": prompt_tokens, "completion_tokens": max_new_tokens,
+                              "cached_tokens": cached_tokens},
+            })
+            return
+        self._start_sse()
+        decode_start = time.perf_counter()
+        for i in range(1, max_new_tokens + 1):
+            if i > 1:
+                time.sleep(state.token_interval)
+            self._send_event({
+                "text": " tok" * i,
+                "meta_info": {"prompt_tokens": prompt_tokens, "completion_tokens": i, "cached_tokens": cached_tokens,
+                              "e2e_latency": time.perf_counter() - start},
+                "index": 0,
+            })
+        self._send_event("[DONE]")
+        decode_time = time.perf_counter() - decode_start
+        if decode_time > 0:
+            with state.lock:
+                state.last_gen_throughput = max_new_tokens / decode_time * max(state.in_flight, 1)
+
+
+def make_server(host="127.0.0.1", port=30000, **state_kwargs):
+    """Build a mock server (call serve_forever() or run it in a thread)"""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(**state_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock sglang server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=30000, help="Server port")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--token-rate", type=float, default=None, help="Tokens/s per request (overrides --token-interval)")
+    parser.add_argument("--max-running", type=int, default=None,
+                        help="Max concurrently generating /generate requests (extra ones queue)")
+    args = parser.parse_args()
+    if args.token_rate:
+        args.token_interval = 1.0 / args.token_rate
+
+    server = make_server(args.host, args.port, delay=args.delay, token_interval=args.token_interval,
+                         max_running=args.max_running)
+    print(f"🧪 Mock sglang server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state = server.RequestHandlerClass.state
+        print(f"🛑 Served {state.total_requests} requests (peak in-flight: {state.peak_in_flight})")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Health-probe based readiness check for sglang servers
+
+Replaces fixed startup sleeps: /health and /get_model_info are polled with
+exponential backoff while the server log is tailed for fatal errors, so a
+crashing server fails within one probe interval instead of after a timeout.
+The time until the server answers both probes is reported as its cold-start
+time (checkpoint load + CUDA graph capture), which differs per quantization
+method.
+
+Only lines that always end the server count as fatal. A bare traceback is
+not: sglang logs handled exceptions (e.g. a rejected request) with a full
+traceback and keeps serving. The last exception line is remembered instead
+and added to the error once the process has actually exited.
+
+Usage:
+    report = wait_until_ready("http://127.0.0.1:30000", process=proc, log_file=log_path)
+    if not report["ready"]:
+        raise ServerStartupError(report["error"])
+"""
+import re
+import json
+import time
+import socket
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Lines in the server log that mean the server is going down
+FATAL_LOG_PATTERNS = [
+    re.compile(p) for p in (
+        r"CUDA out of memory|OutOfMemoryError",
+        r"CUDA error",
+        r"Address already in use",
+        # A scheduler/detokenizer subprocess died and takes the launch process with it
+        r"(?:Scheduler|DetokenizerManager|TpModelWorkerClient) hit an exception",
+        r"Received sigquit from a child process",
+        r"scheduler is dead",
+    )
+]
+
+# Last line of a traceback ("ValueError: ..."), only reported next to an exit
+EXCEPTION_LINE = re.compile(r"^[\w.]*(?:Error|Exception|Interrupt)\b")
+
+READY_ENDPOINTS = ("/health", "/get_model_info")
+
+
+class ServerStartupError(RuntimeError):
+    """Server exited, logged a fatal error or did not become ready in time"""
+
+
+class LogWatcher:
+    """Incrementally tail a server log file and report the first fatal line"""
+
+    def __init__(self, log_file, patterns=FATAL_LOG_PATTERNS):
+        self.path = Path(log_file) if log_file else None
+        self.patterns = patterns
+        self.last_exception = None
+        self._offset = 0
+        self._partial = ""
+
+    def check(self):
+        """Return the first fatal log line written since the last call, or None"""
+        if self.path is None or not self.path.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+            self._offset = f.tell()
+        if not chunk:
+            return None
+        lines = (self._partial + chunk).split("\n")
+        # Keep an unterminated last line for the next call
+        self._partial = lines.pop()
+        for line in lines:
+            if EXCEPTION_LINE.search(line):
+                self.last_exception = line.strip()
+            if any(p.search(line) for p in self.patterns):
+                return line.strip()
+        return None
+
+
+def probe(base_url, endpoint, timeout=2.0):
+    """GET base_url + endpoint; returns the decoded JSON body (or {}) on HTTP 200, else None"""
+    try:
+        with urllib.request.urlopen(f"{base_url}{endpoint}", timeout=timeout) as response:
+            if response.status != 200:
+                return None
+            body = response.read()
+    except (urllib.error.URLError, ConnectionError, socket.timeout, OSError):
+        return None
+    try:
+        return json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+def wait_until_ready(base_url, process=None, log_file=None, timeout=600, started_at=None,
+                     initial_interval=0.5, max_interval=10.0, backoff=2.0):
+    """
+    Poll the readiness endpoints until they all answer 200
+
+    Args:
+        base_url: server root, e.g. http://127.0.0.1:30000 (no /v1 suffix)
+        process: optional Popen of the server; an early exit fails immediately
+        log_file: optional server log path, tailed for fatal errors
+        timeout: seconds before giving up
+        started_at: perf_counter() when the server was launched (default: now)
+        initial_interval, max_interval, backoff: exponential backoff between probes
+
+    Returns:
+        dict with ready, cold_start_s, probes, endpoint_ready_s, model_info, error
+    """
+    watcher = LogWatcher(log_file)
+    start = time.perf_counter() if started_at is None else started_at
+    interval = initial_interval
+    report = {
+        "ready": False,
+        "cold_start_s": None,
+        "probes": 0,
+        "endpoint_ready_s": {},
+        "model_info": None,
+        "error": "",
+    }
+
+    while True:
+        elapsed = time.perf_counter() - start
+        fatal = watcher.check()
+        if fatal:
+            report["error"] = f"fatal error in server log: {fatal}"
+            break
+        if process is not None and process.poll() is not None:
+            watcher.check()  # Pick up the traceback written just before the exit
+            report["error"] = f"server exited with code {process.returncode}"
+            if watcher.last_exception:
+                report["error"] += f" ({watcher.last_exception})"
+            break
+
+        report["probes"] += 1
+        for endpoint in READY_ENDPOINTS:
+            if endpoint in report["endpoint_ready_s"]:
+                continue
+            body = probe(base_url, endpoint)
+            if body is None:
+                break
+            report["endpoint_ready_s"][endpoint] = time.perf_counter() - start
+            if endpoint == "/get_model_info":
+                report["model_info"] = body
+
+        if len(report["endpoint_ready_s"]) == len(READY_ENDPOINTS):
+            report["ready"] = True
+            report["cold_start_s"] = time.perf_counter() - start
+            break
+        if elapsed >= timeout:
+            report["error"] = f"not ready after {timeout}s"
+            break
+        time.sleep(min(interval, max(timeout - elapsed, 0.0)))
+        interval = min(interval * backoff, max_interval)
+
+    return report
+
+
+def wait_for_port_free(port, host="127.0.0.1", timeout=30.0, interval=0.2):
+    """Block until nothing accepts connections on `port` (a stopped server released it)"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(interval)
+            if sock.connect_ex((host, port)) != 0:
+                return True
+        time.sleep(interval)
+    return False
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Warm-server session helpers
+
+A benchmark session launches one sglang server per model and runs every
+scenario against it, so checkpoint load and CUDA graph capture are paid once.
+To keep scenarios independent, the radix (prefix) cache is flushed through
+/flush_cache before each one, and the server log is cut into one file per
+scenario so a crash or error line can still be attributed to the scenario
+that triggered it.
+
+Usage:
+    segments = ServerLogSegments(server_log_file)
+    for scenario in scenarios:
+        flush_cache("http://127.0.0.1:30000")
+        segments.begin(scenario["name"])
+        ...  # run the scenario
+        segment = segments.end()  # {"scenario", "file", "bytes", "fatal"}
+"""
+import time
+import socket
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from .readiness import FATAL_LOG_PATTERNS
+
+
+def flush_cache(base_url, timeout=30.0, retries=5, interval=1.0):
+    """
+    POST /flush_cache; True once the server confirms the flush
+
+    sglang refuses to flush while requests are still running, so a refusal is
+    retried a few times (the previous scenario's requests are draining).
+    """
+    for attempt in range(retries):
+        request = urllib.request.Request(f"{base_url}/flush_cache", data=b"", method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, socket.timeout, OSError):
+            pass
+        if attempt < retries - 1:
+            time.sleep(interval)
+    return False
+
+
+class ServerLogSegments:
+    """Cut a running server's log file into one segment file per scenario"""
+
+    def __init__(self, log_file, patterns=FATAL_LOG_PATTERNS):
+        self.path = Path(log_file)
+        self.patterns = patterns
+        self.segments = []
+        self._label = None
+        self._start = 0
+
+    def _size(self):
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def begin(self, label):
+        """Start a segment at the current end of the log"""
+        self._label = label
+        self._start = self._size()
+
+    def end(self):
+        """
+        Write the log bytes since begin() to <log stem>_<label>.log
+
+        Returns:
+            dict with scenario, file, bytes and the first fatal log line (or None)
+        """
+        end = self._size()
+        data = b""
+        if end > self._start:
+            with open(self.path, "rb") as f:
+                f.seek(self._start)
+                data = f.read(end - self._start)
+        segment_file = self.path.with_name(f"{self.path.stem}_{self._label}{self.path.suffix}")
+        segment_file.write_bytes(data)
+        fatal = next(
+            (line.strip() for line in data.decode("utf-8", errors="replace").splitlines()
+             if any(p.search(line) for p in self.patterns)),
+            None,
+        )
+        segment = {"scenario": self._label, "file": str(segment_file), "bytes": len(data), "fatal": fatal}
+        self.segments.append(segment)
+        self._label = None
+        return segment